@@ -0,0 +1,107 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+from mam.sdk import codec
+from mam.sdk.alerts import (alerts_to_frame, ALERT_TIMESTAMP_FORMAT)
+from collections import Counter
+from datetime import datetime, timedelta
+import gc
+import time
+import tracemalloc
+
+# number of alerts in the synthetic alert query response
+ALERTS = 1000000
+ENTITIES = 5000
+
+'''
+Compares the dict records returned by get_alerts with the typed DataFrame returned by get_alerts_frame on a
+synthetic alert query response: time and peak memory to decode the response, memory held by the result, and the time
+of a typical triage workload (alerts per severity, new high alerts in the last hour, alerts per entity).
+Usage (from the repository root):
+    python scripts/benchmark_alerts_frame.py
+'''
+start = datetime(2020, 7, 28)
+response_content = codec.dumps([{'alert_id': str(1409504862 + i),
+                                 'entity_id': f'A{i % ENTITIES:05d}',
+                                 'entity_type_name': 'pump_fleet',
+                                 'data_item_name': ['high_pressure', 'low_flow', 'vibration'][i % 3],
+                                 'timestamp': (start + timedelta(seconds=i * 2.5)).strftime(ALERT_TIMESTAMP_FORMAT),
+                                 'severity': ['Low', 'Medium', 'High'][i % 3],
+                                 'status': ['New', 'Acknowledged', 'Resolved', 'Dismissed'][i % 4],
+                                 'value': i * 0.5}
+                                for i in range(ALERTS)])
+last_hour = start + timedelta(seconds=ALERTS * 2.5) - timedelta(hours=1)
+
+
+def decode_records():
+    return codec.loads(response_content)
+
+
+def decode_frame():
+    return alerts_to_frame(codec.loads(response_content))
+
+
+def triage_records(alerts):
+    per_severity = Counter(alert['severity'] for alert in alerts)
+    new_high = [alert for alert in alerts if alert['severity'] == 'High' and alert['status'] == 'New'
+                and datetime.strptime(alert['timestamp'], ALERT_TIMESTAMP_FORMAT) >= last_hour]
+    per_entity = Counter(alert['entity_id'] for alert in alerts)
+    return per_severity, len(new_high), per_entity.most_common(10)
+
+
+def triage_frame(df):
+    per_severity = df['severity'].value_counts()
+    new_high = df[(df['severity'] == 'High') & (df['status'] == 'New') & (df['timestamp'] >= last_hour)]
+    per_entity = df.groupby('entity_id', observed=True).size().nlargest(10)
+    return per_severity, len(new_high), per_entity
+
+
+def measure(function, *args):
+    """
+    :return: (result, seconds, peak traced memory in MB)
+    """
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def held_memory(function):
+    """
+    :return: MB still allocated once function returned (memory held by its result)
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current / 2 ** 20
+
+
+print(f'Synthetic alert query response: {ALERTS} alerts, {len(response_content) / 2 ** 20:.1f} MB of json')
+records, records_decode_s, records_decode_mb = measure(decode_records)
+_, records_triage_s, _ = measure(triage_records, records)
+records_held_mb = held_memory(decode_records)
+del records
+
+frame, frame_decode_s, frame_decode_mb = measure(decode_frame)
+_, frame_triage_s, _ = measure(triage_frame, frame)
+frame_held_mb = held_memory(decode_frame)
+
+print(f"{'':<14}{'decode s':>10}{'decode peak MB':>16}{'held MB':>10}{'triage s':>10}")
+print(f"{'dict records':<14}{records_decode_s:>10.2f}{records_decode_mb:>16.1f}{records_held_mb:>10.1f}"
+      f"{records_triage_s:>10.3f}")
+print(f"{'DataFrame':<14}{frame_decode_s:>10.2f}{frame_decode_mb:>16.1f}{frame_held_mb:>10.1f}"
+      f"{frame_triage_s:>10.3f}")
+print(f'\nDataFrame dtypes:\n{frame.dtypes}')
@@ -0,0 +1,151 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+from mam.sdk import (alerts,
+                     constants,
+                     dimension,
+                     entitytype,
+                     kpifunction,
+                     parseinput,
+                     metrics)
+from mam.sdk.apiclient import Transport
+from mam.sdk.client import MonitorClient
+from fake_monitor_api import FakeMonitorAPI
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import argparse
+import json
+import time
+
+'''
+Measures calls per second and tail latency of each sdk module function against the local fake Monitor api
+(scripts/fake_monitor_api.py), so transport regressions can be caught without a live tenant.
+The response cache is disabled so that every call goes over http.
+Usage (from the repository root):
+    python scripts/benchmark_api_calls.py --calls 500 --threads 8 --latency 0.005 --error-rate 0.01
+The benchmark stops when every call of a function fails, since its numbers would only time the error.
+'''
+parser = argparse.ArgumentParser(description='Benchmark sdk api calls against a local fake Monitor api')
+parser.add_argument('--calls', type=int, default=200, help='calls per function')
+parser.add_argument('--threads', type=int, default=8, help='threads making calls at the same time')
+parser.add_argument('--latency', type=float, default=0.0, help='seconds the server adds to every response')
+parser.add_argument('--latency-jitter', type=float, default=0.0)
+parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+parser.add_argument('--alerts', type=int, default=10000, help='alerts returned by each get_alerts call')
+parser.add_argument('--output', help='file to write the per endpoint metrics to, in prometheus text format')
+arguments = parser.parse_args()
+
+TENANT = 'fake_tenant'
+ENTITY_TYPE = 'benchmark_entity_type'
+DATA_ITEM = 'alert_data_item'
+
+server = FakeMonitorAPI(latency=arguments.latency, latency_jitter=arguments.latency_jitter,
+                        error_rate=arguments.error_rate, seed=0).start()
+state = server.state(TENANT)
+state.add_entity_type(ENTITY_TYPE)
+alert_ids = state.add_alerts(ENTITY_TYPE, DATA_ITEM, arguments.alerts, datetime(2020, 7, 28), datetime(2020, 7, 29))
+
+client = MonitorClient(server.credentials(TENANT),
+                       transport=Transport(pool_maxsize=arguments.threads, cache=False))
+
+constant_payload = json.dumps({'entity_type_name': ENTITY_TYPE,
+                               'constants': [{'name': 'benchmark_constant', 'datatype': 'number', 'value': 0.3,
+                                              'default': 0.3, 'description': 'benchmark'}]})
+dimension_payload = json.dumps({'entity_type_name': ENTITY_TYPE,
+                                'dimension_data': [{'name': 'benchmark_dimension', 'entity_id': f'A{i:03d}',
+                                                    'value': 'value', 'datatype': 'string'} for i in range(100)]})
+alerts_payload = json.dumps({'entityTypesFilter': [{'name': ENTITY_TYPE, 'dataItem': [DATA_ITEM]}],
+                             'start_ts': '2020-07-28-00.00.00.000000', 'end_ts': '2020-07-29-00.00.00.000000'})
+
+
+def remove_entitytype(i):
+    # each call archives and deletes its own entity type
+    state.add_entity_type(f'{ENTITY_TYPE}_{i}', functions=0)
+    entitytype.remove_entitytype(f'{ENTITY_TYPE}_{i}', client=client)
+
+
+benchmarks = {
+    'constants.create_constants': lambda i: constants.create_constants(constant_payload, client=client),
+    'constants.get_constants': lambda i: constants.get_constants(ENTITY_TYPE, client=client),
+    'constants.update_constants': lambda i: constants.update_constants(constant_payload, client=client),
+    'constants.remove_constants': lambda i: constants.remove_constants('benchmark_constant', client=client),
+    'dimension.add_dimensions_data': lambda i: dimension.add_dimensions_data(dimension_payload, client=client),
+    'dimension.get_dimensions_data': lambda i: dimension.get_dimensions_data(ENTITY_TYPE, client=client),
+    'dimension.remove_dimensions': lambda i: dimension.remove_dimensions('benchmark_dimension', ENTITY_TYPE,
+                                                                         client=client),
+    'kpifunction.get_functions': lambda i: kpifunction.get_functions(ENTITY_TYPE, client=client),
+    'parseinput.get_catalog_functions': lambda i: parseinput.get_catalog_functions(client=client),
+    'alerts.get_alerts': lambda i: alerts.get_alerts(alerts_payload, client=client),
+    'alerts.update_alert_status': lambda i: alerts.update_alert_status(alert_ids[i % len(alert_ids)], 'dismissed',
+                                                                       client=client),
+    'alerts.update_alert_severity': lambda i: alerts.update_alert_severity(alert_ids[i % len(alert_ids)], 'high',
+                                                                           client=client),
+    'entitytype.remove_entitytype': remove_entitytype,
+}
+
+
+def timed_call(function, i):
+    """
+    :return: (seconds, name of the exception type raised by the call or None)
+    """
+    started = time.perf_counter()
+    try:
+        function(i)
+    except Exception as exception:
+        return time.perf_counter() - started, type(exception).__name__
+    return time.perf_counter() - started, None
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+print(f'{arguments.calls} calls per function on {arguments.threads} threads. Server latency '
+      f'{arguments.latency * 1000:.1f}ms (+{arguments.latency_jitter * 1000:.1f}ms jitter), '
+      f'error rate {arguments.error_rate:.1%}')
+print(f"{'function':<34}{'calls/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'failed':>8}")
+errors = {}  # function name: Counter of exception type names
+all_failed = None
+with ThreadPoolExecutor(max_workers=arguments.threads) as executor:
+    for name, function in benchmarks.items():
+        started = time.perf_counter()
+        results = list(executor.map(lambda i: timed_call(function, i), range(arguments.calls)))
+        elapsed = time.perf_counter() - started
+        latencies = [latency * 1000 for latency, _ in results]
+        errors[name] = Counter(error for _, error in results if error is not None)
+        failed = sum(errors[name].values())
+        print(f'{name:<34}{arguments.calls / elapsed:>10.1f}{percentile(latencies, 0.5):>10.2f}'
+              f'{percentile(latencies, 0.9):>10.2f}{percentile(latencies, 0.99):>10.2f}{max(latencies):>10.2f}'
+              f'{failed:>8}')
+        if failed == len(results):
+            all_failed = name
+            break
+
+if any(errors.values()):
+    print('\nFailed calls by exception type:')
+    for name, counter in errors.items():
+        if counter:
+            print(f"{name:<34}{', '.join(f'{error} x{count}' for error, count in counter.most_common())}")
+
+if all_failed is not None:
+    client.close()
+    server.stop()
+    raise SystemExit(f'\nEvery call of {all_failed} failed ({", ".join(errors[all_failed])}). Benchmark aborted')
+
+print(f'\nConnection pool: {client.transport.pool_stats()}')
+print(f'Transfer: {client.transport.transfer_stats()}')
+print(f'Server requests (retries included): {server.request_count}')
+if arguments.output is not None:
+    with open(arguments.output, 'w') as F:
+        F.write(metrics.get_default_metrics().to_prometheus())
+    print(f'Per endpoint metrics written to {arguments.output}')
+
+client.close()
+server.stop()
@@ -0,0 +1,67 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+from mam.sdk.ingest import iter_csv_chunks
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import time
+
+'''
+Compares the csv engines of load_metrics_data_from_csv on a synthetic metrics file: the time to read the file into
+DataFrames and to parse the timestamp column, as done before the data is written to the database.
+The file is generated once and kept for the next runs.
+Usage (from the repository root, requires pandas and pyarrow):
+    python scripts/benchmark_csv_engines.py --rows 10000000
+'''
+parser = argparse.ArgumentParser(description='Benchmark the csv engines of load_metrics_data_from_csv')
+parser.add_argument('--rows', type=int, default=10000000)
+parser.add_argument('--file', default='benchmark_metrics.csv', help='synthetic csv file, generated when missing')
+parser.add_argument('--max-memory', type=int, default=256 * 1024 * 1024, help='bytes, for the chunked reads')
+parser.add_argument('--repeat', type=int, default=3, help='runs per engine; the best one is kept')
+arguments = parser.parse_args()
+
+
+def generate(file_path, rows):
+    random.seed(0)
+    start = datetime(2020, 7, 28)
+    with open(file_path, 'w') as F:
+        F.write('deviceid,evt_timestamp,pressure,temperature,flow,status\n')
+        for i in range(rows):
+            F.write(f'A{i % 5000:05d},{(start + timedelta(seconds=i)).isoformat(sep=" ")},'
+                    f'{random.random() * 100:.3f},{random.random() * 40:.2f},{random.randint(0, 500)},'
+                    f'{"on" if i % 7 else "off"}\n')
+
+
+def read(engine, max_memory):
+    import pandas as pd
+
+    rows = 0
+    for chunk in iter_csv_chunks(arguments.file, max_memory=max_memory, engine=engine):
+        if not pd.api.types.is_datetime64_any_dtype(chunk['evt_timestamp']):
+            # the pandas engine leaves timestamps as text; MetricsTable.prepare parses them
+            chunk['evt_timestamp'] = pd.to_datetime(chunk['evt_timestamp'])
+        rows += len(chunk.index)
+    return rows
+
+
+if not os.path.exists(arguments.file):
+    print(f'Generating {arguments.rows} rows in {arguments.file}')
+    generate(arguments.file, arguments.rows)
+print(f'{arguments.file}: {os.path.getsize(arguments.file) / 2 ** 20:.0f} MB, {os.cpu_count()} cpus')
+
+print(f"{'engine':<10}{'read':<10}{'rows':>12}{'seconds':>10}{'rows/s':>14}")
+for max_memory, mode in [(None, 'whole'), (arguments.max_memory, 'chunked')]:
+    for engine in ['pandas', 'pyarrow']:
+        timings = []
+        for _ in range(arguments.repeat):
+            started = time.perf_counter()
+            rows = read(engine, max_memory)
+            timings.append(time.perf_counter() - started)
+        print(f'{engine:<10}{mode:<10}{rows:>12}{min(timings):>10.2f}{rows / min(timings):>14.0f}')
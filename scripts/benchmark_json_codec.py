@@ -0,0 +1,64 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+from mam.sdk import codec
+import json
+import timeit
+
+# DEFINE PATH TO REQUIRED FILES
+# relative to where you run script from
+dimension_data_path = './data/sample_dimension_data.json'
+constant_data_path = './data/sample_constant_data.json'
+alerts_data_path = './data/sample_alerts_data.json'
+
+# number of copies of the sample records in each benchmark payload
+SCALE = 10000
+REPEAT = 5
+
+'''
+Compares the json codecs available in this environment on request bodies and responses built from the
+sample payloads in data/. Install orjson or ujson to include them in the comparison.
+Usage (from the repository root):
+    python scripts/benchmark_json_codec.py
+'''
+with open(dimension_data_path, 'r') as F:
+    dimension_data = json.load(F)['dimension_data']
+with open(constant_data_path, 'r') as F:
+    constant_data = json.load(F)['constants']
+with open(alerts_data_path, 'r') as F:
+    alerts_query = json.load(F)
+
+# request bodies in the shape built by _dimension_data_to_payload and _ui_constant_to_payload
+dimension_payload = [{'name': f"{d['name']}_{i}", 'id': d['entity_id'], 'value': d['value'], 'type': 'LITERAL'}
+                     for i in range(SCALE) for d in dimension_data]
+constant_payload = [{'name': f"{c['name']}_{i}", 'entityType': None, 'enabled': True, 'value': c['default'],
+                     'metadata': {'datatype': c['datatype'], 'description': c['description']}}
+                    for i in range(SCALE) for c in constant_data]
+# alert query response for the entity types and data items of the sample query
+alerts_response = [{'alert_id': str(1409504862 + i), 'entity_id': f'A{i % 100:02d}',
+                    'entity_type_name': f['name'], 'data_item_name': data_item,
+                    'timestamp': alerts_query['start_ts'], 'severity': ['Low', 'Medium', 'High'][i % 3],
+                    'status': ['New', 'Acknowledged', 'Resolved', 'Dismissed'][i % 4], 'value': i * 0.5}
+                   for i in range(SCALE) for f in alerts_query['entityTypesFilter'] for data_item in f['dataItem']]
+
+payloads = {
+    'dimension_data': dimension_payload,
+    'constants': constant_payload,
+    'alerts_response': alerts_response,
+}
+
+print(f'Available codecs: {codec.available_codecs()}. Default codec: {codec.get_default_codec().name}')
+print(f"{'payload':<18}{'codec':<10}{'bytes':>12}{'dumps ms':>12}{'loads ms':>12}")
+for payload_name, payload in payloads.items():
+    for codec_name in codec.available_codecs():
+        json_codec = codec.get_codec(codec_name)
+        encoded = json_codec.dumps(payload)
+        dumps_time = min(timeit.repeat(lambda: json_codec.dumps(payload), number=1, repeat=REPEAT))
+        loads_time = min(timeit.repeat(lambda: json_codec.loads(encoded), number=1, repeat=REPEAT))
+        print(f'{payload_name:<18}{codec_name:<10}{len(encoded):>12}{dumps_time * 1000:>12.2f}'
+              f'{loads_time * 1000:>12.2f}')
@@ -0,0 +1,109 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import re
+import subprocess
+import sys
+
+'''
+Checks the import time of each mam.sdk submodule against a budget, measured with `python -X importtime`, and
+checks that importing it does not pull in a heavy dependency (those are imported on first use).
+Each module is imported in a fresh interpreter; the best of REPEAT runs is kept.
+Exits with status 1 when a module is over budget or imports a heavy dependency.
+Usage (from the repository root, with the sdk installed):
+    python scripts/check_import_time.py
+'''
+
+REPEAT = 5
+
+# milliseconds, cumulative import time of the submodule including mam.sdk and the standard library modules it
+# imports (about 30ms of them are logging, json and threading)
+BUDGETS_MS = {
+    'mam.sdk': 50,
+    'mam.sdk.codec': 50,
+    'mam.sdk.compression': 50,
+    'mam.sdk.metrics': 50,
+    'mam.sdk.singleflight': 50,
+    'mam.sdk.streaming': 50,
+    'mam.sdk.ratelimit': 50,
+    'mam.sdk.retry': 80,
+    'mam.sdk.cache': 80,
+    'mam.sdk.utils': 80,
+    'mam.sdk.ingest': 80,
+    'mam.sdk.dbpool': 50,
+    # requests is the only third party package needed to make api calls
+    'mam.sdk.apiclient': 250,
+    'mam.sdk.client': 250,
+    'mam.sdk.parseinput': 250,
+    'mam.sdk.constants': 250,
+    'mam.sdk.dimension': 250,
+    'mam.sdk.kpifunction': 250,
+    'mam.sdk.alerts': 250,
+    'mam.sdk.alertwatch': 250,
+    'mam.sdk.entitytype': 250,
+}
+
+# packages only some functions need; they must not be imported with the sdk modules
+HEAVY_PACKAGES = ['pandas', 'numpy', 'sqlalchemy', 'iotfunctions', 'jsonschema', 'aiohttp', 'pyarrow']
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module):
+    """
+    :return: (cumulative import time in ms, set of top level packages imported). None when the import fails
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1])
+        return None
+
+    total_us = 0
+    packages = set()
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        cumulative_us, indent, name = int(match.group(2)), match.group(3), match.group(4)
+        packages.add(name.split('.')[0])
+        # top level entries of the sdk (mam and mam.sdk are nested below the submodule). everything they import is
+        # nested below them
+        if len(indent) == 1 and (name == 'mam' or name.startswith('mam.')):
+            total_us += cumulative_us
+    return total_us / 1000, packages
+
+
+print(f"{'module':<24}{'import ms':>10}{'budget ms':>11}  status")
+failures = []
+for module, budget_ms in BUDGETS_MS.items():
+    timings = []
+    for _ in range(REPEAT):
+        timing = measure(module)
+        if timing is None:
+            break
+        timings.append(timing)
+    if len(timings) < REPEAT:
+        failures.append(module)
+        print(f"{module:<24}{'':>10}{budget_ms:>11}  import failed")
+        continue
+    import_ms = min(timing[0] for timing in timings)
+    heavy_packages = sorted(set(HEAVY_PACKAGES) & timings[0][1])
+
+    status = 'ok'
+    if heavy_packages:
+        status = f'imports {", ".join(heavy_packages)}'
+    elif import_ms > budget_ms:
+        status = 'over budget'
+    if status != 'ok':
+        failures.append(module)
+    print(f'{module:<24}{import_ms:>10.1f}{budget_ms:>11}  {status}')
+
+if failures:
+    print(f'\n{len(failures)} module(s) failed the import time check: {", ".join(failures)}')
+    sys.exit(1)
@@ -0,0 +1,410 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import argparse
+import gzip
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+'''
+Local stand-in for the Monitor APIs used by the sdk, backed by in-memory state.
+Used by the benchmark scripts to measure the sdk without a live tenant. Not a reference implementation of the
+apis: payloads are stored and returned as they are sent.
+Implemented endpoints (below /api/{api_suffix}/v1):
+    PUT    meta      /{orgId}/entityType/{entityTypeName}/archive
+    DELETE meta      /{orgId}/entityType/{entityTypeName}
+    GET    kpi       /{orgId}/entityType/{entityTypeName}/kpiFunction
+    DELETE kpi       /{orgId}/entityType/{entityTypeName}/kpiFunction/{kpiFunctionName}
+    GET, POST, PUT, DELETE constants /{orgId}
+    GET, POST, DELETE master /{orgId}/entityType/{entityTypeName}/dimensional
+    POST   asengine  /{orgId}/queryalertdata
+    PUT    alerts    /{orgId}
+    GET    catalog   /{orgId}/function
+Usage (from the repository root):
+    python scripts/fake_monitor_api.py --port 8080 --latency 0.02 --error-rate 0.01
+then point the credentials asHost at http://127.0.0.1:8080
+'''
+
+ALERT_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+# responses at least this big are gzip compressed when the client accepts it
+COMPRESS_MIN_SIZE = 1024
+
+
+def parse_timestamp(timestamp_string):
+    """parse timestamps like 2020-07-28-10.53.18.441000 or 2020-07-28T10:53:18"""
+    values = [int(value) for value in re.split(r'\D+', timestamp_string.strip()) if value]
+    return datetime(*values)
+
+
+class FakeMonitorState(object):
+    """
+    in-memory entity types, constants, dimensions, kpi functions, alerts and catalog functions of one tenant
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entity_types = {}  # name: {'archived': bool}
+        self.constants = {}  # name: constant record
+        self.dimensions = {}  # entity type name: {(dimension name, entity id): dimension record}
+        self.functions = {}  # entity type name: {kpi function name: kpi function record}
+        self.alerts = {}  # alert id: alert record
+        self.max_query_alerts = None  # alert queries matching more alerts than this are answered with 504
+        self.catalog = [{'name': name, 'moduleAndTargetName': f'iotfunctions.bif.{name}', 'category': 'TRANSFORMER'}
+                        for name in ['PythonExpression', 'PythonFunction', 'RandomUniform', 'RandomNormal',
+                                     'AlertHighValue', 'AlertLowValue', 'Coalesce', 'DateDifference']]
+
+    def add_entity_type(self, name, functions=3):
+        with self.lock:
+            self.entity_types[name] = {'archived': False}
+            self.dimensions.setdefault(name, {})
+            self.functions[name] = {}
+            for i in range(functions):
+                kpi_name = str(uuid.uuid4())
+                self.functions[name][kpi_name] = {'name': kpi_name, 'functionName': 'PythonExpression',
+                                                  'enabled': True,
+                                                  'input': {'expression': f'df["speed"] * {i + 1}'},
+                                                  'output': {'name': f'output_{i}'}}
+
+    def add_alerts(self, entity_type_name, data_item_name, count, start, end, entities=100):
+        """
+        add count synthetic alerts spread evenly between start and end (datetime)
+        :return: list of alert ids
+        """
+        step = (end - start) / max(count, 1)
+        alert_ids = []
+        with self.lock:
+            first_id = 1409504862 + len(self.alerts)
+            for i in range(count):
+                alert_id = str(first_id + i)
+                self.alerts[alert_id] = {'alert_id': alert_id,
+                                         'entity_id': f'A{i % entities:03d}',
+                                         'entity_type_name': entity_type_name,
+                                         'data_item_name': data_item_name,
+                                         'timestamp': (start + step * i).strftime(ALERT_TIMESTAMP_FORMAT),
+                                         'severity': ['Low', 'Medium', 'High'][i % 3],
+                                         'status': ['New', 'Acknowledged', 'Resolved', 'Dismissed'][i % 4],
+                                         'value': round(i * 0.5, 2)}
+                alert_ids.append(alert_id)
+        return alert_ids
+
+
+class _Route(object):
+    def __init__(self, method, api_suffix, pattern, handler_name):
+        self.method = method
+        self.api_suffix = api_suffix
+        self.pattern = re.compile('^' + pattern + '$')
+        self.handler_name = handler_name
+
+
+_ENTITY_TYPE = r'/(?P<org_id>[^/]+)/entityType/(?P<entity_type_name>[^/]+)'
+_ROUTES = [
+    _Route('PUT', 'meta', _ENTITY_TYPE + '/archive', 'archive_entity_type'),
+    _Route('DELETE', 'meta', _ENTITY_TYPE, 'delete_entity_type'),
+    _Route('GET', 'kpi', _ENTITY_TYPE + '/kpiFunction', 'get_functions'),
+    _Route('DELETE', 'kpi', _ENTITY_TYPE + '/kpiFunction/(?P<kpi_name>[^/]+)', 'delete_function'),
+    _Route('GET', 'constants', '/(?P<org_id>[^/]+)', 'get_constants'),
+    _Route('POST', 'constants', '/(?P<org_id>[^/]+)', 'put_constants'),
+    _Route('PUT', 'constants', '/(?P<org_id>[^/]+)', 'put_constants'),
+    _Route('DELETE', 'constants', '/(?P<org_id>[^/]+)', 'delete_constants'),
+    _Route('GET', 'master', _ENTITY_TYPE + '/dimensional', 'get_dimensions'),
+    _Route('POST', 'master', _ENTITY_TYPE + '/dimensional', 'add_dimensions'),
+    _Route('DELETE', 'master', _ENTITY_TYPE + '/dimensional', 'delete_dimensions'),
+    _Route('POST', 'asengine', '/(?P<org_id>[^/]+)/queryalertdata', 'query_alerts'),
+    _Route('PUT', 'alerts', '/(?P<org_id>[^/]+)', 'update_alerts'),
+    _Route('GET', 'catalog', '/(?P<org_id>[^/]+)/function', 'get_catalog_functions'),
+]
+_API_PATH = re.compile(r'^/api/(?P<api_suffix>[^/]+)/(?P<version>[^/]+)(?P<rest>/.*)$')
+
+
+class FakeMonitorAPI(object):
+    """
+    fake Monitor api server running in a background thread
+
+    with FakeMonitorAPI(latency=0.01, error_rate=0.05) as server:
+        server.state('fake_tenant').add_entity_type('pumps')
+        client = MonitorClient(server.credentials())
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 error_status=503, seed=None):
+        '''
+
+        :param host: interface to listen on
+        :param port: port to listen on. 0 picks a free port
+        :param latency: seconds added to every response
+        :param latency_jitter: up to this many extra seconds, drawn uniformly, are added to every response
+        :param error_rate: share (0 - 1) of requests answered with error_status instead of being served
+        :param error_status: status code of injected errors. 429 and 503 answers carry Retry-After: 0
+        :param seed: seed of the random generator used for jitter and error injection
+        '''
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.states = {}
+        self.request_count = 0
+        self._states_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _handler_class(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def state(self, tenant_id):
+        """
+        :return: FakeMonitorState of a tenant, created on first use
+        """
+        with self._states_lock:
+            if tenant_id not in self.states:
+                self.states[tenant_id] = FakeMonitorState()
+            return self.states[tenant_id]
+
+    def credentials(self, tenant_id='fake_tenant'):
+        """
+        :return: dict credentials pointing the sdk at this server
+        """
+        return {'tenantId': tenant_id,
+                'iotp': {'asHost': self.url, 'apiKey': 'fake-api-key', 'apiToken': 'fake-api-token'}}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-monitor-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _inject(self):
+        """
+        :return: (seconds to wait, True when the request should fail)
+        """
+        with self.random_lock:
+            self.request_count += 1
+            delay = self.latency + (self.random.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+            fail = self.error_rate > 0 and self.random.random() < self.error_rate
+        return delay, fail
+
+    # ---- endpoints. each returns (status code, json serializable body)
+    def archive_entity_type(self, state, entity_type_name, **kwargs):
+        with state.lock:
+            if entity_type_name not in state.entity_types:
+                return 404, {'message': f'Entity type {entity_type_name} not found'}
+            state.entity_types[entity_type_name]['archived'] = True
+        return 200, {'message': f'Entity type {entity_type_name} archived'}
+
+    def delete_entity_type(self, state, entity_type_name, **kwargs):
+        with state.lock:
+            entity_type = state.entity_types.get(entity_type_name)
+            if entity_type is None:
+                return 404, {'message': f'Entity type {entity_type_name} not found'}
+            if not entity_type['archived']:
+                return 409, {'message': f'Entity type {entity_type_name} must be archived before it is deleted'}
+            del state.entity_types[entity_type_name]
+            state.dimensions.pop(entity_type_name, None)
+            state.functions.pop(entity_type_name, None)
+        return 200, {'message': f'Entity type {entity_type_name} deleted'}
+
+    def get_functions(self, state, entity_type_name, **kwargs):
+        with state.lock:
+            if entity_type_name not in state.entity_types:
+                return 404, {'message': f'Entity type {entity_type_name} not found'}
+            return 200, list(state.functions[entity_type_name].values())
+
+    def delete_function(self, state, entity_type_name, kpi_name, **kwargs):
+        with state.lock:
+            if state.functions.get(entity_type_name, {}).pop(kpi_name, None) is None:
+                return 404, {'message': f'Kpi function {kpi_name} not found'}
+        return 200, {'message': f'Kpi function {kpi_name} deleted'}
+
+    def get_constants(self, state, query, **kwargs):
+        entity_type_name = query.get('entityType')
+        with state.lock:
+            return 200, [constant for constant in state.constants.values()
+                         if entity_type_name is None or constant.get('entityType') in (None, entity_type_name)]
+
+    def put_constants(self, state, body, **kwargs):
+        with state.lock:
+            for constant in body:
+                state.constants[constant['name']] = constant
+        return 200, body
+
+    def delete_constants(self, state, body, **kwargs):
+        with state.lock:
+            deleted = [state.constants.pop(constant['name']) for constant in body
+                       if constant['name'] in state.constants]
+        return 200, deleted
+
+    def get_dimensions(self, state, entity_type_name, **kwargs):
+        with state.lock:
+            if entity_type_name not in state.entity_types:
+                return 404, {'message': f'Entity type {entity_type_name} not found'}
+            return 200, list(state.dimensions[entity_type_name].values())
+
+    def add_dimensions(self, state, entity_type_name, body, **kwargs):
+        with state.lock:
+            if entity_type_name not in state.entity_types:
+                return 404, {'message': f'Entity type {entity_type_name} not found'}
+            for dimension in body:
+                state.dimensions[entity_type_name][(dimension['name'], dimension.get('id'))] = dimension
+        return 200, body
+
+    def delete_dimensions(self, state, entity_type_name, query, **kwargs):
+        names = set((query.get('dimensionNames') or '').split(','))
+        with state.lock:
+            dimensions = state.dimensions.get(entity_type_name, {})
+            for key in [key for key in dimensions if key[0] in names]:
+                del dimensions[key]
+        return 200, {'message': f'Dimensions {sorted(names)} deleted'}
+
+    def query_alerts(self, state, body, **kwargs):
+        start = parse_timestamp(body['start_ts']) if body.get('start_ts') else datetime.min
+        end = parse_timestamp(body['end_ts']) if body.get('end_ts') else datetime.max
+        filters = {(f['name'], data_item) for f in body.get('entityTypesFilter', []) for data_item in f['dataItem']}
+        with state.lock:
+            alerts = list(state.alerts.values())
+        alerts = [alert for alert in alerts
+                  if (alert['entity_type_name'], alert['data_item_name']) in filters
+                  and start <= datetime.strptime(alert['timestamp'], ALERT_TIMESTAMP_FORMAT) < end]
+        if state.max_query_alerts is not None and len(alerts) > state.max_query_alerts:
+            return 504, {'message': 'Gateway timeout'}
+        return 200, alerts
+
+    def update_alerts(self, state, body, **kwargs):
+        results = []
+        with state.lock:
+            for update in body:
+                alert = state.alerts.get(update.get('alertId'))
+                if alert is not None:
+                    if 'domainStatus' in update:
+                        alert['status'] = update['domainStatus']
+                    if 'severity' in update:
+                        alert['severity'] = update['severity']
+                results.append({'alertId': update.get('alertId'), 'updated': alert is not None})
+        return 200, results
+
+    def get_catalog_functions(self, state, **kwargs):
+        return 200, state.catalog
+
+
+def _handler_class(server):
+
+    class FakeMonitorAPIHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real api
+        # headers and body are written separately; with Nagle on the body waits for the client's delayed ack
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _handle(self):
+            split_url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+
+            delay, fail = server._inject()
+            if delay:
+                time.sleep(delay)
+            if fail:
+                headers = {'Retry-After': '0'} if server.error_status in (429, 503) else {}
+                return self._respond(server.error_status, {'message': 'Injected error'}, headers)
+            if not self.headers.get('X-api-key') and not self.headers.get('Authorization'):
+                return self._respond(401, {'message': 'Missing credentials'})
+
+            match = _API_PATH.match(split_url.path)
+            for route in _ROUTES if match else []:
+                if route.method != self.command or route.api_suffix != match.group('api_suffix'):
+                    continue
+                route_match = route.pattern.match(match.group('rest'))
+                if route_match is None:
+                    continue
+                arguments = route_match.groupdict()
+                state = server.state(arguments.pop('org_id'))
+                query = {name: values[-1] for name, values in parse_qs(split_url.query).items()}
+                try:
+                    payload = json.loads(body) if body else None
+                except ValueError:
+                    return self._respond(400, {'message': 'Request body is not valid json'})
+                status, response = getattr(server, route.handler_name)(state, query=query, body=payload,
+                                                                       **arguments)
+                return self._respond(status, response, cacheable=self.command == 'GET')
+            return self._respond(404, {'message': f'No route for {self.command} {split_url.path}'})
+
+        def _respond(self, status, payload, headers=None, cacheable=False):
+            content = json.dumps(payload).encode('utf-8')
+            headers = dict(headers or {})
+            if cacheable and status == 200:
+                etag = '"' + hashlib.md5(content).hexdigest() + '"'
+                headers['ETag'] = etag
+                if self.headers.get('If-None-Match') == etag:
+                    status, content = 304, b''
+            if len(content) >= COMPRESS_MIN_SIZE and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+                content = gzip.compress(content, compresslevel=1)
+                headers['Content-Encoding'] = 'gzip'
+
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            if content:
+                self.wfile.write(content)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    return FakeMonitorAPIHandler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a local stand-in for the Monitor apis')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with an error')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--tenant', default='fake_tenant')
+    parser.add_argument('--entity-type', default='fake_entity_type')
+    parser.add_argument('--alerts', type=int, default=1000, help='synthetic alerts of --entity-type')
+    arguments = parser.parse_args()
+
+    fake_api = FakeMonitorAPI(arguments.host, arguments.port, arguments.latency, arguments.latency_jitter,
+                              arguments.error_rate, arguments.error_status)
+    fake_state = fake_api.state(arguments.tenant)
+    fake_state.add_entity_type(arguments.entity_type)
+    now = datetime.utcnow()
+    fake_state.add_alerts(arguments.entity_type, 'alert_data_item', arguments.alerts, now - timedelta(days=1), now)
+    print(f'Serving the fake Monitor api on {fake_api.url}. Credentials:')
+    print(json.dumps(fake_api.credentials(arguments.tenant), indent=4))
+    fake_api.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fake_api.stop()
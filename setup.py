@@ -55,6 +55,9 @@ setup(
         "jsonschema >= 3.2.0",
         "iotfunctions"
     ],
+    extras_require={
+        "async": ["aiohttp >= 3.6"],
+    },
     classifiers=[
         'Programming Language :: Python :: 3.7',
         'Topic :: Communications',
@@ -6,3 +6,8 @@
 #  | * trade secrets, irrespective of what has been deposited with the U.S.
 #  | * Copyright Office.
 
+
+import logging
+
+# the sdk does not configure logging; applications decide where its log records go (logging.basicConfig, ...)
+logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -9,18 +9,17 @@
 # python libraries
 import json
 import logging
-from jsonschema import validate
-
-# iotfunctions modules
-from iotfunctions.db import (Database)
+import requests
+from datetime import timedelta
 
 # mam-sdk modules
 from .utils import *
 from .parseinput import *
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .retry import (CircuitOpenError)
+from .codec import (dumps, loads)
+from .streaming import (DEFAULT_CHUNK_SIZE, iter_response_records)
 
-from iotfunctions.util import setup_logging
-setup_logging(as_log_level=logging.DEBUG, root_log_level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 query_alerts_schema = {
@@ -47,7 +46,32 @@ query_alerts_schema = {
 }
 
 
-def get_alerts(json_payload, credentials=None):
+def _get_alerts_request(json_payload, client, **api_client_arguments):
+    """
+    validate a query alerts json payload and build the api call for it
+    :param api_client_arguments: further APIClient arguments (retry, timeout, ...)
+    :return: APIClient
+    """
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    payload = validateJSON(json_payload)  # input is valid json
+    validate(instance=payload, schema=query_alerts_schema)  # input has valid schema
+
+    # 2. API CONNECTION: query alerts for a tenant
+    logger.debug('Connecting to API')
+    body_arguments = dumps(payload)
+
+    return client.api_client(api_suffix="asengine",
+                             http_method_name="POST",
+                             endpoint_suffix="/{orgId}/queryalertdata",
+                             body=body_arguments,
+                             idempotent=True,  # read only query
+                             read_only=True,
+                             **api_client_arguments
+                             )
+
+
+def get_alerts(json_payload, credentials=None, client=None):
     """
     get alerts using a json payload
     Uses the following APIs:
@@ -75,28 +99,111 @@ def get_alerts(json_payload, credentials=None):
     }
     ```
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return: json object: list of dict with alert information
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    payload = validateJSON(json_payload)  # input is valid json
-    validate(instance=payload, schema=query_alerts_schema)  # input has valid schema
+    client = get_client(credentials, client)
+    # call api to retrieve alerts
+    response = _get_alerts_request(json_payload, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting alerts')
 
-    # 2. API CONNECTION: GET all constants for a tenant
-    logger.debug('Connecting to API')
-    body_arguments = json.dumps(payload).encode('utf-8')
+    return loads(response.content)
 
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve alerts
-    response = APIClient(api_suffix="asengine",
-                         http_method_name="POST",
-                         endpoint_suffix="/{orgId}/queryalertdata",
-                         body=body_arguments,
-                         ).call_api()
+
+def get_alerts_stream(json_payload, credentials=None, client=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    same as get_alerts, returning an iterator that parses the alerts one at a time while the response is being
+    downloaded, so memory use does not grow with the number of alerts. the iterator holds the response open until
+    it is exhausted: use it in a with statement, or call its close(), when it may not be read to the end
+    :param chunk_size: bytes read from the response at a time
+    :return: streaming.ResponseRecords of dict with alert information
+    """
+    client = get_client(credentials, client)
+    response = _get_alerts_request(json_payload, client).call_api(stream=True)
+    if response.status_code != 200:
+        response.close()
+        raise Exception('API Client call failed when getting alerts')
+
+    return iter_response_records(response, chunk_size)
+
+
+# timestamps of alert queries and alert records, e.g. 2020-07-28-13.45.00.000000
+ALERT_TIMESTAMP_FORMAT = '%Y-%m-%d-%H.%M.%S.%f'
+# alert fields converted to pandas categoricals and datetimes by alerts_to_frame
+ALERT_CATEGORICAL_COLUMNS = ('severity', 'status', 'entity_id', 'entity_type_name', 'data_item_name')
+ALERT_TIMESTAMP_COLUMNS = ('timestamp',)
+
+
+def _parse_timestamps(values, timestamp_format):
+    """
+    :return: datetime64 series. values in timestamp_format, or in ISO format when timestamp_format is None, are
+    parsed; the others become NaT and are logged
+    """
+    import pandas as pd
+
+    timestamps = pd.to_datetime(values, format=timestamp_format or ALERT_TIMESTAMP_FORMAT, errors='coerce')
+    failed = timestamps.isna() & values.notna()
+    if timestamp_format is None and failed.any():
+        timestamps[failed] = pd.to_datetime(values[failed], errors='coerce')
+        failed = timestamps.isna() & values.notna()
+    if failed.any():
+        logger.warning(f'{failed.sum()} of {len(values)} values of {values.name} are not timestamps in format '
+                       f'{timestamp_format or ALERT_TIMESTAMP_FORMAT + " or ISO"} and were set to NaT, '
+                       f'e.g. {values[failed].iloc[0]!r}')
+    return timestamps
+
+
+def alerts_to_frame(alerts, timestamp_format=None, categorical_columns=ALERT_CATEGORICAL_COLUMNS,
+                    timestamp_columns=ALERT_TIMESTAMP_COLUMNS):
+    """
+    convert alert records to a typed pandas DataFrame
+    :param alerts: list of dict with alert information, as returned by get_alerts
+    :param timestamp_format: str (optional) strftime format of the timestamps. when None, timestamps are parsed in
+    the Monitor format (ALERT_TIMESTAMP_FORMAT) or in ISO format
+    :param categorical_columns: columns stored as pandas categoricals (repeated values are stored once)
+    :param timestamp_columns: columns stored as datetime64. unparseable values become NaT and are logged as a
+    warning
+    :return: pandas.DataFrame with one row per alert
+    """
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(alerts)
+    for column in categorical_columns:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    for column in timestamp_columns:
+        if column in df.columns:
+            df[column] = _parse_timestamps(df[column], timestamp_format)
+    return df
+
+
+def get_alerts_frame(json_payload, credentials=None, client=None, timestamp_format=None):
+    """
+    same as get_alerts, returning the alerts as a pandas DataFrame
+    severity, status, entity id, entity type name and data item name are categorical columns and timestamp is a
+    datetime64 column, so filtering and grouping alerts is vectorized
+    :param timestamp_format: str (optional) strftime format of the alert timestamps, see alerts_to_frame
+    :return: pandas.DataFrame with one row per alert
+    """
+    client = get_client(credentials, client)
+    response = _get_alerts_request(json_payload, client).call_api()
     if response.status_code != 200:
         raise Exception('API Client call failed when getting alerts')
 
-    return response.json()
+    return alerts_to_frame(loads(response.content), timestamp_format)
+
+
+async def get_alerts_async(json_payload, credentials=None, client=None):
+    """
+    async version of get_alerts
+    """
+    client = get_client(credentials, client)
+    response = await _get_alerts_request(json_payload, client).call_api_async()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting alerts')
+
+    return loads(response.content)
 
 
 def set_alert():
@@ -114,7 +221,28 @@ def set_alert():
 ALLOWED_STATUS_VALUES = ["new", "acknowledged", "resolved", "dismissed"]
 
 
-def update_alert_status(alert_id, new_status, credentials=None):
+def _update_alerts_request(payload, client):
+    body_arguments = dumps(payload)
+    return client.api_client(api_suffix="alerts",
+                             http_method_name="PUT",
+                             endpoint_suffix="/{orgId}",
+                             body=body_arguments,
+                             )
+
+
+def _alert_status_payload(alert_id, new_status):
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    if new_status.lower() not in ALLOWED_STATUS_VALUES:
+        raise Exception(f'Invalid value {new_status} for new_status argument')
+
+    return [{
+        "alertId": alert_id,
+        "domainStatus": new_status.lower().capitalize()
+    }]
+
+
+def update_alert_status(alert_id, new_status, credentials=None, client=None):
     """
     update alert status using alert id
 
@@ -122,28 +250,30 @@ def update_alert_status(alert_id, new_status, credentials=None):
     :param new_status str
         allowed values for new_status: New, Acknowledged, Resolved, Dismissed
     :param credentials dict analytics-service dev credentials
+    :param client MonitorClient (optional) to make the api calls with instead of credentials
     :return:
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    if new_status.lower() not in ALLOWED_STATUS_VALUES:
-        raise Exception(f'Invalid value {new_status} for new_status argument')
+    payload = _alert_status_payload(alert_id, new_status)
 
-    # 2. API CONNECTION: GET all constants for a tenant
+    # 2. API CONNECTION: update alert status
     logger.debug('Connecting to API')
-    payload = [{
-        "alertId": alert_id,
-        "domainStatus": new_status.lower().capitalize()
-    }]
-    body_arguments = json.dumps(payload).encode('utf-8')
+    client = get_client(credentials, client)
+    response = _update_alerts_request(payload, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting alerts')
 
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve alerts
-    response = APIClient(api_suffix="alerts",
-                         http_method_name="PUT",
-                         endpoint_suffix="/{orgId}",
-                         body=body_arguments,
-                         ).call_api()
+    return
+
+
+async def update_alert_status_async(alert_id, new_status, credentials=None, client=None):
+    """
+    async version of update_alert_status
+    """
+    payload = _alert_status_payload(alert_id, new_status)
+
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _update_alerts_request(payload, client).call_api_async()
     if response.status_code != 200:
         raise Exception('API Client call failed when getting alerts')
 
@@ -153,7 +283,19 @@ def update_alert_status(alert_id, new_status, credentials=None):
 ALLOWED_SEVERITY_VALUES = ["low", "medium", "medium-high", "high"]
 
 
-def update_alert_severity(alert_id, new_severity, credentials=None):
+def _alert_severity_payload(alert_id, new_severity):
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    if new_severity.lower() not in ALLOWED_SEVERITY_VALUES:
+        raise Exception(f'Invalid value {new_severity} for new_status argument')
+
+    return [{
+        "alertId": alert_id,
+        "severity": new_severity.lower().capitalize()
+    }]
+
+
+def update_alert_severity(alert_id, new_severity, credentials=None, client=None):
     """
     update alert severity using alert id
 
@@ -161,29 +303,305 @@ def update_alert_severity(alert_id, new_severity, credentials=None):
     :param new_severity str
         allowed values for new_severity: Low, Medium, High, Medium-High
     :param credentials dict analytics-service dev credentials
+    :param client MonitorClient (optional) to make the api calls with instead of credentials
     :return:
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    if new_severity.lower() not in ALLOWED_SEVERITY_VALUES:
-        raise Exception(f'Invalid value {new_severity} for new_status argument')
+    payload = _alert_severity_payload(alert_id, new_severity)
 
-    # 2. API CONNECTION: GET all constants for a tenant
+    # 2. API CONNECTION: update alert severity
     logger.debug('Connecting to API')
-    payload = [{
-        "alertId": alert_id,
-        "severity": new_severity.lower().capitalize()
-    }]
-    body_arguments = json.dumps(payload).encode('utf-8')
+    client = get_client(credentials, client)
+    response = _update_alerts_request(payload, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting alerts')
 
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve alerts
-    response = APIClient(api_suffix="alerts",
-                         http_method_name="PUT",
-                         endpoint_suffix="/{orgId}",
-                         body=body_arguments,
-                         ).call_api()
+    return
+
+
+async def update_alert_severity_async(alert_id, new_severity, credentials=None, client=None):
+    """
+    async version of update_alert_severity
+    """
+    payload = _alert_severity_payload(alert_id, new_severity)
+
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _update_alerts_request(payload, client).call_api_async()
     if response.status_code != 200:
         raise Exception('API Client call failed when getting alerts')
 
     return
+
+
+# bulk updates are sent in chunks of this many alerts, several chunks at a time
+DEFAULT_BULK_CHUNK_SIZE = 500
+DEFAULT_BULK_MAX_WORKERS = 8
+
+
+def _validate_bulk_updates(updates, allowed_values):
+    """
+    validate new values of many alerts at once
+    :param updates: dict {alert_id: value} or iterable of (alert_id, value) pairs
+    :return: (list of alert ids, list of values as given, numpy array of normalized values, numpy boolean array of
+    valid values)
+    """
+    import numpy as np
+
+    pairs = list(updates.items()) if isinstance(updates, dict) else list(updates)
+    alert_ids = [alert_id for alert_id, _ in pairs]
+    given_values = [value for _, value in pairs]
+    values = np.char.lower(np.asarray(given_values, dtype=str))
+    valid = np.isin(values, allowed_values)
+    return alert_ids, given_values, np.char.capitalize(values), valid
+
+
+def _bulk_chunk_results(response, alert_ids):
+    """
+    :return: list of (success, error) for the alerts of one chunk
+    """
+    if response.status_code != 200:
+        return [(False, f'API call failed with status {response.status_code}')] * len(alert_ids)
+
+    # the response may hold one result per alert; alerts it does not mention were updated
+    try:
+        body = loads(response.content)
+    except ValueError:
+        body = None
+    item_results = {}
+    if isinstance(body, list):
+        item_results = {str(item['alertId']): item for item in body if isinstance(item, dict) and 'alertId' in item}
+
+    results = []
+    for alert_id in alert_ids:
+        item = item_results.get(str(alert_id), {})
+        if item.get('updated') is False or item.get('error'):
+            results.append((False, item.get('error') or 'Alert was not updated'))
+        else:
+            results.append((True, None))
+    return results
+
+
+def _bulk_update_alerts(updates, field, value_name, allowed_values, client, chunk_size, max_workers):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    alert_ids, given_values, values, valid = _validate_bulk_updates(updates, allowed_values)
+    results = [{'alert_id': alert_id, value_name: str(value), 'success': False, 'error': None}
+               for alert_id, value in zip(alert_ids, values)]
+    # invalid values are reported as they were given, not normalized
+    for index in (~valid).nonzero()[0]:
+        results[index][value_name] = given_values[index]
+        results[index]['error'] = f'Invalid value {given_values[index]} for {value_name}'
+
+    # 2. API CONNECTION: update the valid alerts, chunk_size alerts per call
+    valid_indexes = valid.nonzero()[0].tolist()
+    chunks = [valid_indexes[start:start + chunk_size] for start in range(0, len(valid_indexes), chunk_size)]
+    logger.debug(f'Updating {len(valid_indexes)} alerts in {len(chunks)} api calls')
+
+    def send_chunk(indexes):
+        payload = [{'alertId': alert_ids[index], field: str(values[index])} for index in indexes]
+        try:
+            response = _update_alerts_request(payload, client).call_api()
+        except Exception as error:
+            return indexes, [(False, str(error))] * len(indexes)
+        return indexes, _bulk_chunk_results(response, [alert_ids[index] for index in indexes])
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for indexes, chunk_results in executor.map(send_chunk, chunks):
+            for index, (success, error) in zip(indexes, chunk_results):
+                results[index]['success'] = success
+                results[index]['error'] = error
+    return results
+
+
+def bulk_update_alert_status(updates, credentials=None, client=None, chunk_size=DEFAULT_BULK_CHUNK_SIZE,
+                             max_workers=DEFAULT_BULK_MAX_WORKERS):
+    """
+    update the status of many alerts
+    alerts are sent chunk_size at a time, in up to max_workers concurrent api calls
+
+    :param updates dict {alert_id: new_status} or list of (alert_id, new_status) pairs
+        allowed values for new_status: New, Acknowledged, Resolved, Dismissed
+    :param credentials dict analytics-service dev credentials
+    :param client MonitorClient (optional) to make the api calls with instead of credentials
+    :param chunk_size int number of alerts updated per api call
+    :param max_workers int number of api calls in flight at the same time
+    :return: list of dict {'alert_id', 'status', 'success', 'error'}, one per update in input order. updates with an
+    invalid status are not sent and have success False
+    """
+    client = get_client(credentials, client)
+    return _bulk_update_alerts(updates, 'domainStatus', 'status', ALLOWED_STATUS_VALUES, client, chunk_size,
+                               max_workers)
+
+
+def bulk_update_alert_severity(updates, credentials=None, client=None, chunk_size=DEFAULT_BULK_CHUNK_SIZE,
+                               max_workers=DEFAULT_BULK_MAX_WORKERS):
+    """
+    update the severity of many alerts
+    alerts are sent chunk_size at a time, in up to max_workers concurrent api calls
+
+    :param updates dict {alert_id: new_severity} or list of (alert_id, new_severity) pairs
+        allowed values for new_severity: Low, Medium, High, Medium-High
+    :param credentials dict analytics-service dev credentials
+    :param client MonitorClient (optional) to make the api calls with instead of credentials
+    :param chunk_size int number of alerts updated per api call
+    :param max_workers int number of api calls in flight at the same time
+    :return: list of dict {'alert_id', 'severity', 'success', 'error'}, one per update in input order
+    """
+    client = get_client(credentials, client)
+    return _bulk_update_alerts(updates, 'severity', 'severity', ALLOWED_SEVERITY_VALUES, client, chunk_size,
+                               max_workers)
+
+
+# alert queries over long ranges are split in windows of this size, fetched concurrently
+DEFAULT_ALERT_WINDOW = timedelta(days=1)
+DEFAULT_MIN_ALERT_WINDOW = timedelta(minutes=5)
+DEFAULT_ALERT_WINDOW_WORKERS = 8
+# seconds a single window query may take before it is split
+DEFAULT_ALERT_WINDOW_TIMEOUT = 20
+# answers meaning the window asked for was too big for the server
+WINDOW_TOO_LARGE_STATUS_CODES = (408, 413, 504)
+
+
+class _WindowTooLarge(Exception):
+    pass
+
+
+def _alert_key(alert):
+    alert_id = alert.get('alert_id', alert.get('alertId')) if isinstance(alert, dict) else None
+    if alert_id is not None:
+        return alert_id
+    return dumps(alert)
+
+
+def _fetch_alert_window(payload, entity_types_filter, window_start, window_end, client, max_window_alerts,
+                        window_timeout):
+    window_payload = dict(payload, start_ts=window_start.strftime(ALERT_TIMESTAMP_FORMAT),
+                          end_ts=window_end.strftime(ALERT_TIMESTAMP_FORMAT))
+    if entity_types_filter is not None:
+        window_payload['entityTypesFilter'] = entity_types_filter
+    # a window that is too large is split rather than retried; its timeouts and refusals say nothing about the
+    # health of the endpoint, so they do not count on its circuit breaker
+    api_client = _get_alerts_request(dumps(window_payload), client, retry=False, timeout=window_timeout,
+                                     expected_status_codes=WINDOW_TOO_LARGE_STATUS_CODES, expect_timeout=True)
+    try:
+        response = api_client.call_api()
+    except requests.Timeout as error:
+        raise _WindowTooLarge(str(error))
+    if response.status_code in WINDOW_TOO_LARGE_STATUS_CODES:
+        raise _WindowTooLarge(f'API call returned {response.status_code}')
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting alerts')
+
+    alerts = loads(response.content)
+    if max_window_alerts is not None and len(alerts) >= max_window_alerts:
+        # the server may have cut the result short
+        raise _WindowTooLarge(f'{len(alerts)} alerts in one window')
+    return alerts
+
+
+def get_alerts_windowed(json_payload, credentials=None, client=None, window=DEFAULT_ALERT_WINDOW,
+                        min_window=DEFAULT_MIN_ALERT_WINDOW, entity_types_per_query=1,
+                        max_workers=DEFAULT_ALERT_WINDOW_WORKERS, max_window_alerts=None,
+                        window_timeout=DEFAULT_ALERT_WINDOW_TIMEOUT):
+    """
+    get alerts for a long time range using many small queries
+    the start_ts - end_ts range is split in windows and the entity types of entityTypesFilter in groups; every
+    (window, group) is queried concurrently, once, without retries. a window that takes longer than window_timeout,
+    is refused as too large (408, 413, 504) or returns max_window_alerts alerts or more is split in two halves that
+    are queried again, down to min_window. the alerts of all the queries are merged; an alert on a window boundary
+    returned by both windows is kept once. aggregated queries (groupBy, time_grain) cannot be split by window,
+    since a bucket crossing a window boundary would come back as two partial rows, and are refused.
+    when the circuit breaker of the alerts endpoint is open, the query fails with CircuitOpenError
+    Uses the following APIs:
+        POST /api/asengine/v1/<tenant_id>/queryalertdata
+
+    :param json_payload: str json query, see get_alerts. start_ts and end_ts are required
+    :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
+    :param window: datetime.timedelta initial size of the windows
+    :param min_window: datetime.timedelta size under which a window is not split any further
+    :param entity_types_per_query: int number of entity types of entityTypesFilter queried together
+    :param max_workers: int number of queries in flight at the same time
+    :param max_window_alerts: int (optional) result size at which a window is considered cut short by the server
+    :param window_timeout: seconds a single window query may take before the window is split
+    :return: json object: list of dict with alert information, ordered by window
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    payload = validateJSON(json_payload)  # input is valid json
+    validate(instance=payload, schema=query_alerts_schema)  # input has valid schema
+    if 'start_ts' not in payload or 'end_ts' not in payload:
+        raise Exception('start_ts and end_ts are required to query alerts by window')
+    aggregations = [name for name in ('groupBy', 'time_grain') if payload.get(name)]
+    if aggregations:
+        raise Exception(f'Aggregated alert queries ({", ".join(aggregations)}) cannot be split by window: their '
+                        f'buckets would be cut at the window boundaries. Use get_alerts for them')
+
+    # 2. INPUT PARSING: split the query by window and entity type group
+    start = convert_to_datetime(payload['start_ts'])
+    end = convert_to_datetime(payload['end_ts'])
+    entity_types = payload.get('entityTypesFilter') or []
+    groups = [entity_types[i:i + entity_types_per_query]
+              for i in range(0, len(entity_types), entity_types_per_query)] or [None]
+    slices = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window, end)
+        slices.extend((window_start, window_end, group_index) for group_index in range(len(groups)))
+        window_start = window_end
+
+    # 3. API CONNECTION: query the windows concurrently, splitting the ones that are too large
+    client = get_client(credentials, client)
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(window_start, window_end, group_index):
+            future = executor.submit(_fetch_alert_window, payload, groups[group_index], window_start, window_end,
+                                     client, max_window_alerts, window_timeout)
+            pending[future] = (window_start, window_end, group_index)
+
+        pending = {}
+        for query_slice in slices:
+            submit(*query_slice)
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window_start, window_end, group_index = pending.pop(future)
+                    try:
+                        results[(window_start, group_index)] = future.result()
+                    except CircuitOpenError as error:
+                        raise CircuitOpenError(f'Alert query window {window_start} - {window_end} was not sent: '
+                                               f'the alerts endpoint keeps failing ({error}). Retry after the '
+                                               f'recovery timeout of the circuit breaker') from error
+                    except _WindowTooLarge as error:
+                        if window_end - window_start <= min_window:
+                            raise Exception(f'Alert query window {window_start} - {window_end} is still too large '
+                                            f'({error}). Lower min_window or narrow the query')
+                        middle = window_start + (window_end - window_start) / 2
+                        logger.debug(f'Splitting alert query window {window_start} - {window_end}: {error}')
+                        submit(window_start, middle, group_index)
+                        submit(middle, window_end, group_index)
+        except BaseException:
+            # do not send the queries still waiting for a worker
+            for future in pending:
+                future.cancel()
+            raise
+
+    # 4. MERGE: windows in time order; alerts on a window boundary may be returned by both windows. identical
+    # alerts without id returned by one window are all kept: an alert is kept as many times as the window that
+    # returned it most often
+    alerts = []
+    kept = {}  # alert key: copies kept
+    for key in sorted(results):
+        window_copies = {}
+        for alert in results[key]:
+            alert_key = _alert_key(alert)
+            window_copies[alert_key] = window_copies.get(alert_key, 0) + 1
+            if window_copies[alert_key] > kept.get(alert_key, 0):
+                kept[alert_key] = window_copies[alert_key]
+                alerts.append(alert)
+    return alerts
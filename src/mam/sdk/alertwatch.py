@@ -0,0 +1,171 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import os
+import json
+import time
+import tempfile
+import logging
+from datetime import datetime, timedelta
+
+# mam-sdk modules
+from .alerts import (get_alerts, ALERT_TIMESTAMP_FORMAT)
+from .client import (get_client)
+from .codec import (dumps)
+from .utils import (convert_to_datetime)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOOKBACK = timedelta(hours=1)
+# alerts can be stored with a timestamp a bit older than the time they become visible; every poll queries this far
+# back behind the cursor
+DEFAULT_OVERLAP = timedelta(minutes=5)
+# alert fields the watcher compares to find changed alerts
+WATCHED_FIELDS = ('status', 'severity', 'value')
+
+
+def _alert_fingerprint(alert):
+    return dumps([alert.get(field) for field in WATCHED_FIELDS]).decode('utf-8')
+
+
+def _alert_key(alert):
+    """
+    :return: str alert id. alerts without one are told apart by entity, kpi and timestamp
+    """
+    alert_id = alert.get('alert_id', alert.get('alertId'))
+    if alert_id is not None:
+        return str(alert_id)
+    return dumps([alert.get('entity_type_name'), alert.get('entity_id'), alert.get('data_item_name'),
+                  alert.get('timestamp')]).decode('utf-8')
+
+
+class AlertWatcher(object):
+    """
+    polls for alerts that are new or changed since the previous poll
+    a cursor per (entity type, data item) records the end of the range queried by the previous poll, or the timestamp
+    of the newest alert returned when it is later. each poll only asks for the alerts between the cursor (minus a
+    small overlap) and now, and yields the ones not seen before or whose status, severity or value changed. the
+    overlap covers alerts that become visible late and a local clock ahead of the server's by less than the overlap.
+    lookback only sets how far back the first poll of a new cursor looks.
+    cursors and seen alerts are saved to cursor_path, so a restarted watcher continues where it stopped
+    note: a change to an alert older than the overlap is not detected, since the alert is not queried again
+
+    watcher = AlertWatcher([{'name': 'pump', 'dataItem': ['high_pressure']}], credentials,
+                           cursor_path='pump_alerts.cursor')
+    for alert in watcher.watch(interval=60):
+        print(alert)
+    """
+
+    def __init__(self, entity_types_filter, credentials=None, client=None, cursor_path=None,
+                 lookback=DEFAULT_LOOKBACK, overlap=DEFAULT_OVERLAP, query=None):
+        '''
+
+        :param entity_types_filter: list of dict {'name': entity type name, 'dataItem': [data item names]}, as in
+        the get_alerts payload
+        :param credentials: dict analytics-service dev credentials
+        :param client: MonitorClient (optional) to make the api calls with instead of credentials
+        :param cursor_path: str (optional) file the cursors are saved to. cursors are kept in memory only when None
+        :param lookback: datetime.timedelta how far back the first poll of a new cursor looks
+        :param overlap: datetime.timedelta how far behind its cursor each poll looks again
+        :param query: dict (optional) other get_alerts payload arguments. aggregated queries (groupBy, time_grain)
+        return buckets rather than alerts and cannot be watched
+        '''
+        self.entity_types_filter = entity_types_filter
+        self.client = get_client(credentials, client)
+        self.cursor_path = cursor_path
+        self.lookback = lookback
+        self.overlap = overlap
+        self.query = dict(query or {})
+        self.cursors = {}  # (entity type name, data item name): datetime the previous poll queried up to
+        self.seen = {}  # alert key (see _alert_key): (timestamp, fingerprint) of alerts inside the overlap
+        self._load()
+
+    def _load(self):
+        if self.cursor_path is None or not os.path.exists(self.cursor_path):
+            return
+        with open(self.cursor_path, 'r') as F:
+            state = json.load(F)
+        self.cursors = {(entity_type_name, data_item_name): datetime.strptime(cursor, ALERT_TIMESTAMP_FORMAT)
+                        for entity_type_name, data_item_name, cursor in state.get('cursors', [])}
+        self.seen = {alert_key: (datetime.strptime(timestamp, ALERT_TIMESTAMP_FORMAT), fingerprint)
+                     for alert_key, timestamp, fingerprint in state.get('seen', [])}
+
+    def save(self):
+        if self.cursor_path is None:
+            return
+        state = {'cursors': [[entity_type_name, data_item_name, cursor.strftime(ALERT_TIMESTAMP_FORMAT)]
+                             for (entity_type_name, data_item_name), cursor in self.cursors.items()],
+                 'seen': [[alert_key, timestamp.strftime(ALERT_TIMESTAMP_FORMAT), fingerprint]
+                          for alert_key, (timestamp, fingerprint) in self.seen.items()]}
+        # write to a temporary file first so a crash never leaves a partial cursor file
+        directory = os.path.dirname(os.path.abspath(self.cursor_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as F:
+            json.dump(state, F)
+        os.replace(tmp_path, self.cursor_path)
+
+    def poll(self, now=None):
+        """
+        query the alerts added or changed since the last poll and advance the cursors
+        :param now: datetime (optional) end of the queried range, utc now by default
+        :return: list of dict with alert information, new or changed alerts only
+        """
+        now = now or datetime.utcnow()
+        changed_alerts = []
+        for entity_type in self.entity_types_filter:
+            data_items = entity_type['dataItem']
+            starts = {data_item: self.cursors.get((entity_type['name'], data_item), now - self.lookback)
+                      for data_item in data_items}
+            start = min(starts.values()) - self.overlap
+
+            # 1. API CONNECTION: one query for the data items of the entity type
+            payload = dict(self.query, entityTypesFilter=[{'name': entity_type['name'], 'dataItem': data_items}],
+                           start_ts=start.strftime(ALERT_TIMESTAMP_FORMAT), end_ts=now.strftime(ALERT_TIMESTAMP_FORMAT))
+            alerts = get_alerts(json.dumps(payload), client=self.client)
+
+            # 2. keep the alerts that are new or changed
+            newest = {}
+            for alert in alerts:
+                timestamp = convert_to_datetime(alert['timestamp'])
+                data_item = alert.get('data_item_name')
+                data_item_start = starts.get(data_item, start + self.overlap)
+                if timestamp < data_item_start - self.overlap:
+                    continue
+                if data_item in starts and timestamp > newest.get(data_item, timestamp.min):
+                    newest[data_item] = timestamp
+                alert_key = _alert_key(alert)
+                fingerprint = _alert_fingerprint(alert)
+                previous = self.seen.get(alert_key)
+                if previous is None or previous[1] != fingerprint:
+                    changed_alerts.append(alert)
+                self.seen[alert_key] = (timestamp, fingerprint)
+
+            # 3. advance the cursors to the end of the queried range, or to the newest alert returned when it is
+            # later; the next poll looks overlap behind them
+            for data_item in data_items:
+                self.cursors[(entity_type['name'], data_item)] = max(newest.get(data_item, now), now)
+
+        # 4. forget alerts that the next poll will not query again
+        oldest = min(self.cursors.values(), default=now) - self.overlap
+        self.seen = {alert_key: seen for alert_key, seen in self.seen.items() if seen[0] >= oldest}
+        self.save()
+        logger.debug(f'{len(changed_alerts)} new or changed alerts')
+        return changed_alerts
+
+    def watch(self, interval=60):
+        """
+        poll every interval seconds, forever
+        :param interval: seconds between the start of two polls
+        :return: generator of dict with alert information, new or changed alerts only
+        """
+        while True:
+            started = time.monotonic()
+            for alert in self.poll():
+                yield alert
+            time.sleep(max(interval - (time.monotonic() - started), 0))
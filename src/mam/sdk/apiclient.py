@@ -7,27 +7,750 @@
 #  | * Copyright Office.
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+import asyncio
+import ssl
+import threading
+import time
 import logging
+import weakref
+from urllib.parse import urlsplit
+
+from .retry import (RetryPolicy, CircuitBreakerRegistry, CircuitOpenError)
+from .ratelimit import (get_default_rate_limiter)
+from .cache import (ResponseCache)
+from .singleflight import (SingleFlight)
+from .codec import (dumps, loads)
+from .metrics import (get_default_metrics)
+from .compression import (DEFAULT_COMPRESS_THRESHOLD, DEFAULT_COMPRESS_LEVEL, ACCEPT_ENCODING, TransferStats,
+                          body_length, compress_body)
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+DEFAULT_TIMEOUT = 60
+DEFAULT_MAX_CONCURRENCY = 100
+# methods that do not change server state
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class Transport(object):
+    """
+    session backed http transport used by APIClient
+    keeps tcp/tls connections alive in a connection pool so that consecutive api calls against the same host
+    reuse an open connection instead of doing a new handshake every time
+    """
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False, keep_alive=True, timeout=DEFAULT_TIMEOUT, retry_policy=None,
+                 circuit_breakers=None, rate_limiter=None, cache=None, single_flight=None,
+                 compress_threshold=DEFAULT_COMPRESS_THRESHOLD, compress_level=DEFAULT_COMPRESS_LEVEL, metrics=None):
+        '''
+
+        :param pool_connections: number of per-host connection pools to keep
+        :param pool_maxsize: maximum number of open connections kept per host
+        :param pool_block: when True, wait for a free connection instead of opening a throwaway one once
+        pool_maxsize connections are in use
+        :param keep_alive: when False, every request asks the server to close the connection (no reuse)
+        :param timeout: timeout in seconds for each request
+        :param retry_policy: RetryPolicy for throttled/failed requests. default RetryPolicy(); False disables retries
+        :param circuit_breakers: CircuitBreakerRegistry with one breaker per endpoint. default
+        CircuitBreakerRegistry(); False disables circuit breaking
+        :param rate_limiter: RateLimiter keyed by tenant and api suffix. default is the limiter shared by all
+        transports (see ratelimit.configure_rate_limits); False disables rate limiting
+        :param cache: ResponseCache for GET responses of read endpoints. default ResponseCache(); False disables
+        caching
+        :param single_flight: SingleFlight coalescing identical concurrent GET requests. default SingleFlight();
+        False disables coalescing
+        :param compress_threshold: request bodies of at least this many bytes are sent gzip compressed. None disables
+        request compression
+        :param compress_level: gzip compression level 1 (fast) - 9 (small)
+        :param metrics: MetricsRegistry recording count, errors, bytes and latency of each call per endpoint.
+        default is the registry shared by all transports (see metrics.get_default_metrics); False disables metrics
+        '''
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.retry_policy = _default_if_none(retry_policy, RetryPolicy)
+        self.circuit_breakers = _default_if_none(circuit_breakers, CircuitBreakerRegistry)
+        self.rate_limiter = _default_if_none(rate_limiter, get_default_rate_limiter)
+        self.cache = _default_if_none(cache, ResponseCache)
+        self.single_flight = _default_if_none(single_flight, SingleFlight)
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.transfer = TransferStats()
+        self.metrics = _default_if_none(metrics, get_default_metrics)
+        # hosts that answered a compressed body with 415; their requests are sent uncompressed
+        self._uncompressed_hosts = set()
+
+        self.session = requests.Session()
+        # responses are decompressed while they are streamed from the socket
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        if not keep_alive:
+            self.session.headers['Connection'] = 'close'
+
+        # requests of host pools that were evicted from the pool manager, so totals survive eviction
+        self._stats_lock = threading.Lock()
+        self._retired_requests = 0
+        pools = self.adapter.poolmanager.pools
+        dispose_pool = pools.dispose_func
+
+        def _retire_pool(pool):
+            with self._stats_lock:
+                self._retired_requests += pool.num_requests
+            if dispose_pool is not None:
+                dispose_pool(pool)
+
+        pools.dispose_func = _retire_pool
+
+        # connections actually opened. urllib3 reopens a dropped connection in place without counting it, so its
+        # own counter misses reconnects (e.g. every request when keep_alive is False)
+        self._connects = 0
+
+        def _count_connect():
+            with self._stats_lock:
+                self._connects += 1
+
+        _count_connects(self.adapter.poolmanager, _count_connect)
+
+    def request(self, method, url, tenant=None, api_suffix=None, endpoint=None, idempotent=None, read_only=False,
+                retry=True, expected_status_codes=(), expect_timeout=False, **kwargs):
+        """
+        send a request through the pooled session
+        GET responses of cached endpoints are served from the response cache while fresh; writes invalidate them.
+        a GET identical to one already in flight on another thread waits for that response instead of being sent.
+        throttled (429) and transient (5xx) responses and connection errors of retryable requests are retried
+        with backoff. calls to an endpoint whose circuit breaker is open fail fast with CircuitOpenError
+        :param method: http method name
+        :param url: full url
+        :param tenant: tenant id the request is made for
+        :param api_suffix: api the request belongs to (meta, kpi, ...)
+        :param endpoint: endpoint template, e.g. /{orgId}/entityType/{entityTypeName}/kpiFunction
+        :param idempotent: when True, the request is retried even if the method is not idempotent
+        :param read_only: when True, the request does not change server state although its method is not safe
+        (e.g. POST queries), so it does not invalidate cached responses
+        :param retry: when False, the request is sent once even if it is retryable
+        :param expected_status_codes: status codes the caller handles itself (e.g. by splitting a query that is too
+        large). they are returned without being recorded as failures on the endpoint's circuit breaker
+        :param expect_timeout: when True, a timeout is raised without being recorded as a failure on the endpoint's
+        circuit breaker
+        :param kwargs: arguments accepted by requests.Session.request
+        :return: requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        send_options = _SendOptions(idempotent, retry, expected_status_codes, expect_timeout)
+        if kwargs.get('stream'):
+            # a streamed body is read once, by the caller; it can neither be cached nor shared with other callers
+            return self._fetch(method, url, tenant, api_suffix, endpoint, send_options, read_only, None, None,
+                               **kwargs)
+
+        cache_key, entry = _cache_lookup(self.cache, method, url, tenant, api_suffix, endpoint, kwargs)
+        if entry is not None and entry.is_fresh():
+            return _response_from_cache(entry)
+
+        if self.single_flight is not None and method.upper() == 'GET':
+            flight_key = (method.upper(),) + ResponseCache.key(tenant, url, kwargs.get('params'))
+            return self.single_flight.do(flight_key, lambda: self._fetch(method, url, tenant, api_suffix, endpoint,
+                                                                         send_options, read_only, cache_key, entry,
+                                                                         **kwargs))
+        return self._fetch(method, url, tenant, api_suffix, endpoint, send_options, read_only, cache_key, entry,
+                           **kwargs)
+
+    def _fetch(self, method, url, tenant, api_suffix, endpoint, send_options, read_only, cache_key, entry, **kwargs):
+        raw_body = _compress_arguments(self, url, kwargs)
+        started = time.perf_counter()
+        try:
+            response = self._send(method, url, tenant, api_suffix, endpoint, send_options, **kwargs)
+            if raw_body is not None and response.status_code == 415:
+                logger.warning(f'{urlsplit(url).netloc} does not accept gzip request bodies. '
+                               f'Sending them uncompressed')
+                self._uncompressed_hosts.add(urlsplit(url).netloc)
+                _restore_arguments(kwargs, raw_body)
+                response = self._send(method, url, tenant, api_suffix, endpoint, send_options, **kwargs)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.record(api_suffix, method, endpoint, time.perf_counter() - started,
+                                    body_length(kwargs.get('data')), error=True)
+            raise
+        latency = time.perf_counter() - started
+
+        bytes_out = body_length(kwargs.get('data'))
+        self.transfer.record_request(bytes_out if raw_body is None else body_length(raw_body), bytes_out)
+        if kwargs.get('stream'):
+            # the body has not been read yet; count what the server announced
+            bytes_in = _content_length(response.headers)
+        else:
+            bytes_in = _wire_length(response)
+            self.transfer.record_response(bytes_in, len(response.content))
+        if self.metrics is not None:
+            self.metrics.record(api_suffix, method, endpoint, latency, bytes_out, bytes_in, response.status_code)
+
+        if cache_key is not None:
+            if response.status_code == 304 and entry is not None:
+                return _response_from_cache(self.cache.renew(cache_key, entry, endpoint))
+            if response.status_code == 200:
+                self.cache.put(cache_key, response.status_code, response.headers, response.content, response.url,
+                               response.encoding, tenant, api_suffix, endpoint)
+        elif self.cache is not None and method.upper() not in SAFE_METHODS and not read_only:
+            self.cache.invalidate_for_write(tenant, api_suffix, url)
+        return response
+
+    def _send(self, method, url, tenant, api_suffix, endpoint, send_options, **kwargs):
+        breaker = _circuit_breaker(self.circuit_breakers, url, api_suffix, endpoint)
+        retryable = _is_retryable(self.retry_policy, method, send_options, kwargs.get('files'))
+
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f'Circuit open for {method} {endpoint or url}; failing fast')
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(tenant, api_suffix)
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if breaker is not None:
+                    _record_error(breaker, send_options, isinstance(error, requests.Timeout))
+                delay = self.retry_policy.retry_delay(attempt) if retryable else None
+                if delay is None:
+                    raise
+                logger.warning(f'{method} {url} failed with {error!r}. Retrying in {delay:.2f}s')
+            except BaseException:
+                # no outcome to record (e.g. an invalid request or an interrupted call)
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                if breaker is not None:
+                    _record_response(breaker, send_options, response.status_code)
+                delay = None
+                if retryable:
+                    delay = self.retry_policy.retry_delay(attempt, response.status_code, response.headers)
+                if delay is None:
+                    return response
+                logger.warning(f'{method} {url} returned {response.status_code}. Retrying in {delay:.2f}s')
+                response.close()
+
+            time.sleep(delay)
+            attempt += 1
+
+    def pool_stats(self):
+        """
+        connection reuse counters
+        a hit is a request served on an already open connection, a miss is a request that had to open a
+        new connection
+        :return: dict with pools, requests, hits and misses
+        """
+        pools = self.adapter.poolmanager.pools
+        with self._stats_lock:
+            num_requests = self._retired_requests
+            num_connections = self._connects
+        num_pools = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            num_pools += 1
+            num_requests += pool.num_requests
+
+        return {'pools': num_pools,
+                'requests': num_requests,
+                'hits': max(num_requests - num_connections, 0),
+                'misses': num_connections}
+
+    def coalescing_stats(self):
+        """
+        :return: dict with executed and coalesced GET requests, see SingleFlight.stats
+        """
+        if self.single_flight is None:
+            return {'executed': 0, 'coalesced': 0, 'in_flight': 0}
+        return self.single_flight.stats()
+
+    def transfer_stats(self):
+        """
+        :return: dict of byte counters and compression ratios, see TransferStats.stats
+        """
+        return self.transfer.stats()
+
+    def close(self):
+        self.session.close()
+
+
+def _default_if_none(value, default_factory):
+    # None selects the default, False disables the feature
+    if value is None:
+        return default_factory()
+    if value is False:
+        return None
+    return value
+
+
+def _count_connects(pool_manager, on_connect):
+    """
+    make the connection pools created by pool_manager call on_connect() each time they open a connection
+    """
+    pool_classes = {}
+    for scheme, pool_class in pool_manager.pool_classes_by_scheme.items():
+        class CountingConnection(pool_class.ConnectionCls):
+            def connect(self):
+                on_connect()
+                return super().connect()
+
+        pool_classes[scheme] = type(pool_class.__name__, (pool_class,), {'ConnectionCls': CountingConnection})
+    pool_manager.pool_classes_by_scheme = pool_classes
+
+
+def _circuit_breaker(circuit_breakers, url, api_suffix, endpoint):
+    if circuit_breakers is None:
+        return None
+    split_url = urlsplit(url)
+    if endpoint is None:
+        return circuit_breakers.get((split_url.netloc, split_url.path))
+    return circuit_breakers.get((split_url.netloc, api_suffix, endpoint))
+
+
+def _cache_lookup(cache, method, url, tenant, api_suffix, endpoint, request_arguments):
+    """
+    find the cached entry of a GET request. adds If-None-Match to the request headers when a stale entry can be
+    revalidated
+    :return: (cache key, CacheEntry); cache key is None when the request is not cacheable
+    """
+    if cache is None or method.upper() != 'GET' or not cache.ttl(api_suffix, endpoint):
+        return None, None
+    cache_key = cache.key(tenant, url, request_arguments.get('params'))
+    entry = cache.get(cache_key)
+    if entry is not None and not entry.is_fresh() and entry.etag:
+        request_arguments['headers'] = {**(request_arguments.get('headers') or {}), 'If-None-Match': entry.etag}
+    return cache_key, entry
+
+
+def _response_from_cache(entry):
+    response = requests.Response()
+    response.status_code = entry.status_code
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response._content = entry.content
+    response.url = entry.url
+    response.encoding = entry.encoding
+    return response
+
+
+def _compress_arguments(transport, url, request_arguments):
+    """
+    replace a large request body with its gzip compressed form
+    :return: the original body when it was compressed, None otherwise
+    """
+    if request_arguments.get('files') is not None or urlsplit(url).netloc in transport._uncompressed_hosts:
+        return None
+    body = request_arguments.get('data')
+    compressed = compress_body(body, transport.compress_threshold, transport.compress_level)
+    if compressed is None:
+        return None
+    request_arguments['data'] = compressed
+    request_arguments['headers'] = {**(request_arguments.get('headers') or {}), 'Content-Encoding': 'gzip'}
+    return body
+
+
+def _restore_arguments(request_arguments, body):
+    request_arguments['data'] = body
+    request_arguments['headers'] = {name: value for name, value in request_arguments['headers'].items()
+                                    if name != 'Content-Encoding'}
+
+
+def _wire_length(response):
+    """
+    :return: int size of the response body as received, before decompression
+    """
+    raw = getattr(response, 'raw', None)
+    if raw is not None and hasattr(raw, 'tell'):
+        try:
+            return raw.tell()
+        except (OSError, ValueError):
+            pass
+    if response.headers.get('Content-Encoding') and _content_length(response.headers):
+        return _content_length(response.headers)
+    return len(response.content)
+
+
+def _content_length(headers):
+    length = headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else 0
+
+
+class _SendOptions(object):
+    """
+    per request retry and circuit breaker settings, see Transport.request
+    """
+
+    def __init__(self, idempotent=None, retry=True, expected_status_codes=(), expect_timeout=False):
+        self.idempotent = idempotent
+        self.retry = retry
+        self.expected_status_codes = frozenset(expected_status_codes)
+        self.expect_timeout = expect_timeout
+
+
+def _is_retryable(retry_policy, method, send_options, files):
+    # uploaded file objects are consumed by the first attempt and cannot be sent again
+    return (retry_policy is not None and send_options.retry and files is None
+            and retry_policy.is_retryable(method, send_options.idempotent))
+
+
+def _record_response(breaker, send_options, status_code):
+    if status_code in send_options.expected_status_codes:
+        # the endpoint answered; the caller handles this answer itself
+        breaker.release()
+    else:
+        breaker.record(status_code)
+
+
+def _record_error(breaker, send_options, timed_out):
+    if timed_out and send_options.expect_timeout:
+        breaker.release()
+    else:
+        breaker.record_failure()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def get_default_transport():
+    """
+    transport shared by every sdk module (constants, dimension, kpifunction, alerts, entitytype, parseinput)
+    created on first use
+    :return: Transport
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
+
+
+def configure_transport(**kwargs):
+    """
+    replace the shared transport with one using the given pool settings
+    :param kwargs: pool_connections, pool_maxsize, pool_block, keep_alive, timeout, compress_threshold, ...
+    (see Transport)
+    :return: the new shared Transport
+    """
+    global _default_transport
+    with _default_transport_lock:
+        old_transport = _default_transport
+        _default_transport = Transport(**kwargs)
+    if old_transport is not None:
+        old_transport.close()
+    return _default_transport
+
+
+class AsyncResponse(object):
+    """
+    response returned by AsyncTransport. exposes the parts of requests.Response used by the sdk
+    """
+
+    def __init__(self, status_code, headers, content, url, encoding=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.encoding = encoding or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return loads(self.content)
+
+
+def _import_aiohttp():
+    # optional, only needed for the async api (pip install mam-sdk[async]). imported on first use
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError('aiohttp is required for the async api. Install it with `pip install aiohttp`')
+    return aiohttp
+
+
+def _async_response_from_cache(entry):
+    return AsyncResponse(entry.status_code, CaseInsensitiveDict(entry.headers), entry.content, entry.url,
+                         entry.encoding)
+
+
+class AsyncTransport(object):
+    """
+    asyncio http transport used by APIClient.call_api_async
+    a semaphore bounds the number of requests in flight, so hundreds of calls can be scheduled on one event loop
+    without opening hundreds of connections at once
+    requires aiohttp. each event loop that uses an AsyncTransport gets its own session, connection pool and
+    semaphore, so the transport can be shared by event loops running in several threads at the same time.
+    the session of a loop is closed when that loop shuts down (asyncio.run cancels the tasks still pending before
+    it closes the loop) or by close() called on that loop
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, pool_maxsize=DEFAULT_MAX_CONCURRENCY,
+                 keep_alive=True, timeout=DEFAULT_TIMEOUT, retry_policy=None, circuit_breakers=None,
+                 rate_limiter=None, cache=None, compress_threshold=DEFAULT_COMPRESS_THRESHOLD,
+                 compress_level=DEFAULT_COMPRESS_LEVEL, metrics=None):
+        '''
+
+        :param max_concurrency: maximum number of requests in flight at the same time
+        :param pool_maxsize: maximum number of open connections
+        :param keep_alive: when False, connections are closed after each request
+        :param timeout: total timeout in seconds for each request
+        :param retry_policy: RetryPolicy, see Transport
+        :param circuit_breakers: CircuitBreakerRegistry, see Transport
+        :param rate_limiter: RateLimiter, see Transport
+        :param cache: ResponseCache, see Transport. can be shared with a Transport
+        :param compress_threshold: see Transport
+        :param compress_level: see Transport
+        :param metrics: MetricsRegistry, see Transport
+        '''
+        self.max_concurrency = max_concurrency
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.retry_policy = _default_if_none(retry_policy, RetryPolicy)
+        self.circuit_breakers = _default_if_none(circuit_breakers, CircuitBreakerRegistry)
+        self.rate_limiter = _default_if_none(rate_limiter, get_default_rate_limiter)
+        self.cache = _default_if_none(cache, ResponseCache)
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.transfer = TransferStats()
+        self.metrics = _default_if_none(metrics, get_default_metrics)
+        self._uncompressed_hosts = set()
+
+        self._sessions = weakref.WeakKeyDictionary()  # event loop -> _LoopSession
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self):
+        """
+        :return: _LoopSession of the running event loop, created on first use
+        """
+        loop = asyncio.get_running_loop()
+        loop_session = self._sessions.get(loop)
+        if loop_session is not None and not loop_session.session.closed:
+            return loop_session
+
+        aiohttp = _import_aiohttp()
+        connector = aiohttp.TCPConnector(limit=self.pool_maxsize, force_close=not self.keep_alive)
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        loop_session = _LoopSession(session, asyncio.Semaphore(self.max_concurrency))
+        with self._sessions_lock:
+            self._sessions[loop] = loop_session
+        loop_session.closer = loop.create_task(self._close_on_shutdown(loop, loop_session))
+        return loop_session
+
+    async def _close_on_shutdown(self, loop, loop_session):
+        """
+        wait until cancelled, then close the session of loop. asyncio.run cancels the pending tasks before closing
+        the loop
+        """
+        try:
+            await loop.create_future()
+        finally:
+            await loop_session.session.close()
+            # the session refers to its loop, so the entry is removed here rather than by the weak reference
+            with self._sessions_lock:
+                if self._sessions.get(loop) is loop_session:
+                    del self._sessions[loop]
+
+    async def request(self, method, url, headers=None, params=None, data=None, files=None, auth=None, verify=True,
+                      tenant=None, api_suffix=None, endpoint=None, idempotent=None, read_only=False, retry=True,
+                      expected_status_codes=(), expect_timeout=False, timeout=None):
+        """
+        send a request, waiting for a free slot when max_concurrency requests are already in flight
+        caching, retries and circuit breaking work as in Transport.request; the slot is released while backing off
+        :param method: http method name
+        :param url: full url
+        :param timeout: total timeout in seconds of this request. default AsyncTransport.timeout
+        :return: AsyncResponse
+        """
+        if files is not None:
+            raise NotImplementedError('File uploads are not supported by the async transport')
+
+        send_options = _SendOptions(idempotent, retry, expected_status_codes, expect_timeout)
+        request_arguments = {'headers': {**(headers or {}), 'Accept-Encoding': ACCEPT_ENCODING}, 'params': params,
+                             'data': data}
+        if timeout is not None:
+            request_arguments['timeout'] = _import_aiohttp().ClientTimeout(total=timeout)
+        cache_key, entry = _cache_lookup(self.cache, method, url, tenant, api_suffix, endpoint, request_arguments)
+        if entry is not None and entry.is_fresh():
+            return _async_response_from_cache(entry)
+
+        raw_body = _compress_arguments(self, url, request_arguments)
+        started = time.perf_counter()
+        try:
+            response = await self._send(method, url, tenant, api_suffix, endpoint, send_options, auth, verify,
+                                        **request_arguments)
+            if raw_body is not None and response.status_code == 415:
+                logger.warning(f'{urlsplit(url).netloc} does not accept gzip request bodies. '
+                               f'Sending them uncompressed')
+                self._uncompressed_hosts.add(urlsplit(url).netloc)
+                _restore_arguments(request_arguments, raw_body)
+                response = await self._send(method, url, tenant, api_suffix, endpoint, send_options, auth, verify,
+                                            **request_arguments)
+        except Exception:
+            if self.metrics is not None:
+                self.metrics.record(api_suffix, method, endpoint, time.perf_counter() - started,
+                                    body_length(request_arguments['data']), error=True)
+            raise
+        latency = time.perf_counter() - started
+
+        bytes_out = body_length(request_arguments['data'])
+        bytes_in = _wire_length(response)
+        self.transfer.record_request(body_length(data), bytes_out)
+        self.transfer.record_response(bytes_in, len(response.content))
+        if self.metrics is not None:
+            self.metrics.record(api_suffix, method, endpoint, latency, bytes_out, bytes_in, response.status_code)
+
+        if cache_key is not None:
+            if response.status_code == 304 and entry is not None:
+                return _async_response_from_cache(self.cache.renew(cache_key, entry, endpoint))
+            if response.status_code == 200:
+                self.cache.put(cache_key, response.status_code, response.headers, response.content, response.url,
+                               response.encoding, tenant, api_suffix, endpoint)
+        elif self.cache is not None and method.upper() not in SAFE_METHODS and not read_only:
+            self.cache.invalidate_for_write(tenant, api_suffix, url)
+        return response
+
+    async def _send(self, method, url, tenant, api_suffix, endpoint, send_options, auth, verify, **kwargs):
+        aiohttp = _import_aiohttp()
+        loop_session = self._get_session()
+        if auth is not None:
+            auth = aiohttp.BasicAuth(*auth)
+        if isinstance(verify, str):  # path to a ca bundle
+            ssl_context = ssl.create_default_context(cafile=verify)
+        else:
+            ssl_context = True if verify else False
+        breaker = _circuit_breaker(self.circuit_breakers, url, api_suffix, endpoint)
+        retryable = _is_retryable(self.retry_policy, method, send_options, None)
+
+        attempt = 0
+        while True:
+            if breaker is not None and not breaker.allow():
+                raise CircuitOpenError(f'Circuit open for {method} {endpoint or url}; failing fast')
+            try:
+                if self.rate_limiter is not None:
+                    wait = self.rate_limiter.reserve(tenant, api_suffix)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                async with loop_session.semaphore:
+                    async with loop_session.session.request(method, url, auth=auth, ssl=ssl_context, **kwargs) as response:
+                        content = await response.read()
+                        response = AsyncResponse(response.status, response.headers, content, str(response.url),
+                                                 response.charset)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                if breaker is not None:
+                    _record_error(breaker, send_options, isinstance(error, asyncio.TimeoutError))
+                delay = self.retry_policy.retry_delay(attempt) if retryable else None
+                if delay is None:
+                    raise
+                logger.warning(f'{method} {url} failed with {error!r}. Retrying in {delay:.2f}s')
+            except BaseException:
+                # no outcome to record (e.g. a cancelled call)
+                if breaker is not None:
+                    breaker.release()
+                raise
+            else:
+                if breaker is not None:
+                    _record_response(breaker, send_options, response.status_code)
+                delay = None
+                if retryable:
+                    delay = self.retry_policy.retry_delay(attempt, response.status_code, response.headers)
+                if delay is None:
+                    return response
+                logger.warning(f'{method} {url} returned {response.status_code}. Retrying in {delay:.2f}s')
+
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def transfer_stats(self):
+        """
+        :return: dict of byte counters and compression ratios, see TransferStats.stats
+        """
+        return self.transfer.stats()
+
+    async def close(self):
+        """
+        close the session of the running event loop. the sessions of other event loops are left alone
+        """
+        loop = asyncio.get_running_loop()
+        with self._sessions_lock:
+            loop_session = self._sessions.pop(loop, None)
+        if loop_session is not None:
+            loop_session.closer.cancel()
+            await loop_session.session.close()
+
+
+class _LoopSession(object):
+    """
+    aiohttp session and request semaphore of one event loop
+    """
+
+    def __init__(self, session, semaphore):
+        self.session = session
+        self.semaphore = semaphore
+        self.closer = None  # task closing the session when its loop shuts down
+
+
+_default_async_transport = None
+
+
+def get_default_async_transport():
+    """
+    async transport shared by the async sdk functions, created on first use. it can be used from several event
+    loops at the same time; each loop gets its own session
+    :return: AsyncTransport
+    """
+    global _default_async_transport
+    if _default_async_transport is None:
+        with _default_transport_lock:
+            if _default_async_transport is None:
+                _default_async_transport = AsyncTransport()
+    return _default_async_transport
+
 
 class APIClient(object):
-    environment_info = None  # MUST be set by caller
+    environment_info = None  # MUST be set by caller, unless passed to the instance
+    transport = None  # optional; shared default transport is used when not set
+    async_transport = None  # optional; shared default async transport is used when not set
 
     def __init__(self, api_suffix, http_method_name, endpoint_suffix, path_arguments=None, query_arguments=None,
-                 headers=None, body=None, files=None, *args, **kwargs):
+                 headers=None, body=None, files=None, environment_info=None, transport=None, async_transport=None, idempotent=None,
+                 read_only=False, retry=True, timeout=None, expected_status_codes=(), expect_timeout=False, *args,
+                 **kwargs):
         '''
 
-        :param environment_info:
+        :param environment_info: api environment (see utils.generate_api_environment). overrides the class level
+        APIClient.environment_info for this call
+        :param transport: Transport used for this call. overrides the class level APIClient.transport
+        :param async_transport: AsyncTransport used by call_api_async. overrides APIClient.async_transport
+        :param idempotent: set to True for calls that can safely be retried although their method is not
+        idempotent (e.g. POST queries). by default only GET, HEAD, OPTIONS, PUT and DELETE calls are retried
+        :param read_only: set to True for calls that do not change server state although their method is not safe
+        (e.g. POST queries), so that they do not invalidate cached responses
+        :param retry: set to False to send the call once, without retries
+        :param timeout: timeout in seconds of this call. default: the timeout of the transport
+        :param expected_status_codes: status codes the caller handles itself; they are not recorded as failures on
+        the endpoint's circuit breaker (see Transport.request)
+        :param expect_timeout: set to True when the caller handles a timeout itself; it is not recorded as a failure
+        on the endpoint's circuit breaker
         :param api_suffix: suffix for api we're testing against (meta, master, etc.)
         :param http_method_name: http method to be used (in the form "GET", "POST", "DELETE", etc.)
         :param endpoint_suffix: endpoint path string, with path variables represented as {variable_name}
         :param path_arguments: dictionary of path argument values keyed by argument name (must match names in endpoint_suffix)
         :param query_arguments: dictionary of query argument values keyed by argument name. For values which are specified as arrays in the api, either lists or comma-delimited strings are accepted
         :param headers: header parameters to be passed in request (besides authentication header)
-        :param body: json object to be supplied as the request body
+        :param body: json object to be supplied as the request body. dicts and lists are encoded with the default
+        json codec (see codec.py); bytes and str are sent as they are
         :param expected_response_code: number for expected response
         :param expected_response_body: expected response in json
         :param args:
@@ -48,9 +771,24 @@ class APIClient(object):
         self.headers = headers
         self.body = body
         self.files = files
+        self.idempotent = idempotent
+        self.read_only = read_only
+        self.retry = retry
+        self.timeout = timeout
+        self.expected_status_codes = expected_status_codes
+        self.expect_timeout = expect_timeout
+        if environment_info is not None:
+            self.environment_info = environment_info
+        if transport is not None:
+            self.transport = transport
+        if async_transport is not None:
+            self.async_transport = async_transport
 
-    def call_api(self):
-
+    def _prepare_request(self):
+        """
+        resolve url, authentication and arguments of the call
+        :return: (url, dict of keyword arguments for the transport)
+        """
         if self.path_arguments is None:
             self.path_arguments = {}
         if self.headers is None:
@@ -69,15 +807,18 @@ class APIClient(object):
 
         #form url for connecting to APIs
         format_dict = {}
-        format_dict.update(APIClient.environment_info)
+        format_dict.update(self.environment_info)
         format_dict["api_suffix"] = self.api_suffix
 
         if "version" not in format_dict:
             format_dict["version"] = 'v1'
 
-        url = "https://{base_url}/api/{api_suffix}/{version}".format(**format_dict)
+        # base_url may carry its scheme, e.g. http://127.0.0.1:8080 for a local test server
+        if '://' not in format_dict["base_url"]:
+            format_dict["base_url"] = "https://" + format_dict["base_url"]
+        url = "{base_url}/api/{api_suffix}/{version}".format(**format_dict)
         url = (url + self.endpoint_suffix).format(**self.path_arguments)
-        print("url = " + url)
+        logger.debug(f'{self.http_method_name} {url}')
 
         cert_verify = True
         if "disableCertificateVerification" in self.environment_info:
@@ -87,20 +828,58 @@ class APIClient(object):
         if "isBasicAuth" in self.environment_info:
             basic_auth = True
 
+        body = self.body
+        if isinstance(body, (dict, list)):
+            body = dumps(body)
+
+        request_arguments = {'params': self.query_arguments, 'data': body, 'files': self.files,
+                             'verify': cert_verify, 'tenant': self.environment_info.get('tenant_id'),
+                             'api_suffix': self.api_suffix, 'endpoint': self.endpoint_suffix,
+                             'idempotent': self.idempotent, 'read_only': self.read_only, 'retry': self.retry,
+                             'expected_status_codes': self.expected_status_codes,
+                             'expect_timeout': self.expect_timeout}
+        if self.timeout is not None:
+            request_arguments['timeout'] = self.timeout
         if basic_auth:  # Use basic authentication
-            auth = (self.environment_info["API_USERNAME"], self.environment_info["API_PASSWORD"])
-            response = requests.request(self.http_method_name, url, auth=auth, headers=self.headers,
-                                        params=self.query_arguments, data=self.body, files=self.files,
-                                        verify=cert_verify,
-                                        timeout=60)
+            request_arguments['auth'] = (self.environment_info["API_USERNAME"], self.environment_info["API_PASSWORD"])
+            request_arguments['headers'] = self.headers
 
         else:  # Use token based authentication
             if self.headers is not None:
-                headers = {**self.environment_info["authentication_header"], **self.headers}
+                request_arguments['headers'] = {**self.environment_info["authentication_header"], **self.headers}
             else:
-                headers = {**self.environment_info["authentication_header"]}
-            response = requests.request(self.http_method_name, url, headers=headers, params=self.query_arguments,
-                                        data=self.body, files=self.files, verify=cert_verify, timeout=60)
+                request_arguments['headers'] = {**self.environment_info["authentication_header"]}
+
+        return url, request_arguments
+
+    def call_api(self, stream=False):
+        """
+        :param stream: when True, the response body is not downloaded up front. read it with
+        streaming.iter_response_records to parse a json array one record at a time; the response must be closed
+        :return: requests.Response
+        """
+        url, request_arguments = self._prepare_request()
+        if stream:
+            request_arguments['stream'] = True
+
+        transport = self.transport if self.transport is not None else get_default_transport()
+        response = transport.request(self.http_method_name, url, **request_arguments)
+
+        # Check the status code
+        if response.status_code != 200:
+            logger.warning(f'API call failed\n {response.text}')
+
+        return response
+
+    async def call_api_async(self):
+        """
+        same as call_api, sent through an AsyncTransport
+        :return: AsyncResponse
+        """
+        url, request_arguments = self._prepare_request()
+
+        transport = self.async_transport if self.async_transport is not None else get_default_async_transport()
+        response = await transport.request(self.http_method_name, url, **request_arguments)
 
         # Check the status code
         if response.status_code != 200:
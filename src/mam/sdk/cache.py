@@ -0,0 +1,455 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import os
+import json
+import stat
+import hashlib
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlencode
+
+logger = logging.getLogger(__name__)
+
+# seconds a GET response stays fresh, keyed by (api_suffix, endpoint template)
+# endpoints that are not listed are not cached
+DEFAULT_TTLS = {
+    ('catalog', '/{orgId}/function'): 3600,
+    ('constants', '/{orgId}'): 60,
+    ('master', '/{orgId}/entityType/{entityTypeName}/dimensional'): 60,
+    ('kpi', '/{orgId}/entityType/{entityTypeName}/kpiFunction'): 60,
+}
+
+
+class CacheEntry(object):
+    """
+    stored GET response
+    """
+
+    def __init__(self, status_code, headers, content, url, encoding, tenant, api_suffix, resource, expires_at):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.url = url
+        self.encoding = encoding
+        self.tenant = tenant
+        self.api_suffix = api_suffix
+        self.resource = resource
+        self.expires_at = expires_at
+
+    @property
+    def etag(self):
+        return self.headers.get('ETag') or self.headers.get('etag')
+
+    def is_fresh(self):
+        return time.time() < self.expires_at
+
+
+class MemoryCacheStore(object):
+    """
+    thread safe in-memory LRU store
+    """
+
+    def __init__(self, max_entries=256, on_evict=None):
+        '''
+
+        :param max_entries: entries kept; the least recently used ones are evicted beyond it
+        :param on_evict: callable (optional) called with the key of each evicted entry
+        '''
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        if self.on_evict is not None:
+            for evicted_key in evicted:
+                self.on_evict(evicted_key)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self):
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCacheStore(object):
+    """
+    store keeping one entry per file in a directory, so cached responses survive the process
+    an entry file holds a line of json with the key and the response metadata, followed by the raw response body.
+    nothing is unpickled, so a file planted in the directory cannot run code; it can only be a wrong cache entry.
+    the directory must belong to the user running the sdk and must not be accessible to other users, since the
+    cached responses hold tenant data. by default it is mam-sdk in the user's cache directory ($XDG_CACHE_HOME or
+    ~/.cache), created with mode 0700
+    """
+
+    def __init__(self, directory=None):
+        if directory is None:
+            user_cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+            directory = os.path.join(user_cache, 'mam-sdk')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        _check_private_directory(directory)
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        item = _read_entry(self._path(key))
+        if item is None or item[0] != key:
+            return None
+        return item[1]
+
+    def put(self, key, entry):
+        path = self._path(key)
+        metadata = {'key': list(key), 'status_code': entry.status_code, 'headers': dict(entry.headers),
+                    'url': entry.url, 'encoding': entry.encoding, 'tenant': entry.tenant,
+                    'api_suffix': entry.api_suffix, 'resource': entry.resource, 'expires_at': entry.expires_at}
+        # write to a temporary file first so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, 'wb') as F:
+            F.write(json.dumps(metadata).encode('utf-8') + b'\n')
+            F.write(entry.content)
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def items(self):
+        """
+        :return: list of (key, CacheEntry). reads every file of the directory
+        """
+        items = []
+        for name in os.listdir(self.directory):
+            item = _read_entry(os.path.join(self.directory, name))
+            if item is not None:
+                items.append(item)
+        return items
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+def _check_private_directory(directory):
+    """
+    raise PermissionError when directory belongs to another user or can be read or written by other users
+    """
+    if not hasattr(os, 'getuid'):  # no posix owner and mode bits (windows)
+        return
+    status = os.stat(directory)
+    if status.st_uid != os.getuid():
+        raise PermissionError(f'The cache directory {directory} belongs to another user. Use a directory of your own')
+    if status.st_mode & 0o077:
+        raise PermissionError(f'The cache directory {directory} is accessible to other users (mode '
+                              f'{stat.S_IMODE(status.st_mode):o}). Restrict it with chmod 700')
+
+
+def _read_entry(path):
+    """
+    :return: (key, CacheEntry) stored in the file at path, None when it is missing or not a cache entry
+    """
+    try:
+        with open(path, 'rb') as F:
+            metadata = json.loads(F.readline())
+            content = F.read()
+        key = tuple(metadata['key'])
+        entry = CacheEntry(metadata['status_code'], metadata['headers'], content, metadata['url'],
+                           metadata['encoding'], metadata['tenant'], metadata['api_suffix'], metadata['resource'],
+                           metadata['expires_at'])
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    return key, entry
+
+
+def _resource(url, api_suffix):
+    # path below /api/{api_suffix}/{version}, e.g. /{tenant}/entityType/{name}/kpiFunction
+    path = urlsplit(url).path
+    marker = f'/api/{api_suffix}/'
+    if api_suffix is not None and marker in path:
+        path = path.split(marker, 1)[1]
+        path = path[path.find('/'):] if '/' in path else ''
+    return path.rstrip('/')
+
+
+def _is_related(resource, other):
+    return resource == other or resource.startswith(other + '/') or other.startswith(resource + '/')
+
+
+class ResponseCache(object):
+    """
+    cache for GET responses of read endpoints
+    entries are kept in an in-memory LRU store and, optionally, in a disk store behind it
+    a fresh entry is returned without calling the api. an expired entry with an ETag is revalidated with
+    If-None-Match; a 304 answer renews the entry without downloading the body again
+    writes (POST, PUT, DELETE) made through the same transport invalidate the cached entries of the resource.
+    the keys of the stored entries are indexed by tenant and api suffix, so a write only looks at the entries it
+    can affect and does not read the disk store. the index of the disk store is read once, when the cache is
+    created; entries written to the same directory by other processes afterwards are indexed when they are read
+    """
+
+    def __init__(self, ttls=None, max_entries=256, disk_store=None):
+        '''
+
+        :param ttls: dict {(api_suffix, endpoint template): seconds} or {api_suffix: seconds}. defaults to
+        DEFAULT_TTLS. endpoints without a ttl are not cached
+        :param max_entries: size of the in-memory LRU store
+        :param disk_store: DiskCacheStore (optional) second level store
+        '''
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        # without a disk store, an entry evicted from memory is gone
+        self.memory_store = MemoryCacheStore(max_entries, on_evict=self._unindex if disk_store is None else None)
+        self.disk_store = disk_store
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'invalidated': 0}
+        self._index_lock = threading.Lock()
+        self._index = {}  # (tenant, api_suffix): {key: resource}
+        if disk_store is not None:
+            for key, entry in disk_store.items():
+                self._add_to_index(key, entry)
+
+    def ttl(self, api_suffix, endpoint):
+        """
+        :return: seconds responses of the endpoint stay fresh, None when the endpoint is not cached
+        """
+        ttl = self.ttls.get((api_suffix, endpoint))
+        if ttl is None:
+            ttl = self.ttls.get(api_suffix)
+        return ttl
+
+    @staticmethod
+    def key(tenant, url, params=None):
+        if params:
+            url = url + '?' + urlencode(sorted(params.items()))
+        return (tenant, url)
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def get(self, key):
+        """
+        :return: CacheEntry, fresh or stale, None when nothing is cached for the key
+        """
+        entry = self.memory_store.get(key)
+        if entry is None and self.disk_store is not None:
+            entry = self.disk_store.get(key)
+            if entry is not None:
+                self.memory_store.put(key, entry)
+                self._add_to_index(key, entry)
+        self._count('hits' if entry is not None and entry.is_fresh() else 'misses')
+        return entry
+
+    def put(self, key, status_code, headers, content, url, encoding, tenant, api_suffix, endpoint):
+        """
+        store a successful GET response
+        :return: CacheEntry or None when the endpoint is not cached
+        """
+        ttl = self.ttl(api_suffix, endpoint)
+        if not ttl:
+            return None
+        stored_headers = {name: value for name, value in headers.items()
+                          if name.lower() in ('etag', 'content-type', 'last-modified')}
+        entry = CacheEntry(status_code, stored_headers, content, url, encoding, tenant, api_suffix,
+                           _resource(url, api_suffix), time.time() + ttl)
+        self._store(key, entry)
+        return entry
+
+    def renew(self, key, entry, endpoint):
+        """
+        extend the lifetime of an entry after the server confirmed it with 304 Not Modified
+        """
+        entry.expires_at = time.time() + (self.ttl(entry.api_suffix, endpoint) or 0)
+        self._store(key, entry)
+        self._count('revalidated')
+        return entry
+
+    def _store(self, key, entry):
+        self.memory_store.put(key, entry)
+        if self.disk_store is not None:
+            self.disk_store.put(key, entry)
+        self._add_to_index(key, entry)
+
+    def _add_to_index(self, key, entry):
+        with self._index_lock:
+            self._index.setdefault((entry.tenant, entry.api_suffix), {})[key] = entry.resource
+
+    def _unindex(self, key):
+        with self._index_lock:
+            for index_key, resources in list(self._index.items()):
+                if resources.pop(key, None) is not None and not resources:
+                    del self._index[index_key]
+
+    def invalidate(self, tenant=None, api_suffix=None, resource=None):
+        """
+        drop cached entries
+        :param tenant: only entries of this tenant
+        :param api_suffix: only entries of this api suffix
+        :param resource: only entries of this resource path (below /api/{api_suffix}/{version}), its parents and
+        its children, e.g. /{tenant}/entityType/{entityTypeName}/kpiFunction
+        :return: number of entries dropped
+        """
+        if resource is not None:
+            resource = resource.rstrip('/')
+        keys = []
+        with self._index_lock:
+            for index_key, resources in list(self._index.items()):
+                if tenant is not None and index_key[0] != tenant:
+                    continue
+                if api_suffix is not None and index_key[1] != api_suffix:
+                    continue
+                related = [key for key, entry_resource in resources.items()
+                           if resource is None or _is_related(entry_resource, resource)]
+                for key in related:
+                    del resources[key]
+                if not resources:
+                    del self._index[index_key]
+                keys += related
+        stores = [self.memory_store] + ([self.disk_store] if self.disk_store is not None else [])
+        for key in keys:
+            for store in stores:
+                store.delete(key)
+        self._count('invalidated', len(keys))
+        return len(keys)
+
+    def invalidate_for_write(self, tenant, api_suffix, url):
+        """
+        drop entries made stale by a write to url
+        entity type lifecycle writes (meta api) drop every entry of the entity type, whatever its api
+        """
+        resource = _resource(url, api_suffix)
+        if api_suffix == 'meta':
+            parts = resource.split('/')
+            if 'entityType' in parts and parts.index('entityType') + 1 < len(parts):
+                resource = '/'.join(parts[:parts.index('entityType') + 2])
+            return self.invalidate(tenant=tenant, resource=resource)
+        return self.invalidate(tenant=tenant, api_suffix=api_suffix, resource=resource)
+
+    def clear(self):
+        with self._index_lock:
+            self._index.clear()
+        self.memory_store.clear()
+        if self.disk_store is not None:
+            self.disk_store.clear()
+
+    def stats(self):
+        """
+        :return: dict with hits, misses, revalidated and invalidated counters
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+# seconds entity type metadata read from the database stays fresh
+DEFAULT_METADATA_TTL = 600
+
+
+class MetadataCache(object):
+    """
+    cache for the metric table metadata of an entity type (metric table name, timestamp column, data items and
+    table columns), keyed by tenant, entity type name and db schema
+    loading many files for the same entity type queries the table columns once per ttl instead of once per file.
+    the entity type metadata itself is loaded by every new iotfunctions.db.Database connection; a DatabasePool
+    keeps the connections, and their metadata, between loads
+    entity type changes made through the sdk invalidate the entity type (MonitorClient.invalidate_entity_type)
+    """
+
+    def __init__(self, ttl=DEFAULT_METADATA_TTL, max_entries=256):
+        '''
+
+        :param ttl: seconds an entry stays fresh
+        :param max_entries: size of the in-memory LRU store
+        '''
+        self.ttl = ttl
+        self.memory_store = MemoryCacheStore(max_entries)
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'invalidated': 0}
+
+    def _count(self, name, value=1):
+        with self._stats_lock:
+            self._stats[name] += value
+
+    def get(self, tenant, entity_type_name, db_schema, load):
+        """
+        :param load: callable returning the metadata, called when nothing fresh is cached. None is not cached
+        :return: metadata
+        """
+        key = (tenant, entity_type_name, db_schema)
+        entry = self.memory_store.get(key)
+        if entry is not None and time.time() < entry[0]:
+            self._count('hits')
+            return entry[1]
+        self._count('misses')
+        metadata = load()
+        if metadata is not None:
+            self.memory_store.put(key, (time.time() + self.ttl, metadata))
+        return metadata
+
+    def invalidate(self, tenant=None, entity_type_name=None):
+        """
+        drop cached entries
+        :param tenant: only entries of this tenant
+        :param entity_type_name: only entries of this entity type
+        :return: number of entries dropped
+        """
+        keys = [key for key, _ in self.memory_store.items()
+                if (tenant is None or key[0] == tenant) and (entity_type_name is None or key[1] == entity_type_name)]
+        for key in keys:
+            self.memory_store.delete(key)
+        self._count('invalidated', len(keys))
+        return len(keys)
+
+    def clear(self):
+        self.memory_store.clear()
+
+    def stats(self):
+        """
+        :return: dict with hits, misses and invalidated counters
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+_default_metadata_cache = MetadataCache()
+
+
+def get_default_metadata_cache():
+    """
+    metadata cache shared by all sdk functions unless they are given their own
+    :return: MetadataCache
+    """
+    return _default_metadata_cache
@@ -0,0 +1,248 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import threading
+import logging
+
+# mam-sdk modules
+from .utils import generate_api_environment
+from .apiclient import (APIClient, Transport, AsyncTransport, get_default_transport, get_default_async_transport)
+from .cache import (get_default_metadata_cache)
+from .dbpool import (invalidate_database_pools)
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorClient(object):
+    """
+    client bound to a single tenant
+    the api environment is built once from the credentials and every call made through the client uses the
+    client's own transport, so one process can drive several tenants from parallel threads without sharing state
+
+    usage:
+    ```
+    client = MonitorClient(credentials)
+    client.get_constants(entity_type_name='sample_entity_type_name')
+    ```
+    """
+
+    def __init__(self, credentials, transport=None, async_transport=None, **transport_settings):
+        '''
+
+        :param credentials: dict analytics-service dev credentials
+        :param transport: Transport to send api calls through. a new one is created when not provided
+        :param async_transport: AsyncTransport for the `*_async` functions. a new one is created when not provided
+        :param transport_settings: pool settings for the new transport (see apiclient.Transport)
+        '''
+        self.credentials = credentials
+        self.environment_info = generate_api_environment(credentials)
+        self.tenant_id = self.environment_info['tenant_id']
+        if transport is None:
+            transport = Transport(**transport_settings)
+        self.transport = transport
+        if async_transport is None:
+            # share the response cache, so writes through either transport invalidate it
+            async_transport = AsyncTransport(cache=transport.cache or False,
+                                             compress_threshold=transport.compress_threshold,
+                                             compress_level=transport.compress_level,
+                                             metrics=transport.metrics or False)
+        self.async_transport = async_transport
+
+    @property
+    def cache(self):
+        """ResponseCache of the client's transport (None when caching is disabled)"""
+        return self.transport.cache
+
+    def api_client(self, api_suffix, http_method_name, endpoint_suffix, **kwargs):
+        """
+        APIClient bound to this client's environment and transport
+        :param api_suffix: suffix for api (meta, master, etc.)
+        :param http_method_name: http method to be used
+        :param endpoint_suffix: endpoint path string, with path variables represented as {variable_name}
+        :param kwargs: remaining APIClient arguments
+        :return: APIClient
+        """
+        return APIClient(api_suffix=api_suffix,
+                         http_method_name=http_method_name,
+                         endpoint_suffix=endpoint_suffix,
+                         environment_info=self.environment_info,
+                         transport=self.transport,
+                         async_transport=self.async_transport,
+                         **kwargs)
+
+    def invalidate_entity_type(self, entity_type_name):
+        """
+        drop cached responses, database metadata and pooled database connections of an entity type, and the
+        tenant's constants
+        needed after changes that are not made through the api (e.g. kpis published through the database)
+        """
+        get_default_metadata_cache().invalidate(tenant=self.tenant_id, entity_type_name=entity_type_name)
+        invalidate_database_pools(tenant=self.tenant_id, entity_type=entity_type_name)
+        if self.cache is None:
+            return
+        self.cache.invalidate(tenant=self.tenant_id, resource=f'/{self.tenant_id}/entityType/{entity_type_name}')
+        self.cache.invalidate(tenant=self.tenant_id, api_suffix='constants')
+
+    def close(self):
+        self.transport.close()
+
+    # constants
+    def create_constants(self, json_payload):
+        from . import constants
+        return constants.create_constants(json_payload, credentials=self.credentials, client=self)
+
+    def get_constants(self, entity_type_name=None):
+        from . import constants
+        return constants.get_constants(entity_type_name, credentials=self.credentials, client=self)
+
+    def update_constants(self, json_payload):
+        from . import constants
+        return constants.update_constants(json_payload, credentials=self.credentials, client=self)
+
+    def remove_constants(self, constant_names):
+        from . import constants
+        return constants.remove_constants(constant_names, credentials=self.credentials, client=self)
+
+    # dimensions
+    def add_dimensions_data(self, json_payload):
+        from . import dimension
+        return dimension.add_dimensions_data(json_payload, credentials=self.credentials, client=self)
+
+    def update_dimensions_data(self, json_payload):
+        from . import dimension
+        return dimension.update_dimensions_data(json_payload, credentials=self.credentials, client=self)
+
+    def get_dimensions_data(self, entity_type_name):
+        from . import dimension
+        return dimension.get_dimensions_data(entity_type_name, credentials=self.credentials, client=self)
+
+    def get_dimensions_data_stream(self, entity_type_name, **kwargs):
+        from . import dimension
+        return dimension.get_dimensions_data_stream(entity_type_name, credentials=self.credentials, client=self,
+                                                    **kwargs)
+
+    def remove_dimensions(self, dimension_names, entity_type_name):
+        from . import dimension
+        return dimension.remove_dimensions(dimension_names, entity_type_name, credentials=self.credentials,
+                                           client=self)
+
+    # kpi functions
+    def add_functions(self, json_payload, database_pool=None):
+        from . import kpifunction
+        return kpifunction.add_functions(json_payload, credentials=self.credentials, client=self,
+                                         database_pool=database_pool)
+
+    def get_functions(self, entity_type_name):
+        from . import kpifunction
+        return kpifunction.get_functions(entity_type_name, credentials=self.credentials, client=self)
+
+    def remove_function(self, entity_type_name, kpi_name):
+        from . import kpifunction
+        return kpifunction.remove_function(entity_type_name, kpi_name, credentials=self.credentials, client=self)
+
+    def get_catalog_functions(self):
+        from . import parseinput
+        return parseinput.get_catalog_functions(credentials=self.credentials, client=self)
+
+    # alerts
+    def get_alerts(self, json_payload):
+        from . import alerts
+        return alerts.get_alerts(json_payload, credentials=self.credentials, client=self)
+
+    def get_alerts_stream(self, json_payload, **kwargs):
+        from . import alerts
+        return alerts.get_alerts_stream(json_payload, credentials=self.credentials, client=self, **kwargs)
+
+    def get_alerts_frame(self, json_payload, **kwargs):
+        from . import alerts
+        return alerts.get_alerts_frame(json_payload, credentials=self.credentials, client=self, **kwargs)
+
+    def get_alerts_windowed(self, json_payload, **kwargs):
+        from . import alerts
+        return alerts.get_alerts_windowed(json_payload, credentials=self.credentials, client=self, **kwargs)
+
+    def watch_alerts(self, entity_types_filter, **kwargs):
+        from .alertwatch import AlertWatcher
+        return AlertWatcher(entity_types_filter, credentials=self.credentials, client=self, **kwargs)
+
+    def update_alert_status(self, alert_id, new_status):
+        from . import alerts
+        return alerts.update_alert_status(alert_id, new_status, credentials=self.credentials, client=self)
+
+    def update_alert_severity(self, alert_id, new_severity):
+        from . import alerts
+        return alerts.update_alert_severity(alert_id, new_severity, credentials=self.credentials, client=self)
+
+    def bulk_update_alert_status(self, updates, **kwargs):
+        from . import alerts
+        return alerts.bulk_update_alert_status(updates, credentials=self.credentials, client=self, **kwargs)
+
+    def bulk_update_alert_severity(self, updates, **kwargs):
+        from . import alerts
+        return alerts.bulk_update_alert_severity(updates, credentials=self.credentials, client=self, **kwargs)
+
+    # entity types
+    def create_custom_entitytype(self, json_payload, **kwargs):
+        from . import entitytype
+        return entitytype.create_custom_entitytype(json_payload, credentials=self.credentials, client=self,
+                                                   **kwargs)
+
+    def load_metrics_data_from_csv(self, entity_type_name, file_path, **kwargs):
+        from . import entitytype
+        return entitytype.load_metrics_data_from_csv(entity_type_name, file_path, credentials=self.credentials,
+                                                     client=self, **kwargs)
+
+    def load_metrics_data_from_parquet(self, entity_type_name, file_path, **kwargs):
+        from . import entitytype
+        return entitytype.load_metrics_data_from_parquet(entity_type_name, file_path, credentials=self.credentials,
+                                                         client=self, **kwargs)
+
+    def load_metrics_data_from_arrow(self, entity_type_name, file_path, **kwargs):
+        from . import entitytype
+        return entitytype.load_metrics_data_from_arrow(entity_type_name, file_path, credentials=self.credentials,
+                                                       client=self, **kwargs)
+
+    def remove_entitytype(self, entity_type_name):
+        from . import entitytype
+        return entitytype.remove_entitytype(entity_type_name, credentials=self.credentials, client=self)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _credentials_key(credentials):
+    if credentials is None:
+        raise Exception("No credentials provided")
+    iotp = credentials.get('iotp') or {}
+    return (credentials.get('tenantId'), iotp.get('asHost'), iotp.get('apiKey'), iotp.get('apiToken'))
+
+
+def get_client(credentials=None, client=None):
+    """
+    client to use for a module level sdk call
+    returns `client` when given. otherwise returns a MonitorClient for the credentials that is built once per
+    tenant and reused by later calls with the same credentials. these clients use the shared default transport
+
+    :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional)
+    :return: MonitorClient
+    """
+    if client is not None:
+        return client
+
+    key = _credentials_key(credentials)
+    transport = get_default_transport()
+    with _clients_lock:
+        shared_client = _clients.get(key)
+        if shared_client is None or shared_client.transport is not transport:
+            shared_client = MonitorClient(credentials, transport=transport,
+                                          async_transport=get_default_async_transport())
+            _clients[key] = shared_client
+    return shared_client
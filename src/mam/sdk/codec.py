@@ -0,0 +1,171 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import sys
+import json
+import datetime
+import importlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# preferred backends first; the first one installed becomes the default
+PREFERRED_BACKENDS = ['orjson', 'ujson', 'json']
+
+
+class JSONCodec(object):
+    """
+    json encoder/decoder backed by the standard library
+    dumps returns utf-8 encoded bytes, ready to be sent as a request body. like orjson, it encodes numpy scalars
+    and arrays as numbers and lists, and dates and times as iso 8601 strings
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=_encode_default).encode('utf-8')
+
+    def loads(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """
+    codec backed by orjson. objects orjson cannot serialize (e.g. non-str dict keys) fall back to the stdlib
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def dumps(self, obj):
+        try:
+            return self._orjson.dumps(obj, option=self._orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            return super().dumps(obj)
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """
+    codec backed by ujson. objects ujson cannot serialize fall back to the stdlib
+    """
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj):
+        try:
+            return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+        except (TypeError, OverflowError):
+            return super().dumps(obj)
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+def _encode_default(obj):
+    """
+    json.dumps default= for the types orjson encodes natively
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    # numpy objects can only exist once numpy was imported, so it is not imported here
+    numpy = sys.modules.get('numpy')
+    if numpy is not None:
+        if isinstance(obj, (numpy.datetime64, numpy.ndarray)) and obj.dtype.kind == 'M':
+            # as datetime objects, encoded above
+            return obj.astype('datetime64[us]').tolist()
+        if isinstance(obj, (numpy.generic, numpy.ndarray)):
+            return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+_codec_classes = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+}
+
+
+def get_codec(name=None):
+    """
+    :param name: str backend name (json, orjson, ujson). None picks the first installed of PREFERRED_BACKENDS
+    :return: JSONCodec
+    """
+    if name is not None:
+        if name not in _codec_classes:
+            raise NotImplementedError(f'Unknown json codec {name}. Available codecs: {list(_codec_classes)}')
+        return _codec_classes[name]()
+
+    for backend in PREFERRED_BACKENDS:
+        try:
+            return get_codec(backend)
+        except ImportError:
+            continue
+    return JSONCodec()
+
+
+def available_codecs():
+    """
+    :return: list of names of the codecs whose backend is installed
+    """
+    names = []
+    for name in _codec_classes:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+_default_codec = None
+
+
+def get_default_codec():
+    """
+    codec used by APIClient and the payload builders, picked on first use
+    :return: JSONCodec
+    """
+    global _default_codec
+    if _default_codec is None:
+        _default_codec = get_codec()
+        logger.debug(f'Using {_default_codec.name} json codec')
+    return _default_codec
+
+
+def set_default_codec(name):
+    """
+    :param name: str backend name (json, orjson, ujson)
+    :return: JSONCodec
+    """
+    global _default_codec
+    _default_codec = get_codec(name)
+    return _default_codec
+
+
+def dumps(obj):
+    """
+    encode obj as utf-8 json bytes with the default codec
+    """
+    return get_default_codec().dumps(obj)
+
+
+def loads(data):
+    """
+    decode json bytes or str with the default codec
+    """
+    return get_default_codec().loads(data)
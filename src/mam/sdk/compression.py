@@ -0,0 +1,87 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import gzip
+import threading
+
+# request bodies of at least this many bytes are gzip compressed
+DEFAULT_COMPRESS_THRESHOLD = 1024 * 1024
+DEFAULT_COMPRESS_LEVEL = 6
+ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def body_length(data):
+    """
+    :return: int length in bytes of a request body, 0 for empty or streamed bodies
+    """
+    if isinstance(data, str):
+        return len(data.encode('utf-8'))
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    return 0
+
+
+def compress_body(data, threshold=DEFAULT_COMPRESS_THRESHOLD, level=DEFAULT_COMPRESS_LEVEL):
+    """
+    gzip a request body
+    :param data: bytes or str request body
+    :param threshold: int minimum body size in bytes to compress. None disables compression
+    :param level: int gzip compression level 1 (fast) - 9 (small)
+    :return: bytes compressed body, None when the body is not compressed
+    """
+    if threshold is None or data is None:
+        return None
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    if not isinstance(data, (bytes, bytearray)) or len(data) < threshold:
+        return None
+    return gzip.compress(data, compresslevel=level)
+
+
+class TransferStats(object):
+    """
+    byte counters of a transport
+    request_bytes: size of request bodies before compression, request_bytes_sent: size actually sent
+    response_bytes_received: size of response bodies on the wire, response_bytes: size after decompression
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'compressed_requests': 0, 'request_bytes': 0, 'request_bytes_sent': 0,
+                          'responses': 0, 'response_bytes_received': 0, 'response_bytes': 0}
+
+    def record_request(self, raw_bytes, sent_bytes):
+        with self._lock:
+            self._counters['requests'] += 1
+            self._counters['compressed_requests'] += int(sent_bytes != raw_bytes)
+            self._counters['request_bytes'] += raw_bytes
+            self._counters['request_bytes_sent'] += sent_bytes
+
+    def record_response(self, received_bytes, decoded_bytes):
+        with self._lock:
+            self._counters['responses'] += 1
+            self._counters['response_bytes_received'] += received_bytes
+            self._counters['response_bytes'] += decoded_bytes
+
+    def stats(self):
+        """
+        :return: dict of counters plus request_compression_ratio and response_compression_ratio
+        (uncompressed size / transferred size, 1.0 when nothing was compressed)
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['request_compression_ratio'] = _ratio(stats['request_bytes'], stats['request_bytes_sent'])
+        stats['response_compression_ratio'] = _ratio(stats['response_bytes'], stats['response_bytes_received'])
+        return stats
+
+
+def _ratio(uncompressed, transferred):
+    if not transferred:
+        return 1.0
+    return uncompressed / transferred
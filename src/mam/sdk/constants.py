@@ -9,18 +9,13 @@
 # python libraries
 import json
 import logging
-from jsonschema import validate
-
-# iotfunctions modules
-from iotfunctions.db import (Database)
 
 # mam-sdk modules
 from .utils import *
 from .parseinput import *
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .codec import (dumps, loads)
 
-from iotfunctions.util import setup_logging
-setup_logging(as_log_level=logging.DEBUG, root_log_level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # /constants/v1/{tenantName} POST GET PUT DELETE
@@ -87,7 +82,38 @@ def _constant_name_to_payload(constant_names):
     return payload
 
 
-def create_constants(json_payload, credentials=None):
+def _create_constants_request(json_payload, client, http_method_name="POST"):
+    """
+    validate a create/update constants json payload and build the api call for it
+    :return: APIClient
+    """
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    payload = validateJSON(json_payload)  # input is valid json
+    validate(instance=payload, schema=create_constant_schema)  # input has valid schema
+
+    # 2. INPUT PARSING
+    entity_type_name = None
+    if 'entity_type_name' in payload:
+        entity_type_name = payload['entity_type_name']
+
+    constants = None
+    if 'constants' in payload:
+        constants = payload['constants']
+        constants = parse_input_constants(constants)
+
+    body_arguments = dumps(_ui_constant_to_payload(constants, entity_type_name))
+
+    # 3. API CONNECTION
+    logger.debug('Connecting to API')
+    return client.api_client(api_suffix="constants",
+                             http_method_name=http_method_name,
+                             endpoint_suffix="/{orgId}",
+                             body=body_arguments,
+                             )
+
+
+def create_constants(json_payload, credentials=None, client=None):
     """
    Register one or more server properties that can be used as entity type
    properties in the AS UI
@@ -95,6 +121,7 @@ def create_constants(json_payload, credentials=None):
         POST /api/constants/v1/{orgId}
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param json_payload:
     ```
     {
@@ -113,71 +140,80 @@ def create_constants(json_payload, credentials=None):
     ```
     :return:
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    payload = validateJSON(json_payload)  # input is valid json
-    validate(instance=payload, schema=create_constant_schema)  # input has valid schema
+    client = get_client(credentials, client)
+    # call api to create constants for a tenant
+    response = _create_constants_request(json_payload, client, "POST").call_api()
 
-    # 2. INPUT PARSING
-    entity_type_name = None
-    if 'entity_type_name' in payload:
-        entity_type_name = payload['entity_type_name']
+    if response.status_code != 200:
+        raise Exception('API Client call failed when adding constants')
 
-    constants = None
-    if 'constants' in payload:
-        constants = payload['constants']
-        constants = parse_input_constants(constants)
+    return loads(response.content)
 
-    create_arguments = json.dumps(_ui_constant_to_payload(constants, entity_type_name)).encode('utf-8')
 
-    # 3. API CONNECTION: GET all constants for a tenant
-    logger.debug('Connecting to API')
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to create constants for a tenant
-    response = APIClient(api_suffix="constants",
-                         http_method_name="POST",
-                         endpoint_suffix="/{orgId}",
-                         body=create_arguments,
-                         ).call_api()
+async def create_constants_async(json_payload, credentials=None, client=None):
+    """
+    async version of create_constants
+    """
+    client = get_client(credentials, client)
+    response = await _create_constants_request(json_payload, client, "POST").call_api_async()
 
     if response.status_code != 200:
         raise Exception('API Client call failed when adding constants')
 
-    return response.json()
+    return loads(response.content)
+
+
+def _get_constants_request(entity_type_name, client):
+    query_arguments = {}
+    if entity_type_name is not None:
+        query_arguments['entityType'] = entity_type_name
+    return client.api_client(api_suffix="constants",
+                             http_method_name="GET",
+                             endpoint_suffix="/{orgId}",
+                             query_arguments=query_arguments,
+                             )
 
 
-def get_constants(entity_type_name=None, credentials=None, ):
+def get_constants(entity_type_name=None, credentials=None, client=None):
     """
     get all constants for a tenant
     Uses the following APIs:
         GET /api/constants/v1/{orgId}
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param entity_type_name: str (optional) filter by entity_type_name
     :return: json object: list of dict with constants information
     """
     # 1. API CONNECTION: GET all constants for a tenant
     logger.debug('Connecting to API')
-    query_arguments = {}
-    if entity_type_name is not None:
-        query_arguments['entityType'] = entity_type_name
-    APIClient.environment_info = generate_api_environment(credentials)
+    client = get_client(credentials, client)
     # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="constants",
-                         http_method_name="GET",
-                         endpoint_suffix="/{orgId}",
-                         query_arguments=query_arguments,
-                         ).call_api()
+    response = _get_constants_request(entity_type_name, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting constants')
+
+    return loads(response.content)
+
+
+async def get_constants_async(entity_type_name=None, credentials=None, client=None):
+    """
+    async version of get_constants
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _get_constants_request(entity_type_name, client).call_api_async()
     if response.status_code != 200:
         raise Exception('API Client call failed when getting constants')
 
-    return response.json()
+    return loads(response.content)
 
 
-def update_constants(json_payload, credentials=None):
+def update_constants(json_payload, credentials=None, client=None):
     """
     update constants
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param json_payload:
     ```
     {
@@ -195,61 +231,69 @@ def update_constants(json_payload, credentials=None):
     ```
     :return:
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    payload = validateJSON(json_payload)  # input is valid json
-    validate(instance=payload, schema=create_constant_schema)  # input has valid schema
+    client = get_client(credentials, client)
+    # call api to update constants for a tenant
+    response = _create_constants_request(json_payload, client, "PUT").call_api()
 
-    # 2. INPUT PARSING
-    entity_type_name = None
-    if 'entity_type_name' in payload:
-        entity_type_name = payload['entity_type_name']
+    if response.status_code != 200:
+        raise Exception('API Client call failed when updating constants')
 
-    constants = None
-    if 'constants' in payload:
-        constants = payload['constants']
-        constants = parse_input_constants(constants)
+    return loads(response.content)
 
-    update_arguments = json.dumps(_ui_constant_to_payload(constants, entity_type_name)).encode('utf-8')
 
-    # 3. API CONNECTION: GET all constants for a tenant
-    logger.debug('Connecting to API')
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="constants",
-                         http_method_name="PUT",
-                         endpoint_suffix="/{orgId}",
-                         body=update_arguments,
-                         ).call_api()
+async def update_constants_async(json_payload, credentials=None, client=None):
+    """
+    async version of update_constants
+    """
+    client = get_client(credentials, client)
+    response = await _create_constants_request(json_payload, client, "PUT").call_api_async()
 
     if response.status_code != 200:
         raise Exception('API Client call failed when updating constants')
 
-    return response.json()
+    return loads(response.content)
+
 
+def _remove_constants_request(constant_names, client):
+    body_arguments = dumps(_constant_name_to_payload(constant_names))
+    return client.api_client(api_suffix="constants",
+                             http_method_name="DELETE",
+                             endpoint_suffix="/{orgId}",
+                             body=body_arguments,
+                             )
 
-def remove_constants(constant_names, credentials=None):
+
+def remove_constants(constant_names, credentials=None, client=None):
     """
      Unregister constants by name
      Uses the following APIs:
         DELETE /api/constants/v1/{orgId}
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param constant_names: a str with a constant name or list of constant names
     :return:
     """
     # 1. API CONNECTION
     # :description: to access Watson IOT Platform Analytics.
     logger.debug('Connecting to API')
-    body_arguments = json.dumps(_constant_name_to_payload(constant_names)).encode('utf-8')
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="constants",
-                         http_method_name="DELETE",
-                         endpoint_suffix="/{orgId}",
-                         body=body_arguments,
-                         ).call_api()
+    client = get_client(credentials, client)
+    # call api to delete constants for a tenant
+    response = _remove_constants_request(constant_names, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when deleting constants')
+
+    return loads(response.content)
+
+
+async def remove_constants_async(constant_names, credentials=None, client=None):
+    """
+    async version of remove_constants
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _remove_constants_request(constant_names, client).call_api_async()
     if response.status_code != 200:
         raise Exception('API Client call failed when deleting constants')
 
-    return response.json()
+    return loads(response.content)
@@ -0,0 +1,203 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import json
+import hashlib
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# idle connections kept per key
+DEFAULT_MAX_IDLE = 4
+
+# pools alive in the process, so entity type changes can drop their stale connections
+_pools = weakref.WeakSet()
+
+
+class DatabasePool(object):
+    """
+    pool of iotfunctions Database connections keyed by credentials, db schema and the entity type whose metadata the
+    connection loaded (None for all entity types)
+    creating a Database opens a connection and loads entity type metadata from the api; functions given the same
+    pool reuse idle connections instead. a connection is used by one caller at a time
+
+    usage:
+    ```
+    with DatabasePool() as pool:
+        entitytype.create_custom_entitytype(json_payload, credentials, database_pool=pool)
+        entitytype.load_metrics_data_from_csv('pump_fleet', 'pump_fleet.csv', credentials, database_pool=pool)
+        print(pool.stats())
+    ```
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE):
+        '''
+
+        :param max_idle: idle connections kept per key; connections returned beyond it are closed
+        '''
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}  # key: list of Database
+        self._in_use = {}  # id(Database): (key, generation)
+        self._generations = {}  # key: generation, increased when the key's connections are invalidated
+        self._closed = False
+        self._stats = {'created': 0, 'reused': 0, 'returned': 0, 'released': 0, 'invalidated': 0}
+        _pools.add(self)
+
+    @staticmethod
+    def key(credentials=None, entity_type=None, db_schema=None):
+        """
+        :return: (tenant id, credentials fingerprint, db schema, entity type name)
+        """
+        if credentials is None:
+            # iotfunctions reads the credentials from the environment
+            return (None, None, db_schema, entity_type)
+        fingerprint = hashlib.sha256(json.dumps(credentials, sort_keys=True, default=str).encode('utf-8'))
+        return (credentials.get('tenantId'), fingerprint.hexdigest(), db_schema, entity_type)
+
+    def acquire(self, credentials=None, entity_type=None, db_schema=None):
+        """
+        idle connection of the key, or a new one
+        :param credentials: dict analytics-service dev credentials
+        :param entity_type: str (optional) entity type name whose metadata the connection loads
+        :param db_schema: str (optional) schema the connection is used for
+        :return: iotfunctions.db.Database, to give back with release()
+        """
+        key = self.key(credentials, entity_type, db_schema)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Database pool is closed')
+            idle = self._idle.get(key)
+            db = idle.pop() if idle else None
+            generation = self._generations.get(key, 0)
+            self._stats['reused' if db is not None else 'created'] += 1
+        if db is None:
+            from iotfunctions.db import (Database)
+            logger.debug('Connecting to Database')
+            if entity_type is None:
+                db = Database(credentials=credentials)
+            else:
+                db = Database(credentials=credentials, entity_type=entity_type)
+        with self._lock:
+            self._in_use[id(db)] = (key, generation)
+        return db
+
+    def release(self, db):
+        """
+        give back a connection from acquire(). it is kept idle for the next caller, or closed when the pool is
+        closed, the key was invalidated or enough connections of the key are idle
+        """
+        with self._lock:
+            key, generation = self._in_use.pop(id(db))
+            self._stats['returned'] += 1
+            idle = self._idle.setdefault(key, [])
+            keep = not self._closed and generation == self._generations.get(key, 0) and len(idle) < self.max_idle
+            if keep:
+                idle.append(db)
+            else:
+                self._stats['released'] += 1
+        if not keep:
+            db.release_resource()
+
+    @contextmanager
+    def session(self, credentials=None, entity_type=None, db_schema=None):
+        """
+        connection of the pool for the duration of a with block
+        :return: iotfunctions.db.Database
+        """
+        db = self.acquire(credentials, entity_type=entity_type, db_schema=db_schema)
+        try:
+            yield db
+        finally:
+            self.release(db)
+
+    def invalidate(self, tenant=None, entity_type=None):
+        """
+        close the connections whose entity type metadata is stale: idle ones now, the ones in use when they are
+        given back
+        :param tenant: only connections of this tenant
+        :param entity_type: only connections that loaded this entity type
+        :return: number of keys invalidated
+        """
+        with self._lock:
+            keys = {key for key, idle in self._idle.items() if idle} | {key for key, _ in self._in_use.values()}
+            keys = [key for key in keys
+                    if (tenant is None or key[0] == tenant) and (entity_type is None or key[3] == entity_type)]
+            stale = []
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                stale += self._idle.pop(key, [])
+            self._stats['invalidated'] += len(keys)
+            self._stats['released'] += len(stale)
+        for db in stale:
+            db.release_resource()
+        return len(keys)
+
+    def close(self):
+        """
+        close the idle connections; connections in use are closed when they are given back
+        """
+        with self._lock:
+            self._closed = True
+            stale = [db for idle in self._idle.values() for db in idle]
+            self._idle = {}
+            self._stats['released'] += len(stale)
+        for db in stale:
+            db.release_resource()
+
+    def stats(self):
+        """
+        :return: dict with created, reused, returned, released and invalidated counters, and the connections in use
+        and idle
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_use'] = len(self._in_use)
+            stats['idle'] = sum(len(idle) for idle in self._idle.values())
+        return stats
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def invalidate_database_pools(tenant=None, entity_type=None):
+    """
+    drop the pooled connections whose metadata of entity_type is stale, in every pool of the process
+    """
+    for pool in list(_pools):
+        pool.invalidate(tenant=tenant, entity_type=entity_type)
+
+
+@contextmanager
+def database_session(credentials=None, entity_type=None, db_schema=None, database_pool=None):
+    """
+    connection from database_pool, or a new connection closed at the end of the with block when there is no pool
+    :return: iotfunctions.db.Database
+    """
+    if database_pool is not None:
+        with database_pool.session(credentials, entity_type=entity_type, db_schema=db_schema) as db:
+            yield db
+        return
+    from iotfunctions.db import (Database)
+    logger.debug('Connecting to Database')
+    if entity_type is None:
+        db = Database(credentials=credentials)
+    else:
+        db = Database(credentials=credentials, entity_type=entity_type)
+    try:
+        yield db
+    finally:
+        # CLOSE DB CONNECTION
+        db.release_resource()
@@ -9,19 +9,14 @@
 # python libraries
 import json
 import logging
-from jsonschema import validate
-
-# iotfunctions modules
-from iotfunctions.metadata import (BaseCustomEntityType)
-from iotfunctions.db import (Database)
 
 # mam-sdk modules
 from .utils import *
 from .parseinput import *
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .codec import (dumps, loads)
+from .streaming import (DEFAULT_CHUNK_SIZE, iter_response_records)
 
-from iotfunctions.util import setup_logging
-setup_logging(as_log_level=logging.DEBUG, root_log_level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # schema expected for creating constants
@@ -63,7 +58,36 @@ def _dimension_data_to_payload(dimensions):
     return payload
 
 
-def add_dimensions_data(json_payload, credentials=None):
+def _add_dimensions_data_request(json_payload, client):
+    """
+    validate an add dimensions json payload and build the api call for it
+    :return: APIClient
+    """
+    # 1. INPUT CHECKING
+    logger.debug('Performing Input Checking')
+    payload = validateJSON(json_payload)  # input is valid json
+    # validate(instance=payload, schema=create_dimension_data_schema)  # input has valid schema
+
+    # 2. INPUT PARSING
+    entity_type_name = payload['entity_type_name']
+    dimension_data = payload['dimension_data']
+
+    create_arguments = parse_input_dimension_data(dimension_data)
+    create_arguments = dumps(_dimension_data_to_payload(create_arguments))
+
+    # API CONNECTION
+    logger.debug('Connecting to API')
+
+    path_arguments = {'entityTypeName': entity_type_name}
+    return client.api_client(api_suffix="master",
+                             http_method_name="POST",
+                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
+                             path_arguments=path_arguments,
+                             body=create_arguments
+                             )
+
+
+def add_dimensions_data(json_payload, credentials=None, client=None):
     """
     add dimensional data to a given entity type
     Uses API:
@@ -72,6 +96,7 @@ def add_dimensions_data(json_payload, credentials=None):
     Note:
     if there is no dimensional value with name specified, this will create a table
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param json_payload:
     ```
     {
@@ -89,38 +114,30 @@ def add_dimensions_data(json_payload, credentials=None):
     }
     :return:
     """
-    # 1. INPUT CHECKING
-    logger.debug('Performing Input Checking')
-    payload = validateJSON(json_payload)  # input is valid json
-    # validate(instance=payload, schema=create_dimension_data_schema)  # input has valid schema
+    client = get_client(credentials, client)
+    # call api to add dimension data to the entity type
+    response = _add_dimensions_data_request(json_payload, client).call_api()
 
-    # 2. INPUT PARSING
-    entity_type_name = payload['entity_type_name']
-    dimension_data = payload['dimension_data']
+    if response.status_code != 200:
+        raise Exception('API Client call failed when adding dimensions')
 
-    create_arguments = parse_input_dimension_data(dimension_data)
-    create_arguments = json.dumps(_dimension_data_to_payload(create_arguments)).encode('utf-8')
+    return loads(response.content)
 
-    # API CONNECTION: GET all constants for a tenant
-    logger.debug('Connecting to API')
 
-    path_arguments = {'entityTypeName': entity_type_name}
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="master",
-                         http_method_name="POST",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
-                         path_arguments=path_arguments,
-                         body=create_arguments
-                         ).call_api()
+async def add_dimensions_data_async(json_payload, credentials=None, client=None):
+    """
+    async version of add_dimensions_data
+    """
+    client = get_client(credentials, client)
+    response = await _add_dimensions_data_request(json_payload, client).call_api_async()
 
     if response.status_code != 200:
         raise Exception('API Client call failed when adding dimensions')
 
-    return response.json()
+    return loads(response.content)
 
 
-def update_dimensions_data(json_payload, credentials=None):
+def update_dimensions_data(json_payload, credentials=None, client=None):
     """
     same as add_dimesion_data
     if the dimension exists it is updated with new value
@@ -128,38 +145,97 @@ def update_dimensions_data(json_payload, credentials=None):
 
     :param json_payload:
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return:
     """
-    return add_dimensions_data(json_payload, credentials)
+    return add_dimensions_data(json_payload, credentials, client)
+
+
+async def update_dimensions_data_async(json_payload, credentials=None, client=None):
+    """
+    async version of update_dimensions_data
+    """
+    return await add_dimensions_data_async(json_payload, credentials, client)
+
+
+def _get_dimensions_data_request(entity_type_name, client):
+    path_arguments = {'entityTypeName': entity_type_name}
+    return client.api_client(api_suffix="master",
+                             http_method_name="GET",
+                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
+                             path_arguments=path_arguments
+                             )
 
 
-def get_dimensions_data(entity_type_name, credentials=None):
+def get_dimensions_data(entity_type_name, credentials=None, client=None):
     """
     get all the dimensional data for an entity type
     Uses API:
         POST /master/v1/{orgId}/entityType/{entityTypeName}/dimensional
     :param entity_type_name: str name of entity type
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return: json (list of dict) with dimension data information
     """
-    # 1. API CONNECTION: GET all constants for a tenant
+    # 1. API CONNECTION: GET all dimensions for an entity type
     logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = _get_dimensions_data_request(entity_type_name, client).call_api()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting dimensions')
 
-    path_arguments = {'entityTypeName': entity_type_name}
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="master",
-                         http_method_name="GET",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
-                         path_arguments=path_arguments
-                         ).call_api()
+    return loads(response.content)
+
+
+def get_dimensions_data_stream(entity_type_name, credentials=None, client=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    same as get_dimensions_data, returning an iterator that parses the dimension records one at a time while the
+    response is being downloaded. the iterator holds the response open until it is exhausted: use it in a with
+    statement, or call its close(), when it may not be read to the end
+    :param chunk_size: bytes read from the response at a time
+    :return: streaming.ResponseRecords of dict with dimension data information
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = _get_dimensions_data_request(entity_type_name, client).call_api(stream=True)
     if response.status_code != 200:
+        response.close()
         raise Exception('API Client call failed when getting dimensions')
 
-    return response.json()
+    return iter_response_records(response, chunk_size)
+
+
+async def get_dimensions_data_async(entity_type_name, credentials=None, client=None):
+    """
+    async version of get_dimensions_data
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _get_dimensions_data_request(entity_type_name, client).call_api_async()
+    if response.status_code != 200:
+        raise Exception('API Client call failed when getting dimensions')
+
+    return loads(response.content)
+
 
+def _remove_dimensions_request(dimension_names, entity_type_name, client):
+    if not isinstance(dimension_names, list):
+        dimension_names = [dimension_names]
+
+    query_arguments = {'dimensionNames': dimension_names}
+    collection_formats = {'dimensionNames': 'csv'}
 
-def remove_dimensions(dimension_names, entity_type_name, credentials=None):
+    path_arguments = {'entityTypeName': entity_type_name}
+    return client.api_client(api_suffix="master",
+                             http_method_name="DELETE",
+                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
+                             path_arguments=path_arguments,
+                             query_arguments=query_arguments,
+                             collection_formats=collection_formats
+                             )
+
+
+def remove_dimensions(dimension_names, entity_type_name, credentials=None, client=None):
     """
     Delete dimension data by name
          Uses the following APIs:
@@ -168,30 +244,30 @@ def remove_dimensions(dimension_names, entity_type_name, credentials=None):
     :param entity_type_name: sting name of entity type
     :param dimension_names: list of string names of dimensions
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return:
     """
     # 1. API CONNECTION
     # :description: to access Watson IOT Platform Analytics.
     logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = _remove_dimensions_request(dimension_names, entity_type_name, client).call_api()
 
-    if not isinstance(dimension_names, list):
-        dimension_names = [dimension_names]
+    if response.status_code != 200:
+        raise Exception('API Client call failed when deleting dimensions')
 
-    query_arguments = {'dimensionNames': dimension_names}
-    collection_formats = {'dimensionNames': 'csv'}
+    return loads(response.content)
 
-    path_arguments = {'entityTypeName': entity_type_name}
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="master",
-                         http_method_name="DELETE",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/dimensional",
-                         path_arguments=path_arguments,
-                         query_arguments=query_arguments,
-                         collection_formats=collection_formats
-                         ).call_api()
+
+async def remove_dimensions_async(dimension_names, entity_type_name, credentials=None, client=None):
+    """
+    async version of remove_dimensions
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _remove_dimensions_request(dimension_names, entity_type_name, client).call_api_async()
 
     if response.status_code != 200:
         raise Exception('API Client call failed when deleting dimensions')
 
-    return response.json()
+    return loads(response.content)
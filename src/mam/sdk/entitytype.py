@@ -9,22 +9,17 @@
 # python libraries
 import json
 import logging
-from jsonschema import validate
-import datetime as dt
-import pandas as pd
-
-# iotfunctions modules
-from iotfunctions.metadata import (BaseCustomEntityType)
-from iotfunctions.db import (Database)
 
 # mam-sdk modules
-from .utils import (validateJSON, generate_api_environment, api_to_pandas_type, db_table_name, 
-                    change_df_dtype_to_db_dtype)
+from .utils import (validateJSON, validate, generate_api_environment, api_to_pandas_type)
 from .parseinput import (parse_input_columns, parse_input_constants, parse_input_functions)
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .codec import (dumps, loads)
+from .cache import (get_default_metadata_cache)
+from .dbpool import (database_session, invalidate_database_pools)
+from .ingest import (MetricsTable, DEFAULT_MAX_MEMORY, DEFAULT_CLEANERS, iter_csv_chunks, iter_parquet_chunks,
+                     iter_arrow_chunks, load_chunks, load_chunks_parallel, chunks_in_flight)
 
-from iotfunctions.util import setup_logging
-setup_logging(as_log_level=logging.DEBUG, root_log_level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # schema expected for creating entity type
@@ -83,7 +78,7 @@ create_custom_schema = {
 }
 
 
-def create_custom_entitytype(json_payload, credentials=None, **kwargs):
+def create_custom_entitytype(json_payload, credentials=None, client=None, **kwargs):
     """
     creates an entity type using the given json payload
     Uses the following APIs:
@@ -142,9 +137,11 @@ def create_custom_entitytype(json_payload, credentials=None, **kwargs):
     }]
     ```
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param **kwargs {
         drop_existing bool delete existing table and rebuild the entity type table in Db
         db_schema str if no schema is provided will use the default schema
+        database_pool DatabasePool to take the database connection from instead of opening one
     }
 
     :return:
@@ -171,138 +168,166 @@ def create_custom_entitytype(json_payload, credentials=None, **kwargs):
         dimensions = parse_input_columns(dimensions)
     if 'functions' in payload:
         functions = payload['functions']
-        functions = parse_input_functions(functions, credentials=credentials)
+        functions = parse_input_functions(functions, credentials=credentials, client=client)
 
     # 3. DATABASE CONNECTION
     # :description: to access Watson IOT Platform Analytics DB.
-    logger.debug('Connecting to Database')
-    db = Database(credentials=credentials)
-
-    # 4. CREATE CUSTOM ENTITY FROM JSON
-    # 4.a Instantiate a custom entity type
-    # overrides the _timestamp='evt_timestamp'
-    if 'metric_timestamp_column_name' in payload.keys():
-        BaseCustomEntityType._timestamp = payload['metric_timestamp_column_name']
-    # TODO: BaseCustomEntityType.timestamp= add user defined timestamp column
-    entity_type = BaseCustomEntityType(name=payload['entity_type_name'],
-                                       db=db,
-                                       columns=metrics,
-                                       constants=constants,
-                                       dimension_columns=dimensions,
-                                       functions=functions,
-                                       **kwargs)
-    # 4.b Register entity_type so that it creates a table for input data and appears in the UI
-    # Publish kpi to register kpis and constants to appear in the UI
-    entity_type.register(publish_kpis=True)
-
-    # 5. CLOSE DB CONNECTION
-    db.release_resource()
-
-
-def load_metrics_data_from_csv(entity_type_name, file_path, credentials=None, **kwargs):
+    from iotfunctions.metadata import (BaseCustomEntityType)
+    database_pool = kwargs.pop('database_pool', None)
+    with database_session(credentials, db_schema=kwargs.get('db_schema'), database_pool=database_pool) as db:
+        # 4. CREATE CUSTOM ENTITY FROM JSON
+        # 4.a Instantiate a custom entity type
+        # overrides the _timestamp='evt_timestamp'
+        if 'metric_timestamp_column_name' in payload.keys():
+            BaseCustomEntityType._timestamp = payload['metric_timestamp_column_name']
+        # TODO: BaseCustomEntityType.timestamp= add user defined timestamp column
+        entity_type = BaseCustomEntityType(name=payload['entity_type_name'],
+                                           db=db,
+                                           columns=metrics,
+                                           constants=constants,
+                                           dimension_columns=dimensions,
+                                           functions=functions,
+                                           **kwargs)
+        # 4.b Register entity_type so that it creates a table for input data and appears in the UI
+        # Publish kpi to register kpis and constants to appear in the UI
+        entity_type.register(publish_kpis=True)
+    # 5. CLOSE DB CONNECTION at the end of the with block, or give it back to database_pool
+
+    # the entity type was registered through the database, so cached api responses are stale
+    get_client(credentials, client).invalidate_entity_type(payload['entity_type_name'])
+
+
+def load_metrics_data_from_csv(entity_type_name, file_path, credentials=None, client=None, **kwargs):
     """
     reads metrics data from csv and stores in entity type metrics table
+    the csv is read, cleaned and written in chunks, so memory use does not grow with the size of the file
     Note: make sure 'deviceid' and 'evt_timestamp' columns are present in csv
     'evt_timestamp' column will be inferred to be current time if None present
 
     :param entity_type_name: str name of entity we want to load data for
     :param file_path: str path to csv file
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) whose credentials are used when credentials is not given
     :param **kwargs {
         db_schema str if no schema is provided will use the default schema
         if_exists str default:append
+        chunk_size int rows per chunk. default: estimated from max_memory
+        max_memory int memory ceiling of the chunks in memory in bytes. default: 256MB. None with no chunk_size
+        reads the whole file at once
+        writers int number of database connections writing chunks at the same time. default: 1
+        cleaners int number of threads preparing chunks when writers > 1. default: 2
+        engine str csv parser, 'pandas' or 'pyarrow' (multithreaded, parses timestamps while reading, requires
+        pyarrow). default: pandas
+        timestamp_formats list of str strptime formats of non ISO 8601 timestamps, for the pyarrow engine
+        float32 bool keep NUMBER metrics as float32 (about 7 significant digits) to halve their memory. default: False
+        metadata_cache MetadataCache cache of the metric table metadata, which saves the query of the table columns.
+        default: the shared cache, False queries them on every call. a new database connection still loads the
+        entity type metadata; use database_pool to keep connections between calls
+        database_pool DatabasePool to take the database connections from instead of opening them
     }
-    :return:
+    :return: dict rows_read, rows_written, rows_rejected, chunks, seconds and rows_per_second
     """
-    # load csv in dataframe
-    df = pd.read_csv(file_path)
+    return _load_metrics_data(entity_type_name, credentials, client,
+                              lambda table, max_memory: iter_csv_chunks(
+                                  file_path, table=table, chunk_size=kwargs.get('chunk_size'), max_memory=max_memory,
+                                  engine=kwargs.get('engine', 'pandas'),
+                                  timestamp_formats=kwargs.get('timestamp_formats')),
+                              **kwargs)
 
-    # Map the lowering function to all column names
-    # required columns are lower case
-    df.columns = map(str.lower, df.columns)
 
-    # DATABASE CONNECTION
-    # :description: to access Watson IOT Platform Analytics DB.
-    logger.debug('Connecting to Database')
-    db = Database(credentials=credentials, entity_type=entity_type_name)
-    # check if entity type table exists
-    db_schema = None
-    if 'db_schema' in kwargs:
-        db_schema = kwargs['db_schema']
-    #get the entity type to add data to
-    entity_type_metadata = db.entity_type_metadata.get(entity_type_name)
-    logger.debug(entity_type_metadata)
-    if entity_type_metadata is None:
-        raise RuntimeError(f'No entity type {entity_type_name} found.'
-                           f'Make sure you create entity type before loading data using csv.'
-                           f'Refer to create_custom_entitytype() to create the entity type first')
+def load_metrics_data_from_parquet(entity_type_name, file_path, credentials=None, client=None, **kwargs):
+    """
+    reads metrics data from parquet and stores in entity type metrics table
+    only the columns of the metrics table are read, row group by row group, and columns that already have the
+    database data type are not converted. requires pyarrow
+    Note: make sure 'deviceid' and 'evt_timestamp' columns are present in the file
+    'evt_timestamp' column will be inferred to be current time if None present
 
-    # find required columns
-    timestamp_col_name = entity_type_metadata['metricTimestampColumn']
-    logical_name = entity_type_metadata['name']
-    table_name = db_table_name(entity_type_metadata['metricTableName'], db.db_type )
-    deviceid_col = 'deviceid'
+    :param entity_type_name: str name of entity we want to load data for
+    :param file_path: str path to parquet file
+    :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) whose credentials are used when credentials is not given
+    :param **kwargs {
+        memory_map bool map the file in memory instead of reading it. default: True
+        and the arguments of load_metrics_data_from_csv
+    }
+    :return: dict rows_read, rows_written, rows_rejected, chunks, seconds and rows_per_second
+    """
+    return _load_metrics_data(entity_type_name, credentials, client,
+                              lambda table, max_memory: iter_parquet_chunks(
+                                  file_path, table=table, chunk_size=kwargs.get('chunk_size'), max_memory=max_memory,
+                                  memory_map=kwargs.get('memory_map', True)),
+                              **kwargs)
 
-    required_cols = db.get_column_names(table=table_name, schema=db_schema)
-    missing_cols = list(set(required_cols) - set(df.columns))
-    logger.debug(f'missing_cols : {missing_cols}')
-    # Add data for missing columns that are required
-    #required columns that can't be NULL {'evt_timestamp','device_id','updated_utc','devicetype','rcv_timestamp_utc'}
-    for m in missing_cols:
-        if m == timestamp_col_name or m == 'rcv_timestamp_utc':
-            #get possible timestamp columns and select the first one from all candidate
-            df_timestamp = df.filter(like='_timestamp')
-            if not df_timestamp.empty:
-                df_timestamp_columns = df_timestamp.columns
-                timestamp_col = df_timestamp_columns[0]
-                df[m] = pd.to_datetime(df_timestamp[timestamp_col])
-                logger.debug(f'Inferred column {timestamp_col} as missing column {m}')
-            else:
-                df[m] = dt.datetime.utcnow() - dt.timedelta(seconds=15)
-                logger.debug(f'Adding data: current time to missing column {m}')
-        elif m == 'devicetype':
-            df[m] = logical_name
-            logger.debug(f'Adding data: {logical_name} to missing column {m}')
-        elif m == 'updated_utc':
-            logger.debug(f'Adding data: current time to missing column {m}')
-            df[m] = dt.datetime.utcnow() - dt.timedelta(seconds=15)
-        elif m == deviceid_col:
-            raise RuntimeError(f'Missing required column {m}')
-        else:
-            df[m] = None
 
-    # DATA CHECKS
-    # 1. Check pd.DataFrame data types against entitytype/database data types
-    # coerce data frame object data type to corresponding database-data_type
-    # Add None for missing columns (Not added to the db)
-    logger.debug(f'Dataframe columns before data check 1. {df.columns}')
-    entity_type_columns = entity_type_metadata['dataItemDto']
-    df = change_df_dtype_to_db_dtype(df, entity_type_columns)
-    logger.debug(f'Dataframe columns after data check 1. {df.columns}')
+def load_metrics_data_from_arrow(entity_type_name, file_path, credentials=None, client=None, **kwargs):
+    """
+    reads metrics data from an arrow ipc file (feather v2) and stores in entity type metrics table
+    only the columns of the metrics table are converted, record batch by record batch, and columns that already
+    have the database data type are not converted. requires pyarrow
+    Note: make sure 'deviceid' and 'evt_timestamp' columns are present in the file
+    'evt_timestamp' column will be inferred to be current time if None present
+
+    :param entity_type_name: str name of entity we want to load data for
+    :param file_path: str path to arrow or feather file
+    :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) whose credentials are used when credentials is not given
+    :param **kwargs {
+        memory_map bool map the file in memory instead of reading it. default: True
+        and the arguments of load_metrics_data_from_csv
+    }
+    :return: dict rows_read, rows_written, rows_rejected, chunks, seconds and rows_per_second
+    """
+    return _load_metrics_data(entity_type_name, credentials, client,
+                              lambda table, max_memory: iter_arrow_chunks(
+                                  file_path, table=table, chunk_size=kwargs.get('chunk_size'), max_memory=max_memory,
+                                  memory_map=kwargs.get('memory_map', True)),
+                              **kwargs)
 
-    # 2. allowed device_id name: alpha-numeric + hypen + underscore + period + between [1,36] length
-    # Drop rows with un-allowed device_id names
-    logger.debug(f'Dataframe has {len(df.index)} rows of data before data check 2')
-    df = df[df[deviceid_col].str.contains(r'^[A-Za-z0-9._-]+$')]
-    df = df[df[deviceid_col].str.len() <= 36]
-    logger.warning(f'This function will ignore rows where deviceid has values that are not allowed')
-    logger.warning(f'(NOTE) Allowed characters in deviceid string are: alpha-numeric/hypen/underscore/period with '
-                   f'length of 1 to 36 characters')
-    logger.debug(f'Dataframe has {len(df.index)} rows of data after data check 2')
 
-    # remove columns that are not required/ in entity type definition
-    logger.debug(f'Updating columns: {required_cols}')
-    df = df[required_cols]
-    logger.debug(f'Top 5 elements of the df written to the db: \n{df.head(5)}')
-    # write the dataframe to the database table
-    db.write_frame(df=df, table_name=table_name)
-    logger.debug(f'Generated {len(df.index)} rows of data and inserted into {table_name}')
+def _load_metrics_data(entity_type_name, credentials, client, read_chunks, **kwargs):
+    """
+    prepares the chunks of data returned by read_chunks(table, max_memory) and writes them to the entity type
+    metrics table
+    """
+    if credentials is None and client is not None:
+        credentials = client.credentials
+    database_pool = kwargs.get('database_pool')
+    db_schema = kwargs.get('db_schema')
 
-    # CLOSE DB CONNECTION
-    db.release_resource()
+    # DATABASE CONNECTION
+    # :description: to access Watson IOT Platform Analytics DB.
+    with database_session(credentials, entity_type=entity_type_name, db_schema=db_schema,
+                          database_pool=database_pool) as db:
+        # table metadata and column lookups are resolved once and reused for every chunk
+        table = MetricsTable(db, entity_type_name, db_schema=db_schema,
+                             float32=kwargs.get('float32', False), metadata_cache=kwargs.get('metadata_cache'))
+        writers = kwargs.get('writers', 1)
+        cleaners = kwargs.get('cleaners', DEFAULT_CLEANERS)
+        max_memory = kwargs.get('max_memory', DEFAULT_MAX_MEMORY)
+        if writers > 1 and max_memory is not None:
+            # the pipeline holds several chunks at once; they share the memory ceiling
+            max_memory = max_memory // chunks_in_flight(cleaners, writers)
+        chunks = read_chunks(table, max_memory)
+        if writers > 1 and database_pool is not None:
+            # each writer gets its own connection so that inserts run at the same time
+            stats = load_chunks_parallel(lambda: database_pool.acquire(credentials, entity_type=entity_type_name,
+                                                                       db_schema=db_schema),
+                                         table, chunks, cleaners=cleaners, writers=writers,
+                                         release=database_pool.release)
+        elif writers > 1:
+            from iotfunctions.db import (Database)
+            stats = load_chunks_parallel(lambda: Database(credentials=credentials, entity_type=entity_type_name),
+                                         table, chunks, cleaners=cleaners, writers=writers)
+        else:
+            stats = load_chunks(db, table, chunks)
+        logger.info(f"Loaded {stats['rows_written']} rows into {table.table_name} in {stats['seconds']:.1f}s "
+                    f"({stats['rows_per_second']:.0f} rows/s)")
+    # CLOSE DB CONNECTION at the end of the with block, or give it back to database_pool
+    return stats
 
 
-def remove_entitytype(entity_type_name, credentials=None):
+def remove_entitytype(entity_type_name, credentials=None, client=None):
     """
     will first archive and then delete entity type
 
@@ -311,6 +336,7 @@ def remove_entitytype(entity_type_name, credentials=None):
     DELETE /meta/v1/{orgId}/entityType/{entityTypeName}
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :param entity_type_name: str name of entity type to delete
     :return:
     """
@@ -320,24 +346,27 @@ def remove_entitytype(entity_type_name, credentials=None):
     path_arguments = {
         'entityTypeName': entity_type_name
     }
-    APIClient.environment_info = generate_api_environment(credentials)
+    client = get_client(credentials, client)
     # 1.a Archive entity type (required before deleting)
-    response = APIClient(api_suffix="meta",
-                         http_method_name="PUT",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/archive",
-                         path_arguments=path_arguments
-                         ).call_api()
+    response = client.api_client(api_suffix="meta",
+                                 http_method_name="PUT",
+                                 endpoint_suffix="/{orgId}/entityType/{entityTypeName}/archive",
+                                 path_arguments=path_arguments
+                                 ).call_api()
 
     if response.status_code == 200:
         # 1.b Delete archived entity type
-        response = APIClient(api_suffix="meta",
-                             http_method_name="DELETE",
-                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}",
-                             path_arguments=path_arguments
-                             ).call_api()
+        response = client.api_client(api_suffix="meta",
+                                     http_method_name="DELETE",
+                                     endpoint_suffix="/{orgId}/entityType/{entityTypeName}",
+                                     path_arguments=path_arguments
+                                     ).call_api()
         if response.status_code != 200:
             logger.warning(f'Entity Type {entity_type_name} was not deleted')
+        # the metric table metadata of the entity type is gone
+        get_default_metadata_cache().invalidate(tenant=client.tenant_id, entity_type_name=entity_type_name)
+        invalidate_database_pools(tenant=client.tenant_id, entity_type=entity_type_name)
     else:
         logger.debug(f'Unable to archive entity type. Entity type name : {entity_type_name}')
 
-    return response.json()
\ No newline at end of file
+    return loads(response.content)
\ No newline at end of file
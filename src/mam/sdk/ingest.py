@@ -0,0 +1,719 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import csv
+import time
+import queue
+import logging
+import threading
+import datetime as dt
+
+# mam-sdk modules
+from .utils import (db_table_name, db_dtype_conversions, to_naive_utc)
+from .cache import (get_default_metadata_cache)
+
+logger = logging.getLogger(__name__)
+
+# memory ceiling of a chunk (bytes), including the copies made while it is cleaned
+DEFAULT_MAX_MEMORY = 256 * 1024 * 1024
+# a chunk is in memory about this many times while it is cleaned: the chunk read and the rows and columns kept
+CHUNK_COPIES = 2
+# rows read to estimate the memory used by a row
+SAMPLE_ROWS = 1000
+
+DEVICEID_COLUMN = 'deviceid'
+# allowed device_id name: alpha-numeric + hypen + underscore + period + between [1,36] length
+DEVICEID_PATTERN = r'^[A-Za-z0-9._-]+$'
+DEVICEID_MAX_LENGTH = 36
+# columns with few distinct values, read as pandas categoricals
+CATEGORICAL_COLUMNS = (DEVICEID_COLUMN, 'devicetype')
+
+CSV_ENGINES = ('pandas', 'pyarrow')
+
+DEFAULT_CLEANERS = 2
+DEFAULT_WRITERS = 4
+# seconds a blocked pipeline stage waits before it checks whether another stage failed
+_PIPELINE_POLL = 0.1
+_DONE = object()
+
+
+def _read_table_metadata(db, entity_type_name, db_schema):
+    """
+    :return: dict metric table metadata of the entity type, None when there is no such entity type
+    """
+    # get the entity type to add data to
+    entity_type_metadata = db.entity_type_metadata.get(entity_type_name)
+    logger.debug(entity_type_metadata)
+    if entity_type_metadata is None:
+        return None
+    # find required columns
+    table_name = db_table_name(entity_type_metadata['metricTableName'], db.db_type)
+    return {'timestamp_col_name': entity_type_metadata['metricTimestampColumn'],
+            'logical_name': entity_type_metadata['name'],
+            'table_name': table_name,
+            'required_cols': db.get_column_names(table=table_name, schema=db_schema),
+            'entity_type_columns': entity_type_metadata['dataItemDto']}
+
+
+def _to_timestamps(series):
+    """
+    :return: series as naive utc timestamps. strings with a utc offset are converted to utc, strings without one are
+    taken as utc
+    """
+    import pandas as pd
+
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        # utc=True also parses strings with different offsets (e.g. across a daylight saving change)
+        series = pd.to_datetime(series, utc=True)
+    return to_naive_utc(series)
+
+
+class MetricsTable(object):
+    """
+    metric table of an entity type. the table metadata and the column lookups are resolved once per load, then
+    every chunk of data is prepared for the table with prepare()
+    """
+
+    def __init__(self, db, entity_type_name, db_schema=None, float32=False, metadata_cache=None):
+        '''
+
+        :param db: iotfunctions.db.Database connection used to read the entity type metadata
+        :param entity_type_name: str name of entity we want to load data for
+        :param db_schema: str if no schema is provided will use the default schema
+        :param float32: bool keep NUMBER metrics as float32 instead of float64, half the memory with ~7 significant
+        digits
+        :param metadata_cache: MetadataCache (optional). defaults to the shared cache, False queries the table
+        columns from the database every time
+        '''
+        if metadata_cache is None:
+            metadata_cache = get_default_metadata_cache()
+
+        def load():
+            return _read_table_metadata(db, entity_type_name, db_schema)
+
+        if metadata_cache:
+            metadata = metadata_cache.get(getattr(db, 'tenant_id', None), entity_type_name, db_schema, load)
+        else:
+            metadata = load()
+        if metadata is None:
+            raise RuntimeError(f'No entity type {entity_type_name} found.'
+                               f'Make sure you create entity type before loading data using csv.'
+                               f'Refer to create_custom_entitytype() to create the entity type first')
+
+        self.timestamp_col_name = metadata['timestamp_col_name']
+        self.logical_name = metadata['logical_name']
+        self.table_name = metadata['table_name']
+        self.db_schema = db_schema
+        self.required_cols = metadata['required_cols']
+        self.entity_type_columns = metadata['entity_type_columns']
+        # lower case column name: database data type
+        self.column_types = {column['name'].lower(): column['columnType'].upper()
+                             for column in self.entity_type_columns}
+        self.float32 = float32
+        self.fill_values = None
+        self._plan_lock = threading.Lock()
+
+    def source_columns(self, columns):
+        """
+        columns of the data worth reading: the table columns, and the timestamp column a missing timestamp is
+        inferred from
+        :param columns: list of str column names of the data, in file order
+        :return: list of str column names, in file order
+        """
+        timestamp_cols = [column for column in columns if '_timestamp' in column.lower()]
+        return [column for column in columns
+                if column.lower() in self.required_cols or column in timestamp_cols[:1]]
+
+    def column_dtype(self, column):
+        """
+        :param column: str lower case column name
+        :return: dtype the column is read with, None when it is inferred by the reader
+        """
+        if column in CATEGORICAL_COLUMNS:
+            return 'category'
+        column_type = self.column_types.get(column)
+        if column_type == 'NUMBER':
+            return 'float32' if self.float32 else 'float64'
+        if column_type == 'LITERAL':
+            return str
+        return None
+
+    def is_timestamp(self, column):
+        """
+        :param column: str lower case column name
+        :return: bool whether the column is parsed as a timestamp while reading
+        """
+        return self.column_types.get(column) == 'TIMESTAMP' or column == self.timestamp_col_name \
+            or '_timestamp' in column
+
+    def read_csv_arguments(self, columns):
+        """
+        pandas.read_csv arguments that read the table columns only, with their final dtypes
+        :param columns: list of str column names of the csv header
+        :return: dict usecols, dtype and parse_dates
+        """
+        usecols = self.source_columns(columns)
+        dtypes = {column: self.column_dtype(column.lower()) for column in usecols}
+        return {'usecols': usecols,
+                'dtype': {column: dtype for column, dtype in dtypes.items() if dtype is not None},
+                'parse_dates': [column for column in usecols if self.is_timestamp(column.lower())
+                                and dtypes[column] is None]}
+
+    def arrow_types(self, columns):
+        """
+        pyarrow types of the table columns, for pyarrow.csv.ConvertOptions.column_types
+        :param columns: list of str column names of the csv header
+        :return: dict column name: pyarrow.DataType
+        """
+        pa = _import_pyarrow()
+        arrow_dtypes = {'category': pa.dictionary(pa.int32(), pa.string()), 'float32': pa.float32(),
+                        'float64': pa.float64(), str: pa.string()}
+        types = {}
+        for column in self.source_columns(columns):
+            dtype = self.column_dtype(column.lower())
+            if dtype is not None:
+                types[column] = arrow_dtypes[dtype]
+        return types
+
+    def categorical_columns(self, columns):
+        """
+        :param columns: list of str column names of the data
+        :return: list of str the columns read as pandas categoricals
+        """
+        return [column for column in columns if column.lower() in CATEGORICAL_COLUMNS]
+
+    def filler(self, m, value, index):
+        """
+        column of a required column missing from the data
+        :param m: str lower case column name
+        :param value: value of every row. None makes an all-null column of the database data type
+        :param index: pandas.Index of the data
+        :return: pandas.Series
+        """
+        import numpy as np
+        import pandas as pd
+
+        if m in CATEGORICAL_COLUMNS and value is not None:
+            # one category, one byte per row
+            return pd.Series(pd.Categorical.from_codes(np.zeros(len(index), dtype=np.int8), [value]), index=index,
+                             name=m)
+        if value is not None:
+            return pd.Series(value, index=index, name=m)
+        column_type = self.column_types.get(m)
+        if column_type == 'NUMBER':
+            return pd.Series(np.nan, index=index, dtype=self.column_dtype(m), name=m)
+        if column_type == 'TIMESTAMP':
+            return pd.Series(pd.NaT, index=index, dtype='datetime64[ns]', name=m)
+        if column_type == 'BOOLEAN':
+            return pd.Series(pd.NA, index=index, dtype='boolean', name=m)
+        if column_type == 'LITERAL':
+            # no categories, one byte per row
+            return pd.Series(pd.Categorical.from_codes(np.full(len(index), -1, dtype=np.int8), []), index=index,
+                             name=m)
+        return pd.Series(None, index=index, dtype=object, name=m)
+
+    def plan(self, columns):
+        """
+        decide how each required column missing from the data is filled
+        the plan is built aside and published in one assignment, so cleaner threads never see a partial plan and a
+        failed plan leaves fill_values None
+        :param columns: list of str (lower case) column names of the data
+        """
+        missing_cols = [m for m in self.required_cols if m not in set(columns)]
+        logger.debug(f'missing_cols : {missing_cols}')
+        now = dt.datetime.utcnow() - dt.timedelta(seconds=15)
+        timestamp_cols = [column for column in columns if '_timestamp' in column]
+        # column name: ('column', name of the column to copy) or ('value', value)
+        fill_values = {}
+        # required columns that can't be NULL
+        # {'evt_timestamp','device_id','updated_utc','devicetype','rcv_timestamp_utc'}
+        for m in missing_cols:
+            if m == self.timestamp_col_name or m == 'rcv_timestamp_utc':
+                # get possible timestamp columns and select the first one from all candidate
+                if timestamp_cols:
+                    fill_values[m] = ('column', timestamp_cols[0])
+                    logger.debug(f'Inferred column {timestamp_cols[0]} as missing column {m}')
+                else:
+                    fill_values[m] = ('value', now)
+                    logger.debug(f'Adding data: current time to missing column {m}')
+            elif m == 'devicetype':
+                fill_values[m] = ('value', self.logical_name)
+                logger.debug(f'Adding data: {self.logical_name} to missing column {m}')
+            elif m == 'updated_utc':
+                fill_values[m] = ('value', now)
+                logger.debug(f'Adding data: current time to missing column {m}')
+            elif m == DEVICEID_COLUMN:
+                raise RuntimeError(f'Missing required column {m}')
+            else:
+                fill_values[m] = ('value', None)
+        self.fill_values = fill_values
+
+    def prepare(self, df):
+        """
+        drop the rows that can not be written, keep the table columns only, coerce the data types and fill the
+        missing columns. the rows to drop are found with a single mask, then the kept columns are moved out of df
+        one at a time, filtered and coerced, so the chunk is not held twice
+        :param df: pandas.DataFrame chunk of data to write. its columns are moved to the returned DataFrame
+        :return: (pandas.DataFrame ready for Database.write_frame, dict rejected rows per reason)
+        """
+        import pandas as pd
+
+        # required columns are lower case
+        df.columns = [str(column).lower() for column in df.columns]
+        if self.fill_values is None:
+            # chunks can be prepared by several threads at once; the first one plans
+            with self._plan_lock:
+                if self.fill_values is None:
+                    self.plan(list(df.columns))
+
+        # DATA CHECKS
+        # 1. rows that can not be written, each counted under the first reason that applies
+        # allowed device_id name: alpha-numeric + hypen + underscore + period + between [1,36] length
+        deviceid = df[DEVICEID_COLUMN]
+        missing_deviceid = deviceid.isna()
+        if not (pd.api.types.is_string_dtype(deviceid) or isinstance(deviceid.dtype, pd.CategoricalDtype)):
+            deviceid = deviceid.astype(str)
+        invalid_deviceid = ~deviceid.str.fullmatch(DEVICEID_PATTERN, na=False) & ~missing_deviceid
+        deviceid_too_long = (deviceid.str.len() > DEVICEID_MAX_LENGTH) & ~missing_deviceid & ~invalid_deviceid
+        reject = missing_deviceid | invalid_deviceid | deviceid_too_long
+        rejected = {'missing_deviceid': int(missing_deviceid.sum()),
+                    'invalid_deviceid': int(invalid_deviceid.sum()),
+                    'deviceid_too_long': int(deviceid_too_long.sum()),
+                    'missing_timestamp': 0}
+        # the timestamp column can't be NULL
+        kind, value = self.fill_values.get(self.timestamp_col_name, ('column', self.timestamp_col_name))
+        if kind == 'column':
+            missing_timestamp = df[value].isna() & ~reject
+            rejected['missing_timestamp'] = int(missing_timestamp.sum())
+            reject |= missing_timestamp
+        keep = ~reject.to_numpy() if reject.any() else None
+        rows = len(df.index) if keep is None else int(keep.sum())
+        index = df.index if keep is None else pd.RangeIndex(rows)
+        del deviceid, missing_deviceid, invalid_deviceid, deviceid_too_long, reject
+
+        # 2. Check pd.DataFrame data types against entitytype/database data types
+        conversions = db_dtype_conversions(df, self.entity_type_columns, float32=self.float32)
+
+        # 3. keep the rows and the columns required/ in entity type definition and coerce data frame object data
+        # type to corresponding database-data_type, column by column so that the chunk is not held twice
+        def take(column):
+            series = df[column]
+            if keep is not None:
+                series = pd.Series(series.array[keep], index=index, name=column)
+            if column in conversions:
+                if conversions[column] == 'datetime64[ns]':
+                    series = _to_timestamps(series)
+                series = series.astype(conversions[column])
+            return series
+
+        sources = {value for kind, value in self.fill_values.values() if kind == 'column'}
+        columns = {}
+        for m in self.required_cols:
+            kind, value = self.fill_values.get(m, ('column', m))
+            if kind == 'value':
+                # Add data for missing columns that are required
+                columns[m] = self.filler(m, value, index)
+                continue
+            series = columns[value] if value in columns else take(value)
+            if m != value:
+                # inferred timestamp column, unless already parsed while reading
+                series = _to_timestamps(series)
+            columns[m] = series
+            if value in df.columns and value not in sources:
+                # release the column of the chunk once it is copied
+                del df[value]
+        # release the columns of the chunk that are not kept
+        for column in list(df.columns):
+            del df[column]
+        return pd.DataFrame(columns, index=index, copy=False), rejected
+
+
+class IngestStats(object):
+    """
+    rows read and written by a load, and its throughput
+    """
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rejected = {}
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, rows_read, rows_written, rejected, table_name):
+        with self._lock:
+            self.rows_read += rows_read
+            self.rows_written += rows_written
+            for reason, count in rejected.items():
+                self.rejected[reason] = self.rejected.get(reason, 0) + count
+            self.chunks += 1
+            progress = self.as_dict()
+        logger.info(f"Inserted {progress['rows_written']} of {progress['rows_read']} rows into {table_name} "
+                    f"({progress['rows_per_second']:.0f} rows/s)")
+
+    def finish(self):
+        rejected = {reason: count for reason, count in self.rejected.items() if count}
+        if rejected:
+            logger.warning(f'Ignored {sum(rejected.values())} rows that can not be written: {rejected}')
+            logger.warning(f'(NOTE) Allowed characters in deviceid string are: alpha-numeric/hypen/underscore/period '
+                           f'with length of 1 to 36 characters')
+        return self.as_dict()
+
+    def as_dict(self):
+        seconds = time.perf_counter() - self.started
+        return {'rows_read': self.rows_read,
+                'rows_written': self.rows_written,
+                'rows_rejected': self.rows_read - self.rows_written,
+                'rejected': dict(self.rejected),
+                'chunks': self.chunks,
+                'seconds': seconds,
+                'rows_per_second': self.rows_read / seconds if seconds > 0 else 0.0}
+
+
+def estimate_chunk_size(sample, max_memory=DEFAULT_MAX_MEMORY):
+    """
+    number of rows per chunk that keeps a chunk, and its copies while it is cleaned, under max_memory
+    :param sample: pandas.DataFrame first rows of the data
+    :param max_memory: int bytes
+    :return: int rows
+    """
+    if sample.empty:
+        return SAMPLE_ROWS
+    row_bytes = sample.memory_usage(index=True, deep=True).sum() / len(sample.index)
+    return max(int(max_memory / (CHUNK_COPIES * row_bytes)), 1)
+
+
+def iter_csv_chunks(file_path, table=None, chunk_size=None, max_memory=DEFAULT_MAX_MEMORY, engine='pandas',
+                    timestamp_formats=None, **read_csv_kwargs):
+    """
+    read a csv file in chunks of chunk_size rows. when chunk_size is None, it is estimated from the first rows of
+    the file so that a chunk stays under max_memory; with no max_memory either, the whole file is a single chunk
+    :param file_path: str path to csv file
+    :param table: MetricsTable (optional) table the data is loaded into. only its columns are read, with the dtypes
+    of the database data types. all columns are read, with inferred dtypes, when None
+    :param chunk_size: int (optional) rows per chunk
+    :param max_memory: int (optional) bytes
+    :param engine: str 'pandas' (pandas.read_csv) or 'pyarrow' (multithreaded pyarrow.csv parser, which also
+    parses timestamps while reading. values must not contain line breaks)
+    :param timestamp_formats: list of str (optional) strptime formats of the timestamps, for the pyarrow engine.
+    ISO 8601 timestamps are always parsed
+    :return: generator of pandas.DataFrame
+    """
+    if engine == 'pyarrow':
+        yield from _iter_csv_chunks_pyarrow(file_path, table, chunk_size, max_memory, timestamp_formats)
+        return
+    if engine != 'pandas':
+        raise NotImplementedError(f'Unknown csv engine {engine}. Available engines: {list(CSV_ENGINES)}')
+
+    import pandas as pd
+
+    if table is not None:
+        header = list(pd.read_csv(file_path, nrows=0, **read_csv_kwargs).columns)
+        read_csv_kwargs = dict(table.read_csv_arguments(header), **read_csv_kwargs)
+    if chunk_size is None and max_memory is None:
+        yield pd.read_csv(file_path, **read_csv_kwargs)
+        return
+    if chunk_size is None:
+        chunk_size = estimate_chunk_size(pd.read_csv(file_path, nrows=SAMPLE_ROWS, **read_csv_kwargs), max_memory)
+        logger.debug(f'Reading {file_path} in chunks of {chunk_size} rows')
+    for chunk in pd.read_csv(file_path, chunksize=chunk_size, **read_csv_kwargs):
+        yield chunk
+
+
+def _iter_csv_chunks_pyarrow(file_path, table, chunk_size, max_memory, timestamp_formats):
+    # the file is cut in segments of whole lines, each parsed by all cores with pyarrow.csv.read_csv. the column
+    # types found in the first segment are kept for the next ones, so every chunk has the same types
+    pa = _import_pyarrow()
+    import pyarrow.csv as pacsv
+
+    read_options = pacsv.ReadOptions(use_threads=True)
+    convert_options = pacsv.ConvertOptions(timestamp_parsers=[pacsv.ISO8601] + list(timestamp_formats or []))
+    if table is not None:
+        with open(file_path, 'r', newline='') as F:
+            header = next(csv.reader(F), [])
+        convert_options.include_columns = table.source_columns(header)
+        convert_options.column_types = table.arrow_types(header)
+    pinned = False
+    if chunk_size is None and max_memory is None:
+        yield _arrow_table_to_frame(pacsv.read_csv(file_path, read_options=read_options,
+                                                   convert_options=convert_options))
+        return
+
+    def parse(segment):
+        return pacsv.read_csv(pa.py_buffer(segment), read_options=read_options, convert_options=convert_options)
+
+    with open(file_path, 'rb') as F:
+        header = F.readline()
+        sample = [line for line in (F.readline() for _ in range(SAMPLE_ROWS)) if line]
+        if not sample:
+            return
+        line_bytes = sum(len(line) for line in sample) / len(sample)
+        if chunk_size is None:
+            chunk_size = estimate_chunk_size(_arrow_table_to_frame(parse(header + b''.join(sample))), max_memory)
+        segment_bytes = max(int(chunk_size * line_bytes), 1)
+        logger.debug(f'Reading {file_path} in chunks of {chunk_size} rows ({segment_bytes} bytes)')
+
+        F.seek(len(header))
+        while True:
+            # complete the last line of the segment
+            segment = F.read(segment_bytes) + F.readline()
+            if not segment.strip():
+                return
+            arrow_table = parse(header + segment)
+            del segment
+            if not pinned:
+                # integers are read as float in the next segments, which may have decimals
+                convert_options.column_types = {
+                    field.name: pa.float64() if pa.types.is_integer(field.type) else field.type
+                    for field in arrow_table.schema if not pa.types.is_null(field.type)}
+                pinned = True
+            yield _arrow_table_to_frame(arrow_table)
+
+
+def _arrow_table_to_frame(table):
+    # arrow buffers are released while the columns are converted, so the data is not held twice
+    return table.to_pandas(split_blocks=True, self_destruct=True, date_as_object=False)
+
+
+def _import_pyarrow():
+    # optional, only needed to load parquet and arrow files and by the pyarrow csv engine. imported on first use
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError('pyarrow is required to load parquet and arrow files and by the pyarrow csv engine. '
+                          'Install it with `pip install pyarrow`')
+    return pyarrow
+
+
+def _record_batch_to_frame(batch, categories=None):
+    # dates become datetime64 columns instead of object columns of datetime.date
+    return batch.to_pandas(date_as_object=False, categories=categories)
+
+
+def iter_parquet_chunks(file_path, table=None, chunk_size=None, max_memory=DEFAULT_MAX_MEMORY, memory_map=True):
+    """
+    read a parquet file in chunks of chunk_size rows, streaming its row groups. only the columns the metric table
+    needs are read. when chunk_size is None, it is estimated from the first rows of the file so that a chunk stays
+    under max_memory; with no max_memory either, the whole file is a single chunk
+    :param file_path: str path to parquet file
+    :param table: MetricsTable (optional) table the data is loaded into. all columns are read when None
+    :param chunk_size: int (optional) rows per chunk
+    :param max_memory: int (optional) bytes
+    :param memory_map: bool map the file in memory instead of reading it
+    :return: generator of pandas.DataFrame
+    """
+    _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path, memory_map=memory_map)
+    columns = None
+    categories = None
+    if table is not None:
+        columns = table.source_columns(parquet_file.schema_arrow.names)
+        categories = table.categorical_columns(columns)
+    if chunk_size is None and max_memory is None:
+        yield parquet_file.read(columns=columns).to_pandas(date_as_object=False, categories=categories)
+        return
+    if chunk_size is None:
+        sample = next(parquet_file.iter_batches(batch_size=SAMPLE_ROWS, columns=columns), None)
+        if sample is None:
+            return
+        chunk_size = estimate_chunk_size(_record_batch_to_frame(sample, categories), max_memory)
+        logger.debug(f'Reading {file_path} in chunks of {chunk_size} rows')
+    for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+        yield _record_batch_to_frame(batch, categories)
+
+
+def iter_arrow_chunks(file_path, table=None, chunk_size=None, max_memory=DEFAULT_MAX_MEMORY, memory_map=True):
+    """
+    read an arrow ipc (feather v2) file in chunks of chunk_size rows. record batches are sliced without copying,
+    and only the columns the metric table needs are converted. when chunk_size is None, it is estimated from the
+    first rows of the file so that a chunk stays under max_memory; with no max_memory either, each record batch
+    is a chunk
+    :param file_path: str path to arrow or feather file
+    :param table: MetricsTable (optional) table the data is loaded into. all columns are read when None
+    :param chunk_size: int (optional) rows per chunk
+    :param max_memory: int (optional) bytes
+    :param memory_map: bool map the file in memory instead of reading it
+    :return: generator of pandas.DataFrame
+    """
+    pa = _import_pyarrow()
+
+    source = pa.memory_map(file_path, 'r') if memory_map else pa.OSFile(file_path, 'rb')
+    with source:
+        reader = pa.ipc.open_file(source)
+        names = reader.schema.names
+        indices = None
+        categories = None
+        if table is not None:
+            indices = [names.index(column) for column in table.source_columns(names)]
+            categories = table.categorical_columns(names)
+
+        def batches():
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if indices is not None:
+                    batch = pa.RecordBatch.from_arrays([batch.column(j) for j in indices],
+                                                       [names[j] for j in indices])
+                yield batch
+
+        if chunk_size is None and max_memory is not None:
+            sample = next((batch for batch in batches() if batch.num_rows > 0), None)
+            if sample is None:
+                return
+            chunk_size = estimate_chunk_size(_record_batch_to_frame(sample.slice(0, SAMPLE_ROWS), categories),
+                                             max_memory)
+            logger.debug(f'Reading {file_path} in chunks of {chunk_size} rows')
+        for batch in batches():
+            if chunk_size is None:
+                yield _record_batch_to_frame(batch, categories)
+                continue
+            for offset in range(0, batch.num_rows, chunk_size):
+                yield _record_batch_to_frame(batch.slice(offset, chunk_size), categories)
+
+
+def load_chunks(db, table, chunks):
+    """
+    prepare and write each chunk to the metric table, one chunk in memory at a time
+    :param db: iotfunctions.db.Database connection
+    :param table: MetricsTable
+    :param chunks: iterable of pandas.DataFrame
+    :return: dict IngestStats.as_dict()
+    """
+    stats = IngestStats()
+    for chunk in chunks:
+        rows_read = len(chunk.index)
+        df, rejected = table.prepare(chunk)
+        del chunk
+        # write the dataframe to the database table
+        db.write_frame(df=df, table_name=table.table_name)
+        stats.add(rows_read, len(df.index), rejected, table.table_name)
+        del df
+    return stats.finish()
+
+
+def chunks_in_flight(cleaners=DEFAULT_CLEANERS, writers=DEFAULT_WRITERS):
+    """
+    most chunks held in memory at once by load_chunks_parallel: one being read, one queued and one being handled
+    per worker
+    """
+    return 2 * (cleaners + writers) + 1
+
+
+def load_chunks_parallel(connect, table, chunks, cleaners=DEFAULT_CLEANERS, writers=DEFAULT_WRITERS, release=None):
+    """
+    prepare and write the chunks in a pipeline: a reader thread reads the chunks, cleaners threads prepare them and
+    writers threads, each with its own database connection, write them to the metric table at the same time.
+    the queues between the stages hold one chunk per worker of the next stage, so a slow stage holds back the ones
+    before it instead of letting chunks pile up in memory. the first error stops every stage and is raised
+    :param connect: callable returning a new iotfunctions.db.Database connection, called once per writer
+    :param table: MetricsTable
+    :param chunks: iterable of pandas.DataFrame
+    :param cleaners: int number of threads preparing chunks
+    :param writers: int number of threads (and database connections) writing chunks
+    :param release: callable (optional) giving back a connection from connect. closes it by default
+    :return: dict IngestStats.as_dict()
+    """
+    stats = IngestStats()
+    raw_chunks = queue.Queue(maxsize=cleaners)
+    clean_chunks = queue.Queue(maxsize=writers)
+    failed = threading.Event()
+    errors = []
+    running_cleaners = [cleaners]
+    lock = threading.Lock()
+
+    def fail(error):
+        with lock:
+            errors.append(error)
+        failed.set()
+
+    def put(stage_queue, item):
+        # blocks while the next stage is busy; gives up once any stage failed
+        while not failed.is_set():
+            try:
+                stage_queue.put(item, timeout=_PIPELINE_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(stage_queue):
+        while not failed.is_set():
+            try:
+                return stage_queue.get(timeout=_PIPELINE_POLL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def read():
+        try:
+            for chunk in chunks:
+                if not put(raw_chunks, chunk):
+                    return
+        except Exception as e:
+            fail(e)
+        finally:
+            for _ in range(cleaners):
+                put(raw_chunks, _DONE)
+
+    def clean():
+        try:
+            while True:
+                chunk = get(raw_chunks)
+                if chunk is _DONE:
+                    break
+                rows_read = len(chunk.index)
+                df, rejected = table.prepare(chunk)
+                del chunk
+                if not put(clean_chunks, (rows_read, df, rejected)):
+                    break
+        except Exception as e:
+            fail(e)
+        finally:
+            # the last cleaner to stop tells the writers
+            with lock:
+                running_cleaners[0] -= 1
+                last = running_cleaners[0] == 0
+            if last:
+                for _ in range(writers):
+                    put(clean_chunks, _DONE)
+
+    def write():
+        db = None
+        try:
+            db = connect()
+            while True:
+                item = get(clean_chunks)
+                if item is _DONE:
+                    break
+                rows_read, df, rejected = item
+                db.write_frame(df=df, table_name=table.table_name)
+                stats.add(rows_read, len(df.index), rejected, table.table_name)
+        except Exception as e:
+            fail(e)
+        finally:
+            if db is not None:
+                if release is None:
+                    db.release_resource()
+                else:
+                    release(db)
+
+    threads = [threading.Thread(target=read, name='mam-sdk-ingest-reader')]
+    threads += [threading.Thread(target=clean, name=f'mam-sdk-ingest-cleaner-{i}') for i in range(cleaners)]
+    threads += [threading.Thread(target=write, name=f'mam-sdk-ingest-writer-{i}') for i in range(writers)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return stats.finish()
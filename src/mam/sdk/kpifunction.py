@@ -9,19 +9,14 @@
 # python libraries
 import json
 import logging
-from jsonschema import validate
-
-# iotfunctions modules
-from iotfunctions.metadata import (BaseCustomEntityType)
-from iotfunctions.db import (Database)
 
 # mam-sdk modules
 from .utils import *
 from .parseinput import *
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .codec import (dumps, loads)
+from .dbpool import (database_session)
 
-from iotfunctions.util import setup_logging
-setup_logging(as_log_level=logging.DEBUG, root_log_level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # schema expected for creating kpi functions for entity type
@@ -45,13 +40,15 @@ create_kpifunction_schema = {
 }
 
 
-def add_functions(json_payload, credentials=None):
+def add_functions(json_payload, credentials=None, client=None, database_pool=None):
     """
     add kpi functions to a given entity type
     Uses the following APIs:
         POST  /api/kpi/v1/{orgId}/entityType/{entityTypeName}/kpiFunction
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
+    :param database_pool: DatabasePool (optional) to take the database connection from instead of opening one
     :param json_payload:
     ```
     {
@@ -85,28 +82,42 @@ def add_functions(json_payload, credentials=None):
     functions = None
     if 'functions' in payload:
         functions = payload['functions']
-        functions = parse_input_functions(functions, credentials=credentials)
+        functions = parse_input_functions(functions, credentials=credentials, client=client)
 
     # 3. DATABASE CONNECTION
     # :description: to access Watson IOT Platform Analytics DB.
-    logger.debug('Connecting to Database')
-    db = Database(credentials=credentials)
+    from iotfunctions.metadata import (BaseCustomEntityType)
+    with database_session(credentials, database_pool=database_pool) as db:
+        # 4. CREATE CUSTOM ENTITY FROM JSON
+        # 4.a Instantiate a custom entity type
+        entity_type = BaseCustomEntityType(name=payload['entity_type_name'],
+                                           db=db,
+                                           functions=functions)
+        # 4.b Publish kpi to register kpis and constants to appear in the UI
+        entity_type.publish_kpis()
+    # 5. CLOSE DB CONNECTION at the end of the with block, or give it back to database_pool
+
+    # kpis were published through the database, so cached api responses are stale
+    get_client(credentials, client).invalidate_entity_type(payload['entity_type_name'])
 
-    # 4. CREATE CUSTOM ENTITY FROM JSON
-    # 4.a Instantiate a custom entity type
-    entity_type = BaseCustomEntityType(name=payload['entity_type_name'],
-                                       db=db,
-                                       functions=functions)
-    # 4.b Publish kpi to register kpis and constants to appear in the UI
-    entity_type.publish_kpis()
+    return
 
-    # 5. CLOSE DB CONNECTION
-    db.release_resource()
 
-    return
+def _get_functions_request(entity_type_name, client):
+    path_arguments = {}
+    if entity_type_name is not None:
+        path_arguments['entityTypeName'] = entity_type_name
+    else:
+        raise Exception("No Entity Type Name provided")
+
+    return client.api_client(api_suffix="kpi",
+                             http_method_name="GET",
+                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}/kpiFunction",
+                             path_arguments=path_arguments,
+                             )
 
 
-def get_functions(entity_type_name, credentials=None):
+def get_functions(entity_type_name, credentials=None, client=None):
     """
         get all kpi functions for an entity type
         Uses the following APIs:
@@ -114,24 +125,24 @@ def get_functions(entity_type_name, credentials=None):
 
         :param entity_type_name: str name of entity type
         :param credentials: dict analytics-service dev credentials
+        :param client: MonitorClient (optional) to make the api calls with instead of credentials
         :return: json object: list of dict with kpi functions
         """
-    # 1. API CONNECTION: GET all constants for a tenant
+    # 1. API CONNECTION: GET all kpi functions for an entity type
     logger.debug('Connecting to API')
-    path_arguments = {}
-    if entity_type_name is not None:
-        path_arguments['entityTypeName'] = entity_type_name
-    else:
-        raise Exception("No Entity Type Name provided")
+    client = get_client(credentials, client)
+    response = _get_functions_request(entity_type_name, client).call_api()
+    return loads(response.content)
 
-    APIClient.environment_info = generate_api_environment(credentials)
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="kpi",
-                         http_method_name="GET",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/kpiFunction",
-                         path_arguments=path_arguments,
-                         ).call_api()
-    return response.json()
+
+async def get_functions_async(entity_type_name, credentials=None, client=None):
+    """
+    async version of get_functions
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _get_functions_request(entity_type_name, client).call_api_async()
+    return loads(response.content)
 
 
 # TODO: Implement this function
@@ -150,7 +161,19 @@ def update_functions(json_payload, credentials=None):
     raise Exception("Not supported in the sdk. Configure through UI")
 
 
-def remove_function(entity_type_name, kpi_name, credentials=None):
+def _remove_function_request(entity_type_name, kpi_name, client):
+    if kpi_name is None:
+        raise Exception(f'No kpi functions {kpi_name} found for entity type {entity_type_name}')
+
+    path_arguments = {'entityTypeName': entity_type_name, 'kpiFunctionName': kpi_name}
+    return client.api_client(api_suffix="kpi",
+                             http_method_name="DELETE",
+                             endpoint_suffix="/{orgId}/entityType/{entityTypeName}/kpiFunction/{kpiFunctionName}",
+                             path_arguments=path_arguments,
+                             )
+
+
+def remove_function(entity_type_name, kpi_name, credentials=None, client=None):
     """
     delete a single kpi functions from an entity type's functions
         Uses the following APIs:
@@ -161,25 +184,28 @@ def remove_function(entity_type_name, kpi_name, credentials=None):
     'b90602b0-6f7f-4f6d-9f98-25a33becb313'.
     Note: this is not the same as the function_name like: 'Random Uniform'
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return:
     """
-    if kpi_name is None:
-        raise Exception(f'No kpi functions {kpi_name} found for entity type {entity_type_name}')
-
     # 2. API CONNECTION
     # :description: to access Watson IOT Platform Analytics.
     logger.debug('Connecting to API')
-    APIClient.environment_info = generate_api_environment(credentials)
-    path_arguments = {'entityTypeName': entity_type_name, 'kpiFunctionName': kpi_name}
-    # call api to retrieve all constants for a tenant
-    response = APIClient(api_suffix="kpi",
-                         http_method_name="DELETE",
-                         endpoint_suffix="/{orgId}/entityType/{entityTypeName}/kpiFunction/{kpiFunctionName}",
-                         path_arguments=path_arguments,
-                         ).call_api()
+    client = get_client(credentials, client)
+    response = _remove_function_request(entity_type_name, kpi_name, client).call_api()
     try:
         msg = 'Function deletion status: %s' % (response.data.decode('utf-8'))
     except AttributeError:
         msg = 'Function deletion status: %s' % response
     logger.info(msg)
-    return response.json()
+    return loads(response.content)
+
+
+async def remove_function_async(entity_type_name, kpi_name, credentials=None, client=None):
+    """
+    async version of remove_function
+    """
+    logger.debug('Connecting to API')
+    client = get_client(credentials, client)
+    response = await _remove_function_request(entity_type_name, kpi_name, client).call_api_async()
+    logger.info('Function deletion status: %s' % response.status_code)
+    return loads(response.content)
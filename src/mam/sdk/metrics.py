@@ -0,0 +1,175 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import bisect
+import threading
+
+# upper bounds in seconds of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = 'mam_sdk_api'
+
+
+class EndpointMetrics(object):
+    """
+    counters and latency histogram of one (api_suffix, method, endpoint template)
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.count = 0
+        self.errors = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency_sum = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def record(self, latency, bytes_out, bytes_in, error):
+        self.count += 1
+        self.errors += int(error)
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        self.latency_sum += latency
+        self.bucket_counts[bisect.bisect_left(self.buckets, latency)] += 1
+
+    def quantile(self, q):
+        """
+        estimate a latency quantile from the histogram, interpolating linearly inside the bucket
+        :param q: float between 0 and 1, e.g. 0.99
+        :return: float seconds, None when nothing was recorded
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):  # unbounded bucket, nothing to interpolate to
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def as_dict(self):
+        return {'count': self.count,
+                'errors': self.errors,
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in,
+                'latency_sum': self.latency_sum,
+                'latency_avg': self.latency_sum / self.count if self.count else None,
+                'latency_p50': self.quantile(0.5),
+                'latency_p90': self.quantile(0.9),
+                'latency_p99': self.quantile(0.99)}
+
+
+class MetricsRegistry(object):
+    """
+    per endpoint metrics of the api calls sent by the sdk
+    calls are keyed by api suffix, http method and endpoint template, e.g.
+    /{orgId}/entityType/{entityTypeName}/kpiFunction, so the number of series does not grow with tenants or entity
+    types
+    recording a call is a dict lookup and a few additions under a lock
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, api_suffix, method, endpoint, latency, bytes_out=0, bytes_in=0, status_code=None,
+               error=False):
+        """
+        :param api_suffix: api the call belongs to (meta, kpi, ...)
+        :param method: http method name
+        :param endpoint: endpoint template
+        :param latency: float seconds from sending the call to receiving the response, retries included
+        :param bytes_out: request body bytes sent
+        :param bytes_in: response body bytes received
+        :param status_code: http status code; 4xx and 5xx count as errors
+        :param error: True when the call failed without a response (connection error, open circuit)
+        """
+        key = (api_suffix or '', method.upper(), endpoint or '')
+        error = error or (status_code is not None and status_code >= 400)
+        with self._lock:
+            endpoint_metrics = self._endpoints.get(key)
+            if endpoint_metrics is None:
+                endpoint_metrics = self._endpoints[key] = EndpointMetrics(self.buckets)
+            endpoint_metrics.record(latency, bytes_out, bytes_in, error)
+
+    def snapshot(self):
+        """
+        :return: dict {(api_suffix, method, endpoint): dict of count, errors, bytes_out, bytes_in and latency
+        avg/p50/p90/p99 in seconds}
+        """
+        with self._lock:
+            return {key: endpoint_metrics.as_dict() for key, endpoint_metrics in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """
+        :param prefix: name prefix of the exported metrics
+        :return: str metrics in the prometheus text exposition format
+        """
+        with self._lock:
+            endpoints = [(key, _copy(endpoint_metrics)) for key, endpoint_metrics in sorted(self._endpoints.items())]
+
+        lines = []
+        counters = [('requests_total', 'API calls sent', 'count'),
+                    ('errors_total', 'API calls that failed or returned a 4xx/5xx status', 'errors'),
+                    ('request_bytes_total', 'Request body bytes sent', 'bytes_out'),
+                    ('response_bytes_total', 'Response body bytes received', 'bytes_in')]
+        for name, description, attribute in counters:
+            lines.append(f'# HELP {prefix}_{name} {description}')
+            lines.append(f'# TYPE {prefix}_{name} counter')
+            for key, endpoint_metrics in endpoints:
+                lines.append(f'{prefix}_{name}{{{_labels(key)}}} {getattr(endpoint_metrics, attribute)}')
+
+        name = f'{prefix}_request_duration_seconds'
+        lines.append(f'# HELP {name} Latency of API calls, retries included')
+        lines.append(f'# TYPE {name} histogram')
+        for key, endpoint_metrics in endpoints:
+            labels = _labels(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, endpoint_metrics.bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {endpoint_metrics.count}')
+            lines.append(f'{name}_sum{{{labels}}} {endpoint_metrics.latency_sum}')
+            lines.append(f'{name}_count{{{labels}}} {endpoint_metrics.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(endpoint_metrics):
+    copy = EndpointMetrics(endpoint_metrics.buckets)
+    copy.__dict__.update(endpoint_metrics.__dict__)
+    copy.bucket_counts = list(endpoint_metrics.bucket_counts)
+    return copy
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key):
+    api_suffix, method, endpoint = key
+    return f'api_suffix="{_escape(api_suffix)}",method="{_escape(method)}",endpoint="{_escape(endpoint)}"'
+
+
+_default_metrics = MetricsRegistry()
+
+
+def get_default_metrics():
+    """
+    registry shared by all transports unless they are given their own
+    :return: MetricsRegistry
+    """
+    return _default_metrics
@@ -8,14 +8,11 @@
 
 # python libraries
 import importlib
-from sqlalchemy import Column
-
-# iotfunctions modules
-from iotfunctions import ui
 
 # mam-sdk modules
 from .utils import *
-from .apiclient import (APIClient)
+from .client import (get_client)
+from .codec import (loads)
 
 
 def parse_input_columns(columns):
@@ -32,6 +29,8 @@ def parse_input_columns(columns):
     ```
     :return: a list of sqlalchemy Columns
     """
+    from sqlalchemy import Column
+
     ret_columns = []
 
     name_to_type = {}
@@ -61,6 +60,8 @@ def parse_input_constants(constants):
     ```
     :return: ui_control constants accepted BasicCustomEntity
     """
+    from iotfunctions import ui
+
     ret_constants = []
 
     for c in constants:
@@ -113,7 +114,7 @@ def parse_input_dimension_data(dimension_data):
     return ret_dimensions
 
 
-def parse_input_functions(functions, credentials=None):
+def parse_input_functions(functions, credentials=None, client=None):
     """
     generate function object from function names
 
@@ -132,11 +133,12 @@ def parse_input_functions(functions, credentials=None):
     }]
     ```
     :param credentials: dicts analytics-service devcredentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return: a list of functions objects/modules
     """
     ret_functions = []
 
-    valid_functions = get_catalog_functions(credentials=credentials)
+    valid_functions = get_catalog_functions(credentials=credentials, client=client)
     name_to_module = {}
     for item in valid_functions:
         name_to_module[item['name']] = item['moduleAndTargetName']
@@ -163,7 +165,7 @@ def parse_input_functions(functions, credentials=None):
     return ret_functions
 
 
-def get_catalog_functions(credentials=None):
+def get_catalog_functions(credentials=None, client=None):
     """
     find and returns a list of all catalog functions
 
@@ -171,15 +173,16 @@ def get_catalog_functions(credentials=None):
     PUT    /meta/v1/{orgId}/entityType/{entityTypeName}/archive
 
     :param credentials: dict analytics-service dev credentials
+    :param client: MonitorClient (optional) to make the api calls with instead of credentials
     :return: list of dicts containing all catalog functions
     """
 
     # API CONNECTION: GET ALL CATALOG FUNCTIONS
     logger.debug('Connecting to API')
-    APIClient.environment_info = generate_api_environment(credentials)
-    response = APIClient(api_suffix="catalog",
-                         http_method_name="GET",
-                         endpoint_suffix="/{orgId}/function",
-                         ).call_api()
+    client = get_client(credentials, client)
+    response = client.api_client(api_suffix="catalog",
+                                 http_method_name="GET",
+                                 endpoint_suffix="/{orgId}/function",
+                                 ).call_api()
 
-    return response.json()
+    return loads(response.content)
@@ -0,0 +1,170 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """
+    token bucket refilled at `rate` tokens per second up to `burst` tokens
+    callers reserve a token and wait until it is due. reservations are handed out in order, so concurrent callers
+    are spread evenly over time instead of all retrying at the moment tokens become available
+    """
+
+    def __init__(self, rate, burst=None):
+        '''
+
+        :param rate: float requests per second
+        :param burst: int requests that can be sent at once after an idle period. defaults to rate (min 1)
+        '''
+        if rate <= 0:
+            raise ValueError(f'rate must be positive, got {rate}')
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(rate, 1))
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        take tokens from the bucket
+        :param tokens: number of tokens to take
+        :return: float seconds the caller must wait before sending
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """
+        take tokens, sleeping until they are due
+        :return: float seconds waited
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class RateLimiter(object):
+    """
+    client side rate limits keyed by tenant and api suffix (meta, kpi, constants, master, asengine, alerts, catalog)
+    every tenant gets its own bucket per api suffix. limits can be set per api suffix and, optionally, per tenant
+    api suffixes without a configured limit are not limited
+    """
+
+    def __init__(self, default_rate=None, default_burst=None, rates=None):
+        '''
+
+        :param default_rate: float requests per second for api suffixes without their own limit. None: no limit
+        :param default_burst: int burst for the default rate
+        :param rates: dict {api_suffix: (rate, burst)} or {(tenant, api_suffix): (rate, burst)}
+        '''
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._rates = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        for key, (rate, burst) in (rates or {}).items():
+            if isinstance(key, tuple):
+                self.set_rate(key[1], rate, burst, tenant=key[0])
+            else:
+                self.set_rate(key, rate, burst)
+
+    def set_rate(self, api_suffix, rate, burst=None, tenant=None):
+        """
+        set the limit of an api suffix, for all tenants or for one tenant
+        :param api_suffix: str api suffix
+        :param rate: float requests per second. None removes the limit
+        :param burst: int requests allowed at once
+        :param tenant: str tenant id (optional)
+        """
+        with self._lock:
+            self._rates[(tenant, api_suffix)] = (rate, burst)
+            # rebuild buckets on next use
+            for key in [key for key in self._buckets if key[1] == api_suffix and tenant in (None, key[0])]:
+                del self._buckets[key]
+
+    def _bucket(self, tenant, api_suffix):
+        key = (tenant, api_suffix)
+        bucket = self._buckets.get(key, False)
+        if bucket is not False:
+            return bucket
+        with self._lock:
+            if key in self._buckets:
+                return self._buckets[key]
+            rate, burst = self._rates.get(key) or self._rates.get((None, api_suffix)) or \
+                (self.default_rate, self.default_burst)
+            bucket = TokenBucket(rate, burst) if rate is not None else None
+            self._buckets[key] = bucket
+            return bucket
+
+    def reserve(self, tenant, api_suffix):
+        """
+        reserve one request
+        :return: float seconds to wait before sending. use this from asyncio code and sleep asynchronously
+        """
+        bucket = self._bucket(tenant, api_suffix)
+        if bucket is None:
+            return 0.0
+        return bucket.reserve()
+
+    def acquire(self, tenant, api_suffix):
+        """
+        reserve one request and sleep until it may be sent. safe to call from many threads
+        :return: float seconds waited
+        """
+        wait = self.reserve(tenant, api_suffix)
+        if wait > 0:
+            logger.debug(f'Rate limit for {tenant}/{api_suffix}: waiting {wait:.3f}s')
+            time.sleep(wait)
+        return wait
+
+
+_default_rate_limiter = RateLimiter()
+
+
+def get_default_rate_limiter():
+    """
+    rate limiter shared by every transport that was not given its own, so all modules and clients of a tenant
+    draw from the same buckets. not limited until limits are configured
+    :return: RateLimiter
+    """
+    return _default_rate_limiter
+
+
+def configure_rate_limits(rates=None, default_rate=None, default_burst=None):
+    """
+    replace the limits of the shared rate limiter
+    :param rates: dict {api_suffix: (rate, burst)} or {(tenant, api_suffix): (rate, burst)}
+    :param default_rate: float requests per second for api suffixes without their own limit
+    :param default_burst: int burst for the default rate
+    :return: RateLimiter
+    """
+    limiter = _default_rate_limiter
+    with limiter._lock:
+        limiter.default_rate = default_rate
+        limiter.default_burst = default_burst
+        limiter._rates.clear()
+        limiter._buckets.clear()
+    for key, (rate, burst) in (rates or {}).items():
+        if isinstance(key, tuple):
+            limiter.set_rate(key[1], rate, burst, tenant=key[0])
+        else:
+            limiter.set_rate(key, rate, burst)
+    return limiter
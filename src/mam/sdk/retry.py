@@ -0,0 +1,232 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import random
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+logger = logging.getLogger(__name__)
+
+# throttling and transient server errors
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+# methods that can be sent again without changing the outcome
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class CircuitOpenError(Exception):
+    """raised instead of calling an endpoint whose circuit breaker is open"""
+    pass
+
+
+def parse_retry_after(value):
+    """
+    :param value: Retry-After header value, either seconds or an http date
+    :return: float seconds to wait, None if the header is missing or invalid
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class RetryPolicy(object):
+    """
+    exponential backoff with full jitter for throttled (429) and transient (5xx) responses and connection errors
+    only idempotent methods are retried unless the call is marked idempotent (e.g. read only POST queries)
+    """
+
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=30.0, jitter=True,
+                 status_codes=RETRY_STATUS_CODES, methods=IDEMPOTENT_METHODS, respect_retry_after=True):
+        '''
+
+        :param max_retries: number of retries after the first attempt
+        :param backoff_factor: base delay in seconds. the delay before retry n is backoff_factor * 2 ** n
+        :param max_backoff: upper bound of a single delay in seconds. a Retry-After longer than this is not
+        waited for; the response is returned to the caller instead
+        :param jitter: randomize delays between 0 and the computed backoff so that clients do not retry in lockstep
+        :param status_codes: response status codes that are retried
+        :param methods: http methods retried by default
+        :param respect_retry_after: wait for the time given in the Retry-After header when present
+        '''
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.status_codes = frozenset(status_codes)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.respect_retry_after = respect_retry_after
+
+    def is_retryable(self, method, idempotent=None):
+        """
+        :param method: http method name
+        :param idempotent: overrides the method based decision when not None
+        :return: bool
+        """
+        if idempotent is not None:
+            return idempotent
+        return method.upper() in self.methods
+
+    def backoff(self, attempt):
+        """
+        :param attempt: number of retries already made
+        :return: float seconds to wait before the next retry
+        """
+        delay = min(self.max_backoff, self.backoff_factor * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def retry_delay(self, attempt, status_code=None, headers=None):
+        """
+        decide whether a failed attempt is retried
+        :param attempt: number of retries already made
+        :param status_code: response status code, None for connection errors and timeouts
+        :param headers: response headers
+        :return: float seconds to wait before retrying, None when the attempt must not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+        if status_code is not None and status_code not in self.status_codes:
+            return None
+
+        if self.respect_retry_after and headers is not None:
+            retry_after = parse_retry_after(headers.get('Retry-After'))
+            if retry_after is not None:
+                if retry_after > self.max_backoff:
+                    return None
+                return retry_after
+
+        return self.backoff(attempt)
+
+
+class CircuitBreaker(object):
+    """
+    fails fast once an endpoint keeps failing
+    closed: calls go through. after failure_threshold consecutive failures the breaker opens
+    open: calls are rejected with CircuitOpenError until recovery_timeout has passed
+    half open: a single trial call is let through; success closes the breaker, failure opens it again
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        '''
+
+        :param failure_threshold: consecutive failures that open the breaker
+        :param recovery_timeout: seconds the breaker stays open before a trial call is allowed
+        '''
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """
+        :return: True when a call may be made now
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.recovery_timeout:
+                    return False
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            # half open: let one trial call through
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f'Circuit opened after {self._failures} consecutive failures')
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self):
+        """
+        give back the trial call of a half open breaker when the call ended without an outcome (e.g. it was
+        cancelled or the request could not be sent), so that the next call can try again
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, status_code):
+        """
+        record the outcome of a call from its status code. server errors count as failures; client errors,
+        including 429 throttling, mean the api is up
+        """
+        if status_code >= 500:
+            self.record_failure()
+        else:
+            self.record_success()
+
+
+class CircuitBreakerRegistry(object):
+    """
+    one CircuitBreaker per endpoint, created on first use
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                    self._breakers[key] = breaker
+        return breaker
+
+    def states(self):
+        """
+        :return: dict of breaker state keyed by endpoint
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {key: breaker.state for key, breaker in breakers.items()}
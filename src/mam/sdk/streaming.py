@@ -0,0 +1,181 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+# python libraries
+import codecs
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+_WHITESPACE = ' \t\n\r'
+# characters that can follow an element of an array
+_DELIMITERS = ',]' + _WHITESPACE
+
+
+class _Buffer(object):
+    """
+    text buffer filled from an iterator of byte chunks
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self, min_chars=1):
+        """
+        read chunks until at least min_chars more characters are buffered
+        :return: False when the stream ended before anything was added
+        """
+        added = 0
+        while added < min_chars and not self.exhausted:
+            chunk = next(self._chunks, None)
+            text = self._decoder.decode(chunk or b'', final=chunk is None)
+            if chunk is None:
+                self.exhausted = True
+            self.text += text
+            added += len(text)
+        return added > 0
+
+    def compact(self):
+        # drop consumed text once it is most of the buffer, so the buffer stays about the size of a chunk (or of the
+        # record being parsed) without copying the rest of the buffer after every record
+        if self.pos and self.pos * 2 >= len(self.text):
+            self.text = self.text[self.pos:]
+            self.pos = 0
+
+    def skip_whitespace(self):
+        """
+        :return: next non whitespace character, '' at the end of the stream
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+
+def iter_json_array(chunks):
+    """
+    incrementally parse a json array and yield its elements one at a time
+    only the element being parsed is kept in memory, so the peak memory does not grow with the size of the array.
+    a document that is not an array is parsed whole and yielded as a single record
+    :param chunks: iterable of bytes, e.g. requests.Response.iter_content()
+    :return: generator of decoded elements
+    """
+    decoder = json.JSONDecoder()
+    buffer = _Buffer(chunks)
+
+    first = buffer.skip_whitespace()
+    if first == '':
+        return
+    if first != '[':
+        while buffer.fill(len(buffer.text) or 1):
+            pass
+        yield decoder.decode(buffer.text[buffer.pos:])
+        return
+    buffer.pos += 1
+
+    expect_separator = False
+    while True:
+        buffer.compact()
+        char = buffer.skip_whitespace()
+        if char == ']':
+            return
+        if char == '':
+            raise ValueError('Unexpected end of json array')
+        if expect_separator:
+            if char != ',':
+                raise ValueError(f'Expected , or ] in json array, got {char!r}')
+            buffer.pos += 1
+            buffer.skip_whitespace()
+
+        while True:
+            try:
+                record, end = decoder.raw_decode(buffer.text, buffer.pos)
+            except json.JSONDecodeError:
+                record, end = None, None
+            # an element is complete once a delimiter follows it. a value touching the end of the buffer, or followed
+            # by a character that can extend it (e.g. 12. of 12.75), may continue in the next chunk
+            if end is not None and (buffer.exhausted or (end < len(buffer.text) and buffer.text[end] in _DELIMITERS)):
+                break
+            # grow the buffer geometrically, so a large element is not re-parsed once per chunk
+            if not buffer.fill(len(buffer.text) - buffer.pos or 1):
+                if end is not None:
+                    break
+                raise ValueError('Unexpected end of json array')
+        buffer.pos = end
+        expect_separator = True
+        yield record
+
+
+class ResponseRecords(object):
+    """
+    iterator of the records of a streamed json array response, owning the response
+    the response is closed once the records are exhausted or parsing fails. a caller that may stop before the end,
+    or may not iterate at all, must close it, with close() or by using it as a context manager:
+        with alerts.get_alerts_stream(json_payload) as records:
+            for record in records:
+                ...
+    """
+
+    def __init__(self, response, chunk_size=DEFAULT_CHUNK_SIZE):
+        '''
+
+        :param response: requests.Response requested with stream=True
+        :param chunk_size: bytes read from the socket at a time
+        '''
+        self.response = response
+        self.chunk_size = chunk_size
+        self._records = None
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        if self._records is None:
+            self._records = iter_json_array(self.response.iter_content(self.chunk_size))
+        try:
+            return next(self._records)
+        except BaseException:
+            # StopIteration at the end of the array, or a parsing or connection error
+            self.close()
+            raise
+
+    def close(self):
+        """
+        close the response, giving its connection back to the pool. records not read yet are dropped
+        """
+        if not self.closed:
+            self.closed = True
+            if self._records is not None:
+                self._records.close()
+            self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def iter_response_records(response, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    iterate the records of a streamed json array response. the response is closed when the records are exhausted;
+    close the returned ResponseRecords, or use it in a with statement, to release it earlier
+    :param response: requests.Response requested with stream=True
+    :param chunk_size: bytes read from the socket at a time
+    :return: ResponseRecords
+    """
+    return ResponseRecords(response, chunk_size)
@@ -9,13 +9,13 @@
 # python libraries
 import json
 import re
-import numpy as np
 import logging
 from string import punctuation, whitespace
-from sqlalchemy import Integer, String, Float, DateTime, Boolean, SmallInteger
 from datetime import datetime
 
-logging.basicConfig(level=logging.DEBUG)
+# mam-sdk modules
+from . import codec
+
 logger = logging.getLogger(__name__)
 
 delimiter_pattern = "|".join([re.escape(delimiter) for delimiter in punctuation + whitespace + "t" + "T"])
@@ -25,12 +25,18 @@ compiled_delimiter_pattern = re.compile(delimiter_pattern)
 def validateJSON(json_payload):
     """validate that the input parameter is a valid json file"""
     try:
-        payload = json.loads(json_payload)
+        payload = codec.loads(json_payload)
     except ValueError as err:
         return False
     return payload
 
 
+def validate(instance, schema):
+    """validate instance against a json schema. jsonschema is imported on first use to keep the sdk import fast"""
+    import jsonschema
+    jsonschema.validate(instance=instance, schema=schema)
+
+
 def convert_to_datetime(timestamp_string):
     """convert string input to datetime.datetime type"""
     if timestamp_string is None:
@@ -51,24 +57,25 @@ def validate_and_normalize_timestamp(timestamp_string):
     return datetime_timestamp.isoformat(sep=" ")
 
 
-# converting user input 'type' to sqlalchemy type
+# converting user input 'type' to sqlalchemy type (name of the type in the sqlalchemy package)
 _type_sql_dict = {
-    'int': Integer,
-    'integer': Integer,
-    'string': String,
-    'str': String,
-    'float': Float,
-    'number': Float,
-    'datetime': DateTime,
-    'bool': Boolean,
-    'boolean': Boolean
+    'int': 'Integer',
+    'integer': 'Integer',
+    'string': 'String',
+    'str': 'String',
+    'float': 'Float',
+    'number': 'Float',
+    'datetime': 'DateTime',
+    'bool': 'Boolean',
+    'boolean': 'Boolean'
 }
 
 
 def sqlalchemy_type(type):
     """Return the closest sql type for a given string"""
     if type in _type_sql_dict:
-        return _type_sql_dict[type.lower()]
+        import sqlalchemy
+        return getattr(sqlalchemy, _type_sql_dict[type.lower()])
     else:
         raise NotImplementedError(
             "You may add custom `sqltype` to `" + str(type) + "` assignment in `_type_sql_dict`.")
@@ -189,11 +196,11 @@ def api_type(type):
             "You may add custom `datatype` to `" + str(type) + "` assignment in `_type_user_to_api_dict`.")
 
 
-# converting api types to python built-in type
+# converting api types to python built-in type (timestamps are naive utc datetime64[ns])
 _type_api_to_pandas_dict = {
     'NUMBER': float,
     'LITERAL': str,
-    'TIMESTAMP': np.datetime64,
+    'TIMESTAMP': 'datetime64[ns]',
     'BOOLEAN': bool,
 }
 
@@ -217,17 +224,69 @@ def db_table_name(table_name, db_type):
     return table_name
 
 
-def change_df_dtype_to_db_dtype(df, entity_type_columns):
+def db_dtype_conversions(df, entity_type_columns, float32=False):
     """
 
     :param df: pandas.Dataframe df we want to write to db
     :param entity_type_columns: db column information
-    :return: pandas.Dataframe with coerced columns
+    :param float32: bool NUMBER columns are float32 instead of float64
+    :return: dict column name: type, for the columns whose type is not the database type. timezone aware
+    timestamp columns are listed too; convert them with to_naive_utc before astype
     """
+    import numpy as np
+    import pandas as pd
+
+    conversions = {}
     for column in entity_type_columns:
         if column['name'] in df.columns:
+            dtype = df[column['name']].dtype
+            pandas_type = api_to_pandas_type(column['columnType'])
             logger.debug(f"Column {column['name']}'s database type is {column['columnType']} and dataframe's type is"
-                         f" {df[column['name']].dtype}")
-            df[column['name']] = df[column['name']].astype(api_to_pandas_type(column['columnType']))
-            logger.debug(f"Changed dataframe type to {df[column['name']].dtype}")
+                         f" {dtype}")
+            # columns read with the right type (e.g. from parquet) are not copied. strings can be kept as categories
+            if pandas_type is str and isinstance(dtype, (pd.CategoricalDtype, pd.StringDtype)):
+                continue
+            if pandas_type is float:
+                # compared by kind and size: np.issubdtype(np.float32, float) is False
+                pandas_type = np.float32 if float32 else np.float64
+                if isinstance(dtype, np.dtype) and dtype.kind == 'f' and dtype == np.dtype(pandas_type):
+                    continue
+            if not (isinstance(dtype, np.dtype) and np.issubdtype(dtype, pandas_type)):
+                conversions[column['name']] = pandas_type
+    return conversions
+
+
+def to_naive_utc(series):
+    """
+    timestamps are stored in utc without a timezone. astype can not drop the timezone of a timestamp column
+    :param series: pandas.Series
+    :return: series of a timezone aware timestamp column converted to naive utc timestamps, other series unchanged
+    """
+    import pandas as pd
+
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series.dt.tz_convert('UTC').dt.tz_localize(None)
+    return series
+
+
+def change_df_dtype_to_db_dtype(df, entity_type_columns, float32=False):
+    """
+
+    :param df: pandas.Dataframe df we want to write to db
+    :param entity_type_columns: db column information
+    :param float32: bool NUMBER columns are float32 instead of float64
+    :return: pandas.Dataframe with coerced columns
+    """
+    import pandas as pd
+
+    conversions = db_dtype_conversions(df, entity_type_columns, float32=float32)
+    if not conversions:
+        return df
+    timezone_aware = {column: to_naive_utc(df[column]) for column in conversions
+                      if isinstance(df[column].dtype, pd.DatetimeTZDtype)}
+    if timezone_aware:
+        df = df.assign(**timezone_aware)
+    # all columns are coerced in one step
+    df = df.astype(conversions)
+    logger.debug(f'Changed dataframe types to {df.dtypes[list(conversions)].to_dict()}')
     return df
@@ -0,0 +1,90 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import os
+import sys
+import threading
+
+import pytest
+
+# run the tests against the sources, and make the fake Monitor api of the scripts importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+
+@pytest.fixture
+def fake_api():
+    """
+    fake Monitor api server (scripts/fake_monitor_api.py) running for the duration of a test
+    """
+    from fake_monitor_api import FakeMonitorAPI
+
+    with FakeMonitorAPI(seed=0) as server:
+        yield server
+
+
+@pytest.fixture
+def client_factory(fake_api):
+    """
+    builds MonitorClient instances pointed at fake_api and closes them at the end of the test
+    """
+    from mam.sdk.client import MonitorClient
+
+    clients = []
+
+    def make(tenant_id='fake_tenant', **transport_settings):
+        client = MonitorClient(fake_api.credentials(tenant_id), **transport_settings)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+class FakeDatabase(object):
+    """
+    stands in for iotfunctions.db.Database in the ingest tests: serves the metadata of one entity type with a
+    metric table and keeps the frames written to it
+    """
+    db_type = 'postgres'
+    tenant_id = 'fake_tenant'
+
+    # data items of the pumps entity type: name, database type
+    DATA_ITEMS = [('deviceid', 'LITERAL'), ('evt_timestamp', 'TIMESTAMP'), ('devicetype', 'LITERAL'),
+                  ('pressure', 'NUMBER'), ('state', 'LITERAL')]
+    COLUMNS = ['deviceid', 'evt_timestamp', 'devicetype', 'updated_utc', 'rcv_timestamp_utc', 'pressure', 'state']
+
+    def __init__(self):
+        self.entity_type_metadata = {'pumps': {'name': 'pumps',
+                                               'metricTableName': 'iot_pumps',
+                                               'metricTimestampColumn': 'evt_timestamp',
+                                               'dataItemDto': [{'name': name, 'columnType': column_type}
+                                                               for name, column_type in self.DATA_ITEMS]}}
+        self.metadata_reads = 0
+        self.frames = []
+        self.released = False
+        self._lock = threading.Lock()
+
+    def get_column_names(self, table, schema=None):
+        self.metadata_reads += 1
+        return list(self.COLUMNS)
+
+    def write_frame(self, df, table_name):
+        assert table_name == 'iot_pumps'
+        with self._lock:
+            self.frames.append(df)
+
+    def release_resource(self):
+        self.released = True
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDatabase()
@@ -0,0 +1,131 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import json
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import pytest
+
+from mam.sdk import alerts
+from mam.sdk.retry import (CircuitBreakerRegistry, CircuitOpenError)
+
+ALERTS_QUERY = json.dumps({'entityTypesFilter': [{'name': 'pumps', 'dataItem': ['alert_item']}],
+                           'start_ts': '2020-07-28-00.00.00.000000', 'end_ts': '2020-07-29-00.00.00.000000'})
+
+
+@pytest.fixture
+def alert_ids(fake_api):
+    state = fake_api.state('fake_tenant')
+    state.add_entity_type('pumps')
+    return state.add_alerts('pumps', 'alert_item', 10, datetime(2020, 7, 28), datetime(2020, 7, 29))
+
+
+def test_bulk_update_alert_status(fake_api, client_factory, alert_ids):
+    client = client_factory()
+    updates = {alert_ids[0]: 'dismissed', alert_ids[1]: 'RESOLVED', 'unknown': 'new'}
+    results = alerts.bulk_update_alert_status(updates, client=client, chunk_size=2)
+    assert [result['success'] for result in results] == [True, True, False]
+    assert results[1]['status'] == 'Resolved'
+    assert results[2]['error'] == 'Alert was not updated'
+    state = fake_api.state('fake_tenant')
+    assert state.alerts[alert_ids[0]]['status'] == 'Dismissed'
+    assert state.alerts[alert_ids[1]]['status'] == 'Resolved'
+
+
+def test_bulk_update_reports_invalid_values_as_given(fake_api, client_factory, alert_ids):
+    client = client_factory()
+    results = alerts.bulk_update_alert_severity([(alert_ids[0], 'HIGH'), (alert_ids[1], 'sEvere')], client=client)
+    assert results[0]['success'] is True
+    assert results[1] == {'alert_id': alert_ids[1], 'severity': 'sEvere', 'success': False,
+                          'error': 'Invalid value sEvere for severity'}
+    # the invalid update is not sent
+    assert fake_api.state('fake_tenant').alerts[alert_ids[1]]['severity'] == 'Medium'
+
+
+def test_update_alert_status_reports_invalid_value_as_given(client_factory):
+    with pytest.raises(Exception, match='Invalid value Closed for new_status argument'):
+        alerts.update_alert_status('1', 'Closed', client=client_factory())
+
+
+def alerts_breaker(fake_api, client):
+    return client.transport.circuit_breakers.get((urlsplit(fake_api.url).netloc, 'asengine',
+                                                  '/{orgId}/queryalertdata'))
+
+
+def test_windowed_query_splits_windows_refused_as_too_large(fake_api, client_factory, alert_ids):
+    fake_api.state('fake_tenant').max_query_alerts = 3
+    client = client_factory(circuit_breakers=CircuitBreakerRegistry(failure_threshold=2))
+    result = alerts.get_alerts_windowed(ALERTS_QUERY, client=client, min_window=timedelta(minutes=1))
+    assert [alert['alert_id'] for alert in result] == alert_ids
+    # the 504 answers were split, not retried, and do not count as failures of the endpoint
+    assert alerts_breaker(fake_api, client).state == 'closed'
+    assert alerts_breaker(fake_api, client)._failures == 0
+
+
+def test_windowed_query_sends_slices_once_with_a_short_timeout(fake_api, client_factory, alert_ids):
+    fake_api.latency = 0.3
+    client = client_factory(circuit_breakers=CircuitBreakerRegistry(failure_threshold=2))
+    with pytest.raises(Exception, match='is still too large'):
+        alerts.get_alerts_windowed(ALERTS_QUERY, client=client, min_window=timedelta(hours=12), window_timeout=0.05)
+    # the whole day, then its two halves; no retries
+    assert fake_api.request_count == 3
+    assert alerts_breaker(fake_api, client).state == 'closed'
+
+
+def test_windowed_query_fails_clearly_when_the_circuit_is_open(fake_api, client_factory, alert_ids):
+    client = client_factory(circuit_breakers=CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=60))
+    alerts_breaker(fake_api, client).record_failure()
+    with pytest.raises(CircuitOpenError, match='Retry after the recovery timeout'):
+        alerts.get_alerts_windowed(ALERTS_QUERY, client=client, window=timedelta(hours=1))
+    assert fake_api.request_count == 0
+
+
+def test_windowed_query_refuses_aggregated_queries(fake_api, client_factory, alert_ids):
+    # a group crossing the 12:00 window boundary would be returned as two partial buckets
+    query = dict(json.loads(ALERTS_QUERY), groupBy=['severity'], time_grain='day')
+    with pytest.raises(Exception, match='groupBy, time_grain'):
+        alerts.get_alerts_windowed(json.dumps(query), client=client_factory(), window=timedelta(hours=12))
+    assert fake_api.request_count == 0
+
+
+def test_windowed_query_keeps_identical_alerts_of_one_window(client_factory, monkeypatch):
+    row = {'entity_id': 'pump-1', 'severity': 'High', 'timestamp': '2020-07-28-12.00.00.000000'}
+    other = {'entity_id': 'pump-2', 'severity': 'Low', 'timestamp': '2020-07-28-18.00.00.000000'}
+    windows = {datetime(2020, 7, 28): [row, row], datetime(2020, 7, 28, 12): [row, other]}
+    monkeypatch.setattr(alerts, '_fetch_alert_window',
+                        lambda payload, group, window_start, *args: windows[window_start])
+    result = alerts.get_alerts_windowed(ALERTS_QUERY, client=client_factory(), window=timedelta(hours=12))
+    # the boundary alert returned by both windows is not counted twice
+    assert result == [row, row, other]
+
+
+def test_alerts_to_frame_parses_monitor_timestamps(caplog):
+    records = [{'alert_id': '1', 'severity': 'High', 'timestamp': '2020-07-28-13.45.00.000000'},
+               {'alert_id': '2', 'severity': 'Low', 'timestamp': '2020-07-28-13.50.30.250000'}]
+    df = alerts.alerts_to_frame(records)
+    assert str(df['timestamp'].dtype).startswith('datetime64')
+    assert df['timestamp'].tolist() == [datetime(2020, 7, 28, 13, 45), datetime(2020, 7, 28, 13, 50, 30, 250000)]
+    assert str(df['severity'].dtype) == 'category'
+    assert 'NaT' not in caplog.text
+
+
+def test_alerts_to_frame_falls_back_to_iso_timestamps(fake_api, client_factory, alert_ids):
+    # the fake api returns ISO timestamps
+    df = alerts.get_alerts_frame(ALERTS_QUERY, client=client_factory())
+    assert len(df) == len(alert_ids)
+    assert df['timestamp'].notna().all()
+    assert df['timestamp'].iloc[0] == datetime(2020, 7, 28)
+
+
+def test_alerts_to_frame_warns_about_unparsed_timestamps(caplog):
+    records = [{'timestamp': '2020-07-28-13.45.00.000000'}, {'timestamp': 'yesterday'}, {'timestamp': None}]
+    df = alerts.alerts_to_frame(records)
+    assert df['timestamp'].isna().tolist() == [False, True, True]
+    assert "1 of 3 values of timestamp are not timestamps" in caplog.text
+    assert "'yesterday'" in caplog.text
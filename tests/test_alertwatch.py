@@ -0,0 +1,94 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import json
+from datetime import datetime, timedelta
+
+from fake_monitor_api import ALERT_TIMESTAMP_FORMAT
+from mam.sdk import alertwatch
+from mam.sdk.alertwatch import AlertWatcher
+
+ENTITY_TYPES_FILTER = [{'name': 'pumps', 'dataItem': ['alert_item']}]
+FIRST_ALERT = datetime(2020, 7, 28, 12)
+
+
+def add_alert(state, alert_key, timestamp, alert_id=True, **fields):
+    alert = {'entity_id': 'A001', 'entity_type_name': 'pumps', 'data_item_name': 'alert_item',
+             'timestamp': timestamp.strftime(ALERT_TIMESTAMP_FORMAT), 'severity': 'High', 'status': 'New',
+             'value': 1.0}
+    if alert_id:
+        alert['alert_id'] = alert_key
+    alert.update(fields)
+    with state.lock:
+        state.alerts[alert_key] = alert
+    return alert
+
+
+def test_poll_reports_new_and_changed_alerts(fake_api, client_factory, tmp_path):
+    state = fake_api.state('fake_tenant')
+    add_alert(state, '1', FIRST_ALERT)
+    cursor_path = str(tmp_path / 'alerts.cursor')
+    watcher = AlertWatcher(ENTITY_TYPES_FILTER, client=client_factory(), cursor_path=cursor_path)
+    assert [alert['alert_id'] for alert in watcher.poll(now=FIRST_ALERT + timedelta(minutes=1))] == ['1']
+    assert watcher.poll(now=FIRST_ALERT + timedelta(minutes=2)) == []
+
+    state.alerts['1']['status'] = 'Acknowledged'
+    add_alert(state, '2', FIRST_ALERT + timedelta(minutes=2))
+    # a restarted watcher continues from the saved cursor
+    watcher = AlertWatcher(ENTITY_TYPES_FILTER, client=client_factory(), cursor_path=cursor_path)
+    assert sorted(alert['alert_id'] for alert in watcher.poll(now=FIRST_ALERT + timedelta(minutes=3))) == ['1', '2']
+
+
+def test_alerts_without_id_are_told_apart(fake_api, client_factory):
+    state = fake_api.state('fake_tenant')
+    add_alert(state, 'a', FIRST_ALERT, alert_id=False, entity_id='A001')
+    add_alert(state, 'b', FIRST_ALERT, alert_id=False, entity_id='A002')
+    watcher = AlertWatcher(ENTITY_TYPES_FILTER, client=client_factory())
+    assert len(watcher.poll(now=FIRST_ALERT + timedelta(minutes=1))) == 2
+    assert watcher.poll(now=FIRST_ALERT + timedelta(minutes=2)) == []
+
+    state.alerts['b']['severity'] = 'Low'
+    assert [alert['entity_id'] for alert in watcher.poll(now=FIRST_ALERT + timedelta(minutes=3))] == ['A002']
+
+
+def test_overlap_catches_alerts_stored_behind_the_cursor(fake_api, client_factory):
+    state = fake_api.state('fake_tenant')
+    add_alert(state, '1', FIRST_ALERT)
+    watcher = AlertWatcher(ENTITY_TYPES_FILTER, client=client_factory(), overlap=timedelta(minutes=5))
+    # the local clock is 4 minutes ahead of the server
+    watcher.poll(now=FIRST_ALERT + timedelta(minutes=4))
+    assert watcher.cursors[('pumps', 'alert_item')] == FIRST_ALERT + timedelta(minutes=4)
+
+    # stored late with a server timestamp that is already behind the cursor
+    add_alert(state, '2', FIRST_ALERT + timedelta(minutes=3))
+    new_alerts = watcher.poll(now=FIRST_ALERT + timedelta(minutes=11))
+    assert [alert['alert_id'] for alert in new_alerts] == ['2']
+    assert watcher.cursors[('pumps', 'alert_item')] == FIRST_ALERT + timedelta(minutes=11)
+
+
+def test_consecutive_polls_only_overlap_by_overlap(fake_api, client_factory, monkeypatch):
+    windows = []
+
+    def get_alerts(json_payload, client=None):
+        payload = json.loads(json_payload)
+        windows.append((datetime.strptime(payload['start_ts'], alertwatch.ALERT_TIMESTAMP_FORMAT),
+                        datetime.strptime(payload['end_ts'], alertwatch.ALERT_TIMESTAMP_FORMAT)))
+        return []
+
+    monkeypatch.setattr(alertwatch, 'get_alerts', get_alerts)
+    overlap = timedelta(minutes=5)
+    watcher = AlertWatcher(ENTITY_TYPES_FILTER, client=client_factory(), lookback=timedelta(hours=1),
+                           overlap=overlap)
+    for now in [FIRST_ALERT, FIRST_ALERT + timedelta(minutes=1), FIRST_ALERT + timedelta(hours=5)]:
+        watcher.poll(now=now)
+
+    # the first poll looks lookback back, the next ones start where the previous one ended, minus the overlap
+    assert windows[0] == (FIRST_ALERT - timedelta(hours=1) - overlap, FIRST_ALERT)
+    for (_, previous_end), (start, _) in zip(windows, windows[1:]):
+        assert start == previous_end - overlap
+    assert windows[-1] == (FIRST_ALERT + timedelta(minutes=1) - overlap, FIRST_ALERT + timedelta(hours=5))
@@ -0,0 +1,210 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mam.sdk import apiclient
+from mam.sdk.apiclient import (APIClient, Transport)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def catalog_url(server, tenant_id='fake_tenant'):
+    return f'{server.url}/api/catalog/v1/{tenant_id}/function'
+
+
+def test_transport_reuses_connections(fake_api):
+    transport = Transport(cache=False, rate_limiter=False, metrics=False)
+    for _ in range(5):
+        assert transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code == 200
+    stats = transport.pool_stats()
+    transport.close()
+    assert stats['requests'] == 5
+    assert stats['misses'] == 1
+    assert stats['hits'] == 4
+
+
+def test_transport_without_keep_alive_opens_a_connection_per_request(fake_api):
+    transport = Transport(keep_alive=False, cache=False, rate_limiter=False, metrics=False)
+    for _ in range(3):
+        assert transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code == 200
+    stats = transport.pool_stats()
+    transport.close()
+    assert stats['misses'] == 3
+    assert stats['hits'] == 0
+
+
+def test_pool_stats_survive_evicted_host_pools(fake_api):
+    # one host pool is kept: alternating between two host names evicts the other one each time
+    transport = Transport(pool_connections=1, cache=False, rate_limiter=False, metrics=False)
+    other_host_url = catalog_url(fake_api).replace('127.0.0.1', 'localhost')
+    for url in [catalog_url(fake_api), other_host_url, catalog_url(fake_api)]:
+        assert transport.request('GET', url, headers=HEADERS).status_code == 200
+    stats = transport.pool_stats()
+    transport.close()
+    assert stats['pools'] == 1
+    assert stats['requests'] == 3
+    assert stats['misses'] == 3
+
+
+def test_api_client_uses_the_given_transport(fake_api):
+    transport = Transport(cache=False, rate_limiter=False, metrics=False)
+    environment_info = {'tenant_id': 'fake_tenant', 'base_url': fake_api.url, 'authentication_header': HEADERS}
+    response = APIClient(api_suffix='catalog', http_method_name='GET', endpoint_suffix='/{orgId}/function',
+                         environment_info=environment_info, transport=transport).call_api()
+    transport.close()
+    assert response.status_code == 200
+    assert transport.pool_stats()['requests'] == 1
+
+
+def test_configure_transport_replaces_and_closes_the_shared_transport(monkeypatch):
+    monkeypatch.setattr(apiclient, '_default_transport', None)
+    first = apiclient.get_default_transport()
+    assert apiclient.get_default_transport() is first
+
+    closed = []
+    monkeypatch.setattr(first, 'close', lambda: closed.append(first))
+    second = apiclient.configure_transport(pool_maxsize=2, timeout=5)
+    assert apiclient.get_default_transport() is second
+    assert (second.pool_maxsize, second.timeout) == (2, 5)
+    assert closed == [first]
+    second.close()
+
+
+@pytest.mark.parametrize('base_url, expected', [('api.example.com', 'https://api.example.com/api/meta/v1/t/x'),
+                                                ('http://127.0.0.1:8080', 'http://127.0.0.1:8080/api/meta/v1/t/x')])
+def test_base_url_scheme(base_url, expected):
+    environment_info = {'tenant_id': 't', 'base_url': base_url, 'authentication_header': HEADERS}
+    url, _ = APIClient(api_suffix='meta', http_method_name='GET', endpoint_suffix='/{orgId}/x',
+                       environment_info=environment_info)._prepare_request()
+    assert url == expected
+
+
+def _async_transport(**settings):
+    pytest.importorskip('aiohttp')
+    from mam.sdk.apiclient import AsyncTransport
+    return AsyncTransport(cache=False, rate_limiter=False, metrics=False, **settings)
+
+
+def test_async_transport_across_successive_event_loops(fake_api, recwarn):
+    import asyncio
+    import gc
+
+    transport = _async_transport()
+    sessions = []
+
+    async def call():
+        response = await transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+        sessions.append(transport._get_session().session)
+        return response.status_code
+
+    assert asyncio.run(call()) == 200
+    # the session is closed when its event loop shuts down
+    assert sessions[0].closed
+    assert asyncio.run(call()) == 200
+    assert sessions[1] is not sessions[0]
+    assert sessions[1].closed
+
+    gc.collect()
+    assert not [warning for warning in recwarn if 'Unclosed' in str(warning.message)]
+
+
+def test_async_transport_close(fake_api):
+    import asyncio
+
+    transport = _async_transport()
+
+    async def call_and_close():
+        await transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+        session = transport._get_session().session
+        await transport.close()
+        return session
+
+    assert asyncio.run(call_and_close()).closed
+    assert not transport._sessions
+
+
+def test_async_transport_shared_by_concurrent_event_loops(fake_api):
+    import asyncio
+
+    transport = _async_transport()
+    first_call_done = threading.Event()
+    other_loop_done = threading.Event()
+    sessions = {}
+
+    async def first_loop():
+        await transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+        sessions['first'] = transport._get_session().session
+        first_call_done.set()
+        # the loop keeps running while the other thread uses the transport
+        await asyncio.to_thread(other_loop_done.wait, 10)
+        assert not sessions['first'].closed
+        response = await transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+        assert transport._get_session().session is sessions['first']
+        return response.status_code
+
+    def other_loop():
+        first_call_done.wait(10)
+
+        async def call():
+            response = await transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+            sessions['other'] = transport._get_session().session
+            await transport.close()
+            return response.status_code
+
+        try:
+            return asyncio.run(call())
+        finally:
+            other_loop_done.set()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(other_loop)
+        assert asyncio.run(first_loop()) == 200
+        assert other.result() == 200
+    assert sessions['other'] is not sessions['first']
+    assert sessions['first'].closed and sessions['other'].closed
+    assert not transport._sessions
+
+
+def test_async_transport_bounds_requests_in_flight(fake_api):
+    import asyncio
+    import time
+
+    fake_api.latency = 0.05
+    transport = _async_transport(max_concurrency=2)
+
+    async def calls():
+        return await asyncio.gather(*[transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+                                      for _ in range(6)])
+
+    started = time.perf_counter()
+    responses = asyncio.run(calls())
+    elapsed = time.perf_counter() - started
+    assert [response.status_code for response in responses] == [200] * 6
+    # 6 calls, 2 at a time, 50ms each
+    assert elapsed >= 0.15
+
+
+def test_async_functions_match_the_sync_ones(fake_api, client_factory):
+    import asyncio
+    from mam.sdk import kpifunction
+
+    pytest.importorskip('aiohttp')
+    fake_api.state('fake_tenant').add_entity_type('pumps', functions=3)
+    client = client_factory()
+
+    async def get_functions():
+        try:
+            return await kpifunction.get_functions_async('pumps', client=client)
+        finally:
+            await client.async_transport.close()
+
+    assert asyncio.run(get_functions()) == kpifunction.get_functions('pumps', client=client)
@@ -0,0 +1,249 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import os
+import pickle
+import time
+
+import pytest
+
+from mam.sdk.apiclient import Transport
+from mam.sdk.cache import (ResponseCache, DiskCacheStore, MemoryCacheStore, MetadataCache,
+                           get_default_metadata_cache)
+from mam.sdk.ingest import (MetricsTable)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+KPI_ENDPOINT = '/{orgId}/entityType/{entityTypeName}/kpiFunction'
+
+
+def _transport(cache):
+    return Transport(cache=cache, single_flight=False, rate_limiter=False, metrics=False)
+
+
+def _get_functions(transport, server, entity_type_name='pumps'):
+    url = f'{server.url}/api/kpi/v1/fake_tenant/entityType/{entity_type_name}/kpiFunction'
+    return transport.request('GET', url, headers=HEADERS, tenant='fake_tenant', api_suffix='kpi',
+                             endpoint=KPI_ENDPOINT)
+
+
+def _entry(cache, tenant, url, api_suffix='kpi', endpoint=KPI_ENDPOINT):
+    return cache.put(cache.key(tenant, url), 200, {'ETag': '"1"'}, b'[]', url, 'utf-8', tenant, api_suffix, endpoint)
+
+
+def test_fresh_responses_are_served_from_the_cache(fake_api):
+    fake_api.state('fake_tenant').add_entity_type('pumps')
+    cache = ResponseCache()
+    transport = _transport(cache)
+    first = _get_functions(transport, fake_api)
+    second = _get_functions(transport, fake_api)
+    transport.close()
+    assert second.json() == first.json()
+    assert fake_api.request_count == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_expired_responses_are_revalidated_with_their_etag(fake_api):
+    fake_api.state('fake_tenant').add_entity_type('pumps')
+    cache = ResponseCache(ttls={'kpi': 0.05})
+    transport = _transport(cache)
+    first = _get_functions(transport, fake_api)
+    time.sleep(0.06)
+    second = _get_functions(transport, fake_api)
+    transport.close()
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert fake_api.request_count == 2
+    assert cache.stats()['revalidated'] == 1
+
+
+def test_writes_invalidate_the_cached_resource(fake_api):
+    state = fake_api.state('fake_tenant')
+    state.add_entity_type('pumps', functions=2)
+    cache = ResponseCache()
+    transport = _transport(cache)
+    kpi_name = _get_functions(transport, fake_api).json()[0]['name']
+    url = f'{fake_api.url}/api/kpi/v1/fake_tenant/entityType/pumps/kpiFunction/{kpi_name}'
+    transport.request('DELETE', url, headers=HEADERS, tenant='fake_tenant', api_suffix='kpi')
+    assert len(_get_functions(transport, fake_api).json()) == 1
+    transport.close()
+    assert cache.stats()['invalidated'] == 1
+
+
+def test_entity_type_lifecycle_writes_invalidate_every_api():
+    cache = ResponseCache()
+    base = 'https://host/api'
+    _entry(cache, 't', f'{base}/kpi/v1/t/entityType/pumps/kpiFunction')
+    _entry(cache, 't', f'{base}/master/v1/t/entityType/pumps/dimensional', 'master',
+           '/{orgId}/entityType/{entityTypeName}/dimensional')
+    _entry(cache, 't', f'{base}/kpi/v1/t/entityType/fans/kpiFunction')
+    _entry(cache, 'other', f'{base}/kpi/v1/other/entityType/pumps/kpiFunction')
+    assert cache.invalidate_for_write('t', 'meta', f'{base}/meta/v1/t/entityType/pumps/archive') == 2
+    assert cache.get(cache.key('t', f'{base}/kpi/v1/t/entityType/fans/kpiFunction')) is not None
+    assert cache.get(cache.key('other', f'{base}/kpi/v1/other/entityType/pumps/kpiFunction')) is not None
+
+
+def test_read_only_queries_do_not_invalidate(fake_api, monkeypatch):
+    cache = ResponseCache()
+    transport = _transport(cache)
+    invalidated = []
+    monkeypatch.setattr(cache, 'invalidate_for_write', lambda *args: invalidated.append(args))
+    url = f'{fake_api.url}/api/asengine/v1/fake_tenant/queryalertdata'
+    transport.request('POST', url, headers=HEADERS, data='{}', tenant='fake_tenant', api_suffix='asengine',
+                      read_only=True)
+    assert invalidated == []
+    transport.request('PUT', f'{fake_api.url}/api/alerts/v1/fake_tenant', headers=HEADERS, data='[]',
+                      tenant='fake_tenant', api_suffix='alerts')
+    transport.close()
+    assert len(invalidated) == 1
+
+
+def test_invalidation_does_not_read_the_disk_store(tmp_path, monkeypatch):
+    disk_store = DiskCacheStore(str(tmp_path))
+    cache = ResponseCache(disk_store=disk_store)
+    base = 'https://host/api/kpi/v1/t/entityType'
+    for i in range(20):
+        _entry(cache, 't', f'{base}/type_{i}/kpiFunction')
+
+    def fail():
+        raise AssertionError('the disk store was listed')
+
+    monkeypatch.setattr(disk_store, 'items', fail)
+    assert cache.invalidate_for_write('t', 'alerts', 'https://host/api/alerts/v1/t') == 0
+    assert cache.invalidate(tenant='t', resource='/t/entityType/type_3') == 1
+    assert cache.get(cache.key('t', f'{base}/type_3/kpiFunction')) is None
+    assert cache.get(cache.key('t', f'{base}/type_4/kpiFunction')) is not None
+
+
+def test_disk_entries_of_a_previous_process_are_indexed(tmp_path):
+    url = 'https://host/api/kpi/v1/t/entityType/pumps/kpiFunction'
+    _entry(ResponseCache(disk_store=DiskCacheStore(str(tmp_path))), 't', url)
+
+    cache = ResponseCache(disk_store=DiskCacheStore(str(tmp_path)))
+    assert cache.get(cache.key('t', url)).content == b'[]'
+    assert cache.invalidate(tenant='t', resource='/t/entityType/pumps') == 1
+    assert ResponseCache(disk_store=DiskCacheStore(str(tmp_path))).get(cache.key('t', url)) is None
+
+
+def test_evicted_memory_entries_leave_the_index():
+    cache = ResponseCache(max_entries=2)
+    for i in range(5):
+        _entry(cache, 't', f'https://host/api/kpi/v1/t/entityType/type_{i}/kpiFunction')
+    assert sum(len(keys) for keys in cache._index.values()) == 2
+    assert cache.invalidate(tenant='t') == 2
+
+
+def test_memory_store_evicts_least_recently_used():
+    evicted = []
+    store = MemoryCacheStore(max_entries=2, on_evict=evicted.append)
+    store.put('a', 1)
+    store.put('b', 2)
+    store.get('a')
+    store.put('c', 3)
+    assert evicted == ['b']
+    assert [key for key, _ in store.items()] == ['a', 'c']
+
+
+def test_endpoints_without_a_ttl_are_not_cached():
+    cache = ResponseCache(ttls={'catalog': 60})
+    assert cache.ttl('kpi', KPI_ENDPOINT) is None
+    assert _entry(cache, 't', 'https://host/api/kpi/v1/t/entityType/pumps/kpiFunction') is None
+
+
+def test_metadata_cache_loads_once_per_ttl():
+    cache = MetadataCache(ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return {'table_name': 'iot_pumps'}
+
+    assert cache.get('fake_tenant', 'pumps', None, load) == {'table_name': 'iot_pumps'}
+    assert cache.get('fake_tenant', 'pumps', None, load) == {'table_name': 'iot_pumps'}
+    # other schemas and tenants have their own entries
+    cache.get('fake_tenant', 'pumps', 'other_schema', load)
+    cache.get('other_tenant', 'pumps', None, load)
+    assert len(loads) == 3
+    assert cache.stats() == {'hits': 1, 'misses': 3, 'invalidated': 0}
+
+    expired = MetadataCache(ttl=0)
+    expired.get('fake_tenant', 'pumps', None, load)
+    expired.get('fake_tenant', 'pumps', None, load)
+    assert len(loads) == 5
+
+
+def test_metadata_cache_does_not_cache_missing_entity_types():
+    cache = MetadataCache()
+    assert cache.get('fake_tenant', 'missing', None, lambda: None) is None
+    assert cache.get('fake_tenant', 'missing', None, lambda: {'table_name': 'iot_missing'}) == \
+        {'table_name': 'iot_missing'}
+
+
+def test_metadata_cache_invalidation():
+    cache = MetadataCache()
+    for tenant, entity_type_name in [('a', 'pumps'), ('a', 'fans'), ('b', 'pumps')]:
+        cache.get(tenant, entity_type_name, None, lambda: {})
+    assert cache.invalidate(tenant='a', entity_type_name='pumps') == 1
+    assert cache.invalidate(entity_type_name='pumps') == 1
+    assert cache.invalidate(tenant='a') == 1
+    assert cache.stats()['invalidated'] == 3
+
+
+def test_metrics_tables_share_cached_metadata(fake_db):
+    cache = MetadataCache()
+    MetricsTable(fake_db, 'pumps', metadata_cache=cache)
+    table = MetricsTable(fake_db, 'pumps', metadata_cache=cache)
+    assert fake_db.metadata_reads == 1
+    assert table.table_name == 'iot_pumps'
+    MetricsTable(fake_db, 'pumps', metadata_cache=False)
+    assert fake_db.metadata_reads == 2
+
+
+def test_client_invalidates_cached_metadata_of_an_entity_type(client_factory):
+    cache = get_default_metadata_cache()
+    cache.get('fake_tenant', 'pumps', None, lambda: {})
+    cache.get('fake_tenant', 'fans', None, lambda: {})
+    try:
+        client_factory().invalidate_entity_type('pumps')
+        keys = [key for key, _ in cache.memory_store.items()]
+        assert ('fake_tenant', 'pumps', None) not in keys
+        assert ('fake_tenant', 'fans', None) in keys
+    finally:
+        cache.invalidate(tenant='fake_tenant')
+
+
+def test_disk_store_defaults_to_a_private_user_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    disk_store = DiskCacheStore()
+    assert disk_store.directory == str(tmp_path / 'cache' / 'mam-sdk')
+    assert os.stat(disk_store.directory).st_mode & 0o777 == 0o700
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='posix permissions')
+def test_disk_store_refuses_a_directory_open_to_other_users(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir(mode=0o755)
+    shared.chmod(0o755)
+    with pytest.raises(PermissionError):
+        DiskCacheStore(str(shared))
+
+
+def test_disk_store_does_not_unpickle_entries(tmp_path):
+    class Planted(object):
+        def __reduce__(self):
+            return (exec, ('raise AssertionError("unpickled")',))
+
+    url = 'https://host/api/kpi/v1/t/entityType/pumps/kpiFunction'
+    disk_store = DiskCacheStore(str(tmp_path))
+    cache = ResponseCache(disk_store=disk_store)
+    _entry(cache, 't', url)
+    with open(disk_store._path(cache.key('t', url)), 'wb') as F:
+        pickle.dump(Planted(), F)
+    (tmp_path / 'planted').write_bytes(pickle.dumps(Planted()))
+
+    assert disk_store.get(cache.key('t', url)) is None
+    assert disk_store.items() == []
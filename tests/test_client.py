@@ -0,0 +1,71 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mam.sdk import apiclient, client as client_module, kpifunction
+from mam.sdk.apiclient import APIClient
+from mam.sdk.client import (MonitorClient, get_client)
+
+
+def test_clients_of_different_tenants_run_in_parallel(fake_api, client_factory):
+    tenants = [f'tenant_{i}' for i in range(4)]
+    for i, tenant_id in enumerate(tenants):
+        fake_api.state(tenant_id).add_entity_type('pumps', functions=i + 1)
+    clients = {tenant_id: client_factory(tenant_id) for tenant_id in tenants}
+
+    def get_functions(tenant_id):
+        return tenant_id, len(clients[tenant_id].get_functions('pumps'))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        counts = dict(executor.map(get_functions, tenants * 5))
+    assert counts == {tenant_id: i + 1 for i, tenant_id in enumerate(tenants)}
+    # the global environment is left alone
+    assert APIClient.environment_info is None
+
+
+def test_client_builds_its_environment_once(fake_api, client_factory):
+    client = client_factory('tenant_a')
+    assert client.tenant_id == 'tenant_a'
+    assert client.environment_info['base_url'] == fake_api.url
+    api_client = client.api_client('kpi', 'GET', '/{orgId}/entityType/{entityTypeName}/kpiFunction')
+    assert api_client.environment_info is client.environment_info
+    assert api_client.transport is client.transport
+
+
+def test_missing_credentials_are_rejected():
+    with pytest.raises(Exception):
+        MonitorClient(None)
+    with pytest.raises(Exception):
+        get_client(None)
+
+
+def test_get_client_returns_the_given_client(fake_api, client_factory):
+    client = client_factory()
+    assert get_client(fake_api.credentials('other_tenant'), client) is client
+
+
+def test_module_calls_share_one_client_per_credentials(fake_api, monkeypatch):
+    monkeypatch.setattr(client_module, '_clients', {})
+    monkeypatch.setattr(apiclient, '_default_transport', None)
+    fake_api.state('fake_tenant').add_entity_type('pumps', functions=2)
+    credentials = fake_api.credentials()
+
+    assert len(kpifunction.get_functions('pumps', credentials=credentials)) == 2
+    shared_client = get_client(credentials)
+    assert get_client(dict(credentials)) is shared_client
+    assert get_client(fake_api.credentials('other_tenant')) is not shared_client
+    assert shared_client.transport is apiclient.get_default_transport()
+
+    # a new shared transport gives new clients
+    apiclient.configure_transport(timeout=5)
+    assert get_client(credentials) is not shared_client
+    assert get_client(credentials).transport is apiclient.get_default_transport()
+    apiclient.get_default_transport().close()
@@ -0,0 +1,70 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import json
+
+import pytest
+
+from mam.sdk import codec
+from mam.sdk.codec import (get_codec, available_codecs, set_default_codec, get_default_codec, dumps, loads)
+
+PAYLOAD = {'name': 'pump_fleet', 'value': 0.3, 'count': 12, 'enabled': True, 'missing': None,
+           'description': 'débit élevé ✓', 'items': [1, 2.5, 'three', {'nested': []}]}
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_codecs_round_trip(name):
+    json_codec = get_codec(name)
+    data = json_codec.dumps(PAYLOAD)
+    assert isinstance(data, bytes)
+    assert json.loads(data.decode('utf-8')) == PAYLOAD
+    assert json_codec.loads(data) == PAYLOAD
+    assert json_codec.loads(data.decode('utf-8')) == PAYLOAD
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_codecs_fall_back_for_objects_their_backend_cannot_encode(name):
+    # orjson only accepts str dict keys; the stdlib converts int keys to str
+    assert json.loads(get_codec(name).dumps({1: 'a'})) == {'1': 'a'}
+
+
+def test_orjson_codec_encodes_numpy_values():
+    pytest.importorskip('orjson')
+    np = pytest.importorskip('numpy')
+    assert json.loads(get_codec('orjson').dumps({'values': np.array([1.5, 2.5]), 'n': np.int64(3)})) == \
+        {'values': [1.5, 2.5], 'n': 3}
+
+
+def test_unknown_codec():
+    with pytest.raises(NotImplementedError):
+        get_codec('yaml')
+
+
+def test_default_codec_is_the_first_installed_backend(monkeypatch):
+    monkeypatch.setattr(codec, '_default_codec', None)
+    expected = [name for name in codec.PREFERRED_BACKENDS if name in available_codecs()][0]
+    assert get_default_codec().name == expected
+
+
+def test_set_default_codec(monkeypatch):
+    monkeypatch.setattr(codec, '_default_codec', None)
+    assert set_default_codec('json') is get_default_codec()
+    assert get_default_codec().name == 'json'
+    assert loads(dumps(PAYLOAD)) == PAYLOAD
+
+
+@pytest.mark.parametrize('name', available_codecs())
+def test_codecs_encode_numpy_values_and_dates_alike(name):
+    import datetime
+    np = pytest.importorskip('numpy')
+    payload = {'values': np.array([1.5, 2.5]), 'n': np.int64(3), 'ok': np.bool_(True),
+               'timestamp': datetime.datetime(2020, 7, 28, 12, 30), 'day': datetime.date(2020, 7, 28),
+               'evt_timestamp': np.datetime64('2020-07-28T12:30')}
+    assert json.loads(get_codec(name).dumps(payload)) == \
+        {'values': [1.5, 2.5], 'n': 3, 'ok': True, 'timestamp': '2020-07-28T12:30:00', 'day': '2020-07-28',
+         'evt_timestamp': '2020-07-28T12:30:00'}
@@ -0,0 +1,115 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import gzip
+import json
+from datetime import datetime
+
+from mam.sdk.apiclient import Transport
+from mam.sdk.compression import (compress_body, body_length, TransferStats)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def _constants(count):
+    return [{'name': f'constant_{i}', 'datatype': 'number', 'value': i, 'description': 'x' * 20}
+            for i in range(count)]
+
+
+def _transport(**settings):
+    return Transport(cache=False, rate_limiter=False, metrics=False, **settings)
+
+
+def test_compress_body_threshold():
+    assert compress_body(None, threshold=10) is None
+    assert compress_body(b'short', threshold=10) is None
+    assert compress_body(b'x' * 100, threshold=None) is None
+    compressed = compress_body('é' * 100, threshold=10)
+    assert gzip.decompress(compressed).decode('utf-8') == 'é' * 100
+    # streamed bodies are left alone
+    assert compress_body(iter([b'x' * 100]), threshold=10) is None
+
+
+def test_body_length():
+    assert body_length('é') == 2
+    assert body_length(b'abc') == 3
+    assert body_length(None) == 0
+
+
+def test_transfer_stats_ratios():
+    stats = TransferStats()
+    assert stats.stats()['request_compression_ratio'] == 1.0
+    stats.record_request(1000, 100)
+    stats.record_response(50, 500)
+    result = stats.stats()
+    assert result['compressed_requests'] == 1
+    assert result['request_compression_ratio'] == 10.0
+    assert result['response_compression_ratio'] == 10.0
+
+
+def test_large_request_bodies_are_sent_compressed(fake_api):
+    transport = _transport(compress_threshold=1024)
+    body = json.dumps(_constants(200))
+    url = f'{fake_api.url}/api/constants/v1/fake_tenant'
+    response = transport.request('POST', url, headers=HEADERS, data=body)
+    stats = transport.transfer_stats()
+    transport.close()
+    # the server decompressed the body and echoed it
+    assert response.json() == json.loads(body)
+    assert stats['compressed_requests'] == 1
+    assert stats['request_bytes_sent'] < stats['request_bytes'] == len(body)
+
+
+def test_small_request_bodies_are_sent_as_they_are(fake_api):
+    transport = _transport(compress_threshold=1024)
+    body = json.dumps(_constants(1))
+    transport.request('POST', f'{fake_api.url}/api/constants/v1/fake_tenant', headers=HEADERS, data=body)
+    stats = transport.transfer_stats()
+    transport.close()
+    assert stats['compressed_requests'] == 0
+    assert stats['request_bytes_sent'] == len(body)
+
+
+def test_compressed_responses_are_decoded(fake_api):
+    fake_api.state('fake_tenant').add_alerts('pumps', 'high_pressure', 500, datetime(2020, 7, 28), datetime(2020, 7, 29))
+    transport = _transport()
+    body = json.dumps({'entityTypesFilter': [{'name': 'pumps', 'dataItem': ['high_pressure']}]})
+    response = transport.request('POST', f'{fake_api.url}/api/asengine/v1/fake_tenant/queryalertdata',
+                                 headers=HEADERS, data=body, read_only=True)
+    stats = transport.transfer_stats()
+    transport.close()
+    assert len(response.json()) == 500
+    assert stats['response_bytes'] == len(response.content)
+    assert stats['response_compression_ratio'] > 2
+
+
+def test_hosts_rejecting_compressed_bodies_get_them_uncompressed(fake_api, monkeypatch):
+    import requests
+
+    transport = _transport(compress_threshold=1024)
+    send = transport.session.request
+    sent_encodings = []
+
+    def reject_gzip(method, url, **kwargs):
+        encoding = (kwargs.get('headers') or {}).get('Content-Encoding')
+        sent_encodings.append(encoding)
+        if encoding == 'gzip':
+            response = requests.Response()
+            response.status_code = 415
+            response._content = b'{}'
+            return response
+        return send(method, url, **kwargs)
+
+    monkeypatch.setattr(transport.session, 'request', reject_gzip)
+    url = f'{fake_api.url}/api/constants/v1/fake_tenant'
+    body = json.dumps(_constants(200))
+    assert transport.request('POST', url, headers=HEADERS, data=body).status_code == 200
+    # later requests to the host are not compressed
+    assert transport.request('POST', url, headers=HEADERS, data=body).status_code == 200
+    transport.close()
+    assert sent_encodings == ['gzip', None, None]
@@ -0,0 +1,137 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from conftest import FakeDatabase
+from mam.sdk import entitytype
+from mam.sdk.cache import (MetadataCache)
+from mam.sdk.dbpool import (DatabasePool, database_session, invalidate_database_pools)
+
+CREDENTIALS = {'tenantId': 'fake_tenant', 'db2': {'username': 'user', 'password': 'secret'}}
+
+
+class Database(FakeDatabase):
+    """iotfunctions.db.Database as seen by the pool: one instance per connection"""
+    created = []
+
+    def __init__(self, credentials=None, entity_type=None):
+        super().__init__()
+        self.credentials = credentials
+        self.entity_type = entity_type
+        Database.created.append(self)
+
+
+@pytest.fixture(autouse=True)
+def iotfunctions_db(monkeypatch):
+    # the pool imports iotfunctions.db when it opens a connection
+    Database.created = []
+    db_module = types.ModuleType('iotfunctions.db')
+    db_module.Database = Database
+    package = types.ModuleType('iotfunctions')
+    package.db = db_module
+    monkeypatch.setitem(sys.modules, 'iotfunctions', package)
+    monkeypatch.setitem(sys.modules, 'iotfunctions.db', db_module)
+
+
+def test_idle_connections_are_reused():
+    with DatabasePool() as pool:
+        db = pool.acquire(CREDENTIALS, entity_type='pumps')
+        assert db.entity_type == 'pumps'
+        pool.release(db)
+        assert pool.acquire(CREDENTIALS, entity_type='pumps') is db
+        # other entity types and credentials get their own connections
+        assert pool.acquire(CREDENTIALS, entity_type='fans') is not db
+        assert pool.acquire(dict(CREDENTIALS, tenantId='other'), entity_type='pumps') is not db
+        assert pool.stats() == {'created': 3, 'reused': 1, 'returned': 1, 'released': 0, 'invalidated': 0,
+                                'in_use': 3, 'idle': 0}
+
+
+def test_connections_beyond_max_idle_are_closed():
+    pool = DatabasePool(max_idle=1)
+    first, second = pool.acquire(CREDENTIALS), pool.acquire(CREDENTIALS)
+    pool.release(first)
+    pool.release(second)
+    assert not first.released and second.released
+    assert pool.stats()['idle'] == 1
+
+
+def test_invalidation_closes_idle_connections_now_and_busy_ones_on_release():
+    pool = DatabasePool()
+    idle, busy = pool.acquire(CREDENTIALS, entity_type='pumps'), pool.acquire(CREDENTIALS, entity_type='pumps')
+    other = pool.acquire(CREDENTIALS, entity_type='fans')
+    pool.release(idle)
+    pool.release(other)
+    invalidate_database_pools(tenant='fake_tenant', entity_type='pumps')
+    assert idle.released and not busy.released and not other.released
+    pool.release(busy)
+    assert busy.released
+    assert pool.acquire(CREDENTIALS, entity_type='pumps') not in (idle, busy)
+    assert pool.acquire(CREDENTIALS, entity_type='fans') is other
+
+
+def test_closed_pool():
+    pool = DatabasePool()
+    idle, busy = pool.acquire(CREDENTIALS), pool.acquire(CREDENTIALS)
+    pool.release(idle)
+    pool.close()
+    assert idle.released and not busy.released
+    pool.release(busy)
+    assert busy.released
+    with pytest.raises(RuntimeError, match='closed'):
+        pool.acquire(CREDENTIALS)
+
+
+def test_database_session():
+    with database_session(CREDENTIALS, entity_type='pumps') as db:
+        assert not db.released
+    assert db.released
+
+    pool = DatabasePool()
+    with database_session(CREDENTIALS, entity_type='pumps', database_pool=pool) as pooled:
+        pass
+    assert not pooled.released
+    assert pool.stats()['idle'] == 1
+
+
+def test_parallel_load_takes_writer_connections_from_the_pool(tmp_path):
+    path = tmp_path / 'pumps.csv'
+    pd.DataFrame({'deviceid': [f'pump-{i % 10}' for i in range(1000)],
+                  'evt_timestamp': pd.date_range('2020-07-28', periods=1000, freq='min'),
+                  'pressure': range(1000)}).to_csv(path, index=False)
+    with DatabasePool() as pool:
+        for _ in range(2):
+            stats = entitytype.load_metrics_data_from_csv('pumps', str(path), CREDENTIALS, database_pool=pool,
+                                                          writers=3, chunk_size=100, metadata_cache=MetadataCache())
+            assert stats['rows_written'] == 1000
+        # the second load reuses the connections of the first one
+        assert len(Database.created) == pool.stats()['created'] <= 4
+        assert pool.stats()['in_use'] == 0
+    assert sum(len(db.frames) for db in Database.created) == 20
+
+
+@pytest.mark.parametrize('kind', ['parquet', 'arrow'])
+def test_client_loads_parquet_and_arrow_with_its_credentials(tmp_path, client_factory, kind):
+    client = client_factory()
+    path = tmp_path / f'pumps.{kind}'
+    frame = pd.DataFrame({'deviceid': ['pump-1', 'pump-2'],
+                          'evt_timestamp': pd.date_range('2020-07-28', periods=2, freq='min'),
+                          'pressure': [1.0, 2.0]})
+    if kind == 'parquet':
+        frame.to_parquet(path)
+    else:
+        frame.to_feather(path)
+    with DatabasePool() as pool:
+        load = getattr(client, f'load_metrics_data_from_{kind}')
+        stats = load('pumps', str(path), database_pool=pool, metadata_cache=MetadataCache())
+    assert stats['rows_written'] == 2
+    assert [db.credentials for db in Database.created] == [client.credentials]
@@ -0,0 +1,36 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import statistics
+import time
+
+import requests
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def test_keep_alive_responses_are_not_delayed(fake_api):
+    # with Nagle on, the body written after the headers waits for the client's delayed ack (~40ms)
+    fake_api.state('fake_tenant').add_entity_type('pumps')
+    url = f'{fake_api.url}/api/kpi/v1/fake_tenant/entityType/pumps/kpiFunction'
+    latencies = []
+    with requests.Session() as session:
+        for _ in range(20):
+            started = time.perf_counter()
+            response = session.get(url, headers=HEADERS)
+            latencies.append(time.perf_counter() - started)
+            assert response.status_code == 200
+    assert statistics.median(latencies) < 0.02
+
+
+def test_error_injection(fake_api):
+    fake_api.error_rate = 1.0
+    response = requests.get(f'{fake_api.url}/api/kpi/v1/fake_tenant/entityType/pumps/kpiFunction', headers=HEADERS)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '0'
+    assert fake_api.request_count == 1
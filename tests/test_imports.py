@@ -0,0 +1,61 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import json
+import os
+import subprocess
+import sys
+
+import jsonschema
+import pytest
+
+from mam.sdk import utils
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+HEAVY_PACKAGES = ['pandas', 'numpy', 'sqlalchemy', 'iotfunctions', 'jsonschema', 'aiohttp', 'pyarrow']
+
+MODULES = ['mam.sdk', 'mam.sdk.apiclient', 'mam.sdk.client', 'mam.sdk.parseinput', 'mam.sdk.constants',
+           'mam.sdk.dimension', 'mam.sdk.kpifunction', 'mam.sdk.alerts', 'mam.sdk.alertwatch',
+           'mam.sdk.entitytype', 'mam.sdk.utils', 'mam.sdk.ingest', 'mam.sdk.dbpool']
+
+CHECK = '''
+import importlib, json, logging, sys
+importlib.import_module(sys.argv[1])
+print(json.dumps({"modules": sorted(sys.modules),
+                  "root_handlers": len(logging.getLogger().handlers),
+                  "root_level": logging.getLogger().level,
+                  "sdk_handlers": [type(h).__name__ for h in logging.getLogger("mam.sdk").handlers]}))
+'''
+
+
+def import_in_fresh_interpreter(module):
+    result = subprocess.run([sys.executable, '-c', CHECK, module], stdout=subprocess.PIPE, check=True,
+                            env=dict(os.environ, PYTHONPATH=SRC), universal_newlines=True)
+    return json.loads(result.stdout)
+
+
+@pytest.mark.parametrize('module', MODULES)
+def test_import_does_not_load_heavy_packages(module):
+    loaded = {name.split('.')[0] for name in import_in_fresh_interpreter(module)['modules']}
+    assert sorted(loaded & set(HEAVY_PACKAGES)) == []
+
+
+@pytest.mark.parametrize('module', ['mam.sdk', 'mam.sdk.alerts', 'mam.sdk.entitytype'])
+def test_import_leaves_logging_configuration_to_applications(module):
+    result = import_in_fresh_interpreter(module)
+    assert result['root_handlers'] == 0
+    assert result['root_level'] == 30  # WARNING, the python default
+    assert result['sdk_handlers'] == ['NullHandler']
+
+
+def test_validate_imports_jsonschema_on_first_use():
+    schema = {'type': 'object', 'required': ['name']}
+    utils.validate({'name': 'pump'}, schema)
+    with pytest.raises(jsonschema.ValidationError):
+        utils.validate({}, schema)
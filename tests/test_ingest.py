@@ -0,0 +1,288 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mam.sdk import ingest
+from mam.sdk.ingest import (MetricsTable, SAMPLE_ROWS, estimate_chunk_size, iter_csv_chunks, iter_parquet_chunks,
+                            iter_arrow_chunks, load_chunks, load_chunks_parallel)
+
+ROWS = 1000
+
+
+@pytest.fixture
+def metrics_table(fake_db):
+    return MetricsTable(fake_db, 'pumps', metadata_cache=False)
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({'deviceid': [f'pump-{i % 10}' for i in range(ROWS)],
+                         'evt_timestamp': pd.date_range('2020-07-28', periods=ROWS, freq='min'),
+                         'pressure': [i * 0.5 for i in range(ROWS)],
+                         'state': ['on', 'off'] * (ROWS // 2),
+                         'unused': range(ROWS)})
+
+
+@pytest.fixture
+def csv_path(tmp_path, frame):
+    path = tmp_path / 'pumps.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_estimate_chunk_size():
+    sample = pd.DataFrame({'value': range(100)}, dtype='int64')
+    row_bytes = sample.memory_usage(index=True, deep=True).sum() / 100
+    assert estimate_chunk_size(sample, max_memory=10000) == int(10000 / (2 * row_bytes))
+    assert estimate_chunk_size(sample, max_memory=1) == 1
+    assert estimate_chunk_size(sample.iloc[:0]) == SAMPLE_ROWS
+
+
+def test_iter_csv_chunks_by_rows(csv_path):
+    chunks = list(iter_csv_chunks(csv_path, chunk_size=300))
+    assert [len(chunk) for chunk in chunks] == [300, 300, 300, 100]
+    assert list(chunks[0].columns) == ['deviceid', 'evt_timestamp', 'pressure', 'state', 'unused']
+
+
+def test_iter_csv_chunks_by_memory(csv_path):
+    chunks = list(iter_csv_chunks(csv_path, max_memory=20000))
+    assert len(chunks) > 1
+    assert sum(len(chunk) for chunk in chunks) == ROWS
+    # without a memory ceiling the whole file is one chunk
+    assert len(list(iter_csv_chunks(csv_path, max_memory=None))) == 1
+
+
+def test_iter_csv_chunks_reads_table_columns_with_database_types(csv_path, metrics_table):
+    chunk = next(iter_csv_chunks(csv_path, table=metrics_table, chunk_size=100))
+    assert list(chunk.columns) == ['deviceid', 'evt_timestamp', 'pressure', 'state']
+    assert isinstance(chunk['deviceid'].dtype, pd.CategoricalDtype)
+    assert chunk['pressure'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(chunk['evt_timestamp'])
+
+
+def test_iter_csv_chunks_rejects_unknown_engine(csv_path):
+    with pytest.raises(NotImplementedError, match='Unknown csv engine'):
+        next(iter_csv_chunks(csv_path, engine='polars'))
+
+
+def test_load_chunks(csv_path, metrics_table, fake_db):
+    stats = load_chunks(fake_db, metrics_table, iter_csv_chunks(csv_path, table=metrics_table, chunk_size=400))
+    assert stats['rows_read'] == stats['rows_written'] == ROWS
+    assert stats['chunks'] == 3
+    df = pd.concat(fake_db.frames, ignore_index=True)
+    assert list(df.columns) == fake_db.COLUMNS
+    # missing required columns are filled
+    assert (df['devicetype'] == 'pumps').all()
+    assert df['updated_utc'].notna().all()
+    assert df['rcv_timestamp_utc'].equals(df['evt_timestamp'])
+    assert df['pressure'].tolist() == [i * 0.5 for i in range(ROWS)]
+
+
+def test_table_without_deviceid_column_is_refused(tmp_path, metrics_table, fake_db):
+    path = tmp_path / 'no_deviceid.csv'
+    pd.DataFrame({'evt_timestamp': ['2020-07-28'], 'pressure': [1.0]}).to_csv(path, index=False)
+    with pytest.raises(RuntimeError, match='Missing required column deviceid'):
+        load_chunks(fake_db, metrics_table, iter_csv_chunks(str(path), table=metrics_table))
+
+
+class SlowLogger(object):
+    """widens the window in which plan() is half done"""
+
+    def __getattr__(self, name):
+        def log(*args, **kwargs):
+            time.sleep(0.02)
+        return log
+
+
+def test_parallel_cleaners_wait_for_the_complete_plan(csv_path, metrics_table, fake_db, monkeypatch):
+    monkeypatch.setattr(ingest, 'logger', SlowLogger())
+
+    def chunks():
+        # the next chunks reach the other cleaners while the first one is planning
+        for chunk in iter_csv_chunks(csv_path, table=metrics_table, chunk_size=100):
+            yield chunk
+            time.sleep(0.01)
+
+    stats = load_chunks_parallel(lambda: fake_db, metrics_table, chunks(), cleaners=4, writers=2,
+                                 release=lambda db: None)
+    assert stats['rows_written'] == ROWS
+    assert stats['chunks'] == 10
+    df = pd.concat(fake_db.frames, ignore_index=True)
+    assert (df['devicetype'] == 'pumps').all()
+    assert df['updated_utc'].notna().all()
+
+
+def test_failed_plan_is_not_kept(metrics_table):
+    with pytest.raises(RuntimeError):
+        metrics_table.prepare(pd.DataFrame({'evt_timestamp': pd.to_datetime(['2020-07-28'])}))
+    assert metrics_table.fill_values is None
+
+
+def test_iter_parquet_chunks(tmp_path, frame, metrics_table):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'pumps.parquet')
+    frame.to_parquet(path, row_group_size=300)
+    chunks = list(iter_parquet_chunks(path, table=metrics_table, chunk_size=250))
+    assert [len(chunk) for chunk in chunks] == [250, 250, 250, 250]
+    # only the columns of the metric table are read; deviceid is categorical
+    assert list(chunks[0].columns) == ['deviceid', 'evt_timestamp', 'pressure', 'state']
+    assert isinstance(chunks[0]['deviceid'].dtype, pd.CategoricalDtype)
+    assert pd.concat(chunks, ignore_index=True)['pressure'].tolist() == frame['pressure'].tolist()
+    assert len(list(iter_parquet_chunks(path, max_memory=None))) == 1
+
+
+def test_iter_arrow_chunks(tmp_path, frame, metrics_table):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.feather as feather
+
+    path = str(tmp_path / 'pumps.arrow')
+    feather.write_feather(pa.Table.from_pandas(frame, preserve_index=False), path, chunksize=400)
+    chunks = list(iter_arrow_chunks(path, table=metrics_table, chunk_size=300))
+    # record batches of 400 rows are sliced in chunks of at most 300 rows
+    assert [len(chunk) for chunk in chunks] == [300, 100, 300, 100, 200]
+    assert list(chunks[0].columns) == ['deviceid', 'evt_timestamp', 'pressure', 'state']
+    assert pd.concat(chunks, ignore_index=True)['deviceid'].astype(str).tolist() == frame['deviceid'].tolist()
+    # without a chunk size or a memory ceiling each record batch is a chunk
+    assert [len(chunk) for chunk in iter_arrow_chunks(path, max_memory=None)] == [400, 400, 200]
+
+
+def test_load_parquet_chunks_keeps_columns_of_the_database_type(tmp_path, frame, metrics_table, fake_db):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'pumps.parquet')
+    frame.to_parquet(path)
+    stats = load_chunks(fake_db, metrics_table, iter_parquet_chunks(path, table=metrics_table))
+    assert stats['rows_written'] == ROWS
+    df = fake_db.frames[0]
+    assert df['pressure'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(df['evt_timestamp'])
+
+
+def test_pyarrow_engine_matches_pandas_engine(csv_path, metrics_table):
+    pytest.importorskip('pyarrow')
+    pandas_df = pd.concat(iter_csv_chunks(csv_path, table=metrics_table, chunk_size=300), ignore_index=True)
+    chunks = list(iter_csv_chunks(csv_path, table=metrics_table, chunk_size=300, engine='pyarrow'))
+    assert len(chunks) > 1
+    pyarrow_df = pd.concat(chunks, ignore_index=True)
+    assert list(pyarrow_df.columns) == list(pandas_df.columns)
+    assert pyarrow_df['pressure'].tolist() == pandas_df['pressure'].tolist()
+    assert pyarrow_df['deviceid'].astype(str).tolist() == pandas_df['deviceid'].astype(str).tolist()
+    # timestamps are parsed while reading
+    assert pd.api.types.is_datetime64_any_dtype(pyarrow_df['evt_timestamp'])
+    assert (pyarrow_df['evt_timestamp'] == pandas_df['evt_timestamp']).all()
+
+
+def test_pyarrow_engine_parses_timestamp_formats(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'timestamps.csv'
+    path.write_text('deviceid,evt_timestamp\npump-1,28/07/2020 10:15\npump-2,28/07/2020 10:16\n')
+    df = next(iter_csv_chunks(str(path), engine='pyarrow', timestamp_formats=['%d/%m/%Y %H:%M']))
+    assert df['evt_timestamp'].tolist() == [pd.Timestamp('2020-07-28 10:15'), pd.Timestamp('2020-07-28 10:16')]
+
+
+def test_pyarrow_engine_keeps_column_types_across_chunks(tmp_path):
+    pytest.importorskip('pyarrow')
+    path = tmp_path / 'values.csv'
+    # the first chunk only has integers
+    path.write_text('value\n' + '1\n' * 10 + '1.5\n' * 10)
+    chunks = list(iter_csv_chunks(str(path), chunk_size=5, engine='pyarrow'))
+    assert len(chunks) > 2
+    assert {str(chunk['value'].dtype) for chunk in chunks[1:]} == {'float64'}
+    assert pd.concat(chunks, ignore_index=True)['value'].tolist() == [1] * 10 + [1.5] * 10
+
+
+def test_prepare_counts_rejected_rows_by_reason(metrics_table):
+    chunk = pd.DataFrame({'deviceid': ['pump-1', None, 'pump 2', 'p' * 37, 'pump-5', 'pump-6'],
+                          'evt_timestamp': pd.to_datetime(['2020-07-28', '2020-07-28', '2020-07-28', '2020-07-28',
+                                                           None, '2020-07-28']),
+                          'pressure': ['1.5', '2', '3', '4', '5', '6.5']})
+    df, rejected = metrics_table.prepare(chunk)
+    assert rejected == {'missing_deviceid': 1, 'invalid_deviceid': 1, 'deviceid_too_long': 1,
+                        'missing_timestamp': 1}
+    assert df['deviceid'].tolist() == ['pump-1', 'pump-6']
+    assert df.index.tolist() == [0, 1]
+    # coerced to the database type while the rows are taken
+    assert df['pressure'].tolist() == [1.5, 6.5]
+    # the columns are moved out of the chunk
+    assert list(chunk.columns) == []
+
+
+def test_prepare_keeps_every_row_when_none_is_rejected(metrics_table):
+    chunk = pd.DataFrame({'deviceid': ['pump-1', 'pump-2'], 'evt_timestamp': pd.to_datetime(['2020-07-28'] * 2),
+                          'pressure': [1.0, 2.0]})
+    pressure = chunk['pressure'].to_numpy()
+    df, rejected = metrics_table.prepare(chunk)
+    assert sum(rejected.values()) == 0
+    assert len(df) == 2
+    # columns already of the database type are not copied
+    assert np.shares_memory(df['pressure'].to_numpy(), pressure)
+
+
+def test_load_stats_report_rejected_rows(tmp_path, metrics_table, fake_db):
+    path = tmp_path / 'rejected.csv'
+    path.write_text('deviceid,evt_timestamp,pressure\npump-1,2020-07-28,1\n,2020-07-28,2\nbad id,2020-07-28,3\n')
+    stats = load_chunks(fake_db, metrics_table, iter_csv_chunks(str(path), table=metrics_table))
+    assert stats['rows_read'] == 3
+    assert stats['rows_written'] == 1
+    assert stats['rows_rejected'] == 2
+    assert stats['rejected'] == {'missing_deviceid': 1, 'invalid_deviceid': 1, 'deviceid_too_long': 0,
+                                 'missing_timestamp': 0}
+
+
+@pytest.mark.parametrize('file_format', ['csv', 'parquet'])
+def test_float32_metrics_are_written_as_float32(tmp_path, frame, fake_db, file_format):
+    path = str(tmp_path / f'pumps.{file_format}')
+    frame = frame.astype({'pressure': 'float32'})
+    if file_format == 'csv':
+        frame.to_csv(path, index=False)
+        read_chunks = iter_csv_chunks
+    else:
+        pytest.importorskip('pyarrow')
+        frame.to_parquet(path)
+        read_chunks = iter_parquet_chunks
+    table = MetricsTable(fake_db, 'pumps', float32=True, metadata_cache=False)
+    load_chunks(fake_db, table, read_chunks(path, table=table, chunk_size=400))
+    assert {str(df['pressure'].dtype) for df in fake_db.frames} == {'float32'}
+
+
+def _assert_naive_utc_timestamps(fake_db):
+    df = pd.concat(fake_db.frames, ignore_index=True)
+    for column in ['evt_timestamp', 'rcv_timestamp_utc']:
+        assert df[column].dtype == 'datetime64[ns]'
+    # 12:00 in UTC+02:00 is stored as 10:00 utc
+    assert df['evt_timestamp'].tolist() == [pd.Timestamp('2020-07-28 10:00'), pd.Timestamp('2020-07-28 10:01')]
+
+
+def test_load_parquet_chunks_with_timezone_aware_timestamps(tmp_path, fake_db):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / 'pumps.parquet')
+    pd.DataFrame({'deviceid': ['pump-1', 'pump-2'],
+                  'evt_timestamp': pd.date_range('2020-07-28 12:00', periods=2, freq='min', tz='Europe/Paris'),
+                  'pressure': [1.0, 2.0]}).to_parquet(path)
+    table = MetricsTable(fake_db, 'pumps', metadata_cache=False)
+    stats = load_chunks(fake_db, table, iter_parquet_chunks(path, table=table))
+    assert stats['rows_written'] == 2
+    _assert_naive_utc_timestamps(fake_db)
+
+
+@pytest.mark.parametrize('engine', ['pandas', 'pyarrow'])
+def test_load_csv_chunks_with_utc_timestamps(tmp_path, fake_db, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    path = tmp_path / 'pumps.csv'
+    path.write_text('deviceid,evt_timestamp,pressure\n'
+                    'pump-1,2020-07-28T10:00:00Z,1.0\n'
+                    'pump-2,2020-07-28T12:01:00+02:00,2.0\n')
+    table = MetricsTable(fake_db, 'pumps', metadata_cache=False)
+    stats = load_chunks(fake_db, table, iter_csv_chunks(str(path), table=table, engine=engine))
+    assert stats['rows_written'] == 2
+    _assert_naive_utc_timestamps(fake_db)
@@ -0,0 +1,83 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import pytest
+
+from mam.sdk.metrics import (MetricsRegistry, EndpointMetrics)
+
+KPI_ENDPOINT = '/{orgId}/entityType/{entityTypeName}/kpiFunction'
+
+
+def test_record_and_snapshot():
+    registry = MetricsRegistry()
+    registry.record('kpi', 'get', KPI_ENDPOINT, 0.02, bytes_out=0, bytes_in=100, status_code=200)
+    registry.record('kpi', 'GET', KPI_ENDPOINT, 0.04, bytes_out=0, bytes_in=300, status_code=404)
+    registry.record('kpi', 'GET', KPI_ENDPOINT, 0.03, error=True)
+    snapshot = registry.snapshot()
+    assert list(snapshot) == [('kpi', 'GET', KPI_ENDPOINT)]
+    metrics = snapshot[('kpi', 'GET', KPI_ENDPOINT)]
+    assert metrics['count'] == 3
+    assert metrics['errors'] == 2
+    assert metrics['bytes_in'] == 400
+    assert metrics['latency_avg'] == pytest.approx(0.03)
+    registry.reset()
+    assert registry.snapshot() == {}
+
+
+def test_quantiles_interpolate_inside_buckets():
+    endpoint_metrics = EndpointMetrics(buckets=(0.1, 0.2))
+    assert endpoint_metrics.quantile(0.5) is None
+    for latency in [0.15] * 10:
+        endpoint_metrics.record(latency, 0, 0, False)
+    assert endpoint_metrics.quantile(0.5) == pytest.approx(0.15)
+    assert endpoint_metrics.quantile(1.0) == pytest.approx(0.2)
+    # the last bucket is unbounded
+    endpoint_metrics.record(5.0, 0, 0, False)
+    assert endpoint_metrics.quantile(1.0) == 0.2
+
+
+def test_bucket_bounds_are_inclusive():
+    endpoint_metrics = EndpointMetrics(buckets=(0.1, 0.2))
+    endpoint_metrics.record(0.1, 0, 0, False)
+    assert endpoint_metrics.bucket_counts == [1, 0, 0]
+
+
+def test_prometheus_export():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.record('kpi', 'GET', KPI_ENDPOINT, 0.05, bytes_in=10, status_code=200)
+    registry.record('kpi', 'GET', KPI_ENDPOINT, 0.5, bytes_in=20, status_code=503)
+    lines = registry.to_prometheus().splitlines()
+    labels = 'api_suffix="kpi",method="GET",endpoint="/{orgId}/entityType/{entityTypeName}/kpiFunction"'
+    assert '# TYPE mam_sdk_api_requests_total counter' in lines
+    assert f'mam_sdk_api_requests_total{{{labels}}} 2' in lines
+    assert f'mam_sdk_api_errors_total{{{labels}}} 1' in lines
+    assert f'mam_sdk_api_response_bytes_total{{{labels}}} 30' in lines
+    assert f'mam_sdk_api_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'mam_sdk_api_request_duration_seconds_bucket{{{labels},le="1.0"}} 2' in lines
+    assert f'mam_sdk_api_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'mam_sdk_api_request_duration_seconds_count{{{labels}}} 2' in lines
+
+
+def test_prometheus_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.record('kpi', 'GET', '/a"b\\c', 0.01)
+    assert 'endpoint="/a\\"b\\\\c"' in registry.to_prometheus()
+
+
+def test_transport_records_calls_by_endpoint_template(fake_api, client_factory):
+    fake_api.state('fake_tenant').add_entity_type('pumps')
+    fake_api.state('fake_tenant').add_entity_type('fans')
+    registry = MetricsRegistry()
+    client = client_factory(metrics=registry, cache=False)
+    client.get_functions('pumps')
+    client.get_functions('fans')
+    client.get_functions('missing')
+    metrics = registry.snapshot()[('kpi', 'GET', KPI_ENDPOINT)]
+    assert metrics['count'] == 3
+    assert metrics['errors'] == 1
+    assert metrics['bytes_in'] > 0
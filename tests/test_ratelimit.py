@@ -0,0 +1,84 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import time
+
+import pytest
+
+from mam.sdk import ratelimit
+from mam.sdk.apiclient import Transport
+from mam.sdk.ratelimit import (TokenBucket, RateLimiter, configure_rate_limits, get_default_rate_limiter)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def test_token_bucket_allows_a_burst_then_paces_callers():
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # reservations are handed out in order, one every 1 / rate seconds
+    waits = [bucket.reserve() for _ in range(3)]
+    assert waits == pytest.approx([0.1, 0.2, 0.3], abs=0.01)
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=100, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    time.sleep(0.1)
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() > 0
+
+
+def test_token_bucket_rejects_a_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+
+
+def test_rate_limiter_keys_buckets_by_tenant_and_api_suffix():
+    limiter = RateLimiter(rates={'kpi': (10, 1), ('tenant_b', 'kpi'): (100, 5)})
+    assert limiter.reserve('tenant_a', 'kpi') == 0.0
+    assert limiter.reserve('tenant_a', 'kpi') > 0
+    # other tenants have their own bucket
+    assert limiter.reserve('tenant_c', 'kpi') == 0.0
+    # per tenant limit
+    assert [limiter.reserve('tenant_b', 'kpi') for _ in range(5)] == [0.0] * 5
+    # api suffixes without a limit are not limited
+    assert [limiter.reserve('tenant_a', 'meta') for _ in range(100)] == [0.0] * 100
+
+
+def test_rate_limiter_default_rate_and_set_rate():
+    limiter = RateLimiter(default_rate=10, default_burst=1)
+    limiter.reserve('tenant_a', 'meta')
+    assert limiter.reserve('tenant_a', 'meta') > 0
+    limiter.set_rate('meta', None)
+    assert [limiter.reserve('tenant_a', 'meta') for _ in range(10)] == [0.0] * 10
+    limiter.set_rate('meta', 10, 1, tenant='tenant_a')
+    limiter.reserve('tenant_a', 'meta')
+    assert limiter.reserve('tenant_a', 'meta') > 0
+
+
+def test_configure_rate_limits_replaces_the_shared_limits(monkeypatch):
+    monkeypatch.setattr(ratelimit, '_default_rate_limiter', RateLimiter())
+    limiter = configure_rate_limits({'alerts': (5, 1)})
+    assert limiter is get_default_rate_limiter()
+    limiter.reserve('t', 'alerts')
+    assert limiter.reserve('t', 'alerts') > 0
+    configure_rate_limits()
+    assert limiter.reserve('t', 'alerts') == 0.0
+
+
+def test_transport_waits_for_the_rate_limit(fake_api):
+    transport = Transport(rate_limiter=RateLimiter(rates={'catalog': (20, 1)}), cache=False, metrics=False)
+    url = f'{fake_api.url}/api/catalog/v1/fake_tenant/function'
+    started = time.perf_counter()
+    for _ in range(5):
+        transport.request('GET', url, headers=HEADERS, tenant='fake_tenant', api_suffix='catalog')
+    elapsed = time.perf_counter() - started
+    transport.close()
+    # the first call is free, the next four wait 50ms each
+    assert elapsed >= 0.19
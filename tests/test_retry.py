@@ -0,0 +1,193 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+import requests
+
+from mam.sdk.apiclient import Transport
+from mam.sdk.retry import (RetryPolicy, CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError, parse_retry_after)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def catalog_url(server):
+    return f'{server.url}/api/catalog/v1/fake_tenant/function'
+
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after('soon') is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 < parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(max_retries=3, backoff_factor=0.5, max_backoff=1.5, jitter=False)
+    assert [policy.retry_delay(attempt) for attempt in range(4)] == [0.5, 1.0, 1.5, None]
+    assert policy.retry_delay(0, 503) == 0.5
+    assert policy.retry_delay(0, 404) is None
+    assert policy.retry_delay(0, 429, {'Retry-After': '1'}) == 1.0
+    # a Retry-After longer than max_backoff is not waited for
+    assert policy.retry_delay(0, 429, {'Retry-After': '60'}) is None
+    assert 0 <= RetryPolicy(backoff_factor=0.5).backoff(2) <= 2.0
+
+
+def test_retry_policy_methods():
+    policy = RetryPolicy()
+    assert policy.is_retryable('get') and policy.is_retryable('DELETE')
+    assert not policy.is_retryable('POST')
+    assert policy.is_retryable('POST', idempotent=True)
+    assert not policy.is_retryable('GET', idempotent=False)
+
+
+def test_circuit_breaker_opens_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # one trial at a time
+    assert not breaker.allow()
+    breaker.record(200)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_circuit_breaker_failed_trial_opens_again():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record(503)
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(500)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    # client errors mean the api is up
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record(429)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_breaker_release_gives_the_trial_back():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_circuit_breaker_registry():
+    registry = CircuitBreakerRegistry(failure_threshold=1)
+    assert registry.get('a') is registry.get('a')
+    registry.get('a').record_failure()
+    assert registry.states() == {'a': CircuitBreaker.OPEN}
+
+
+def test_transport_retries_transient_errors(fake_api):
+    fake_api.error_rate = 0.5
+    transport = Transport(retry_policy=RetryPolicy(max_retries=10, backoff_factor=0.001), cache=False,
+                          rate_limiter=False, metrics=False)
+    statuses = [transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code for _ in range(10)]
+    transport.close()
+    assert statuses == [200] * 10
+    assert fake_api.request_count > 10
+
+
+def test_transport_does_not_retry_post_unless_idempotent(fake_api):
+    fake_api.error_rate = 1.0
+    transport = Transport(retry_policy=RetryPolicy(max_retries=2, backoff_factor=0.001), circuit_breakers=False,
+                          cache=False, rate_limiter=False, metrics=False)
+    url = f'{fake_api.url}/api/asengine/v1/fake_tenant/queryalertdata'
+    assert transport.request('POST', url, headers=HEADERS, data='{}').status_code == 503
+    assert fake_api.request_count == 1
+    assert transport.request('POST', url, headers=HEADERS, data='{}', idempotent=True).status_code == 503
+    assert fake_api.request_count == 4
+    transport.close()
+
+
+def test_transport_fails_fast_once_the_circuit_is_open(fake_api):
+    fake_api.error_rate = 1.0
+    transport = Transport(retry_policy=False, circuit_breakers=CircuitBreakerRegistry(failure_threshold=3),
+                          cache=False, rate_limiter=False, metrics=False)
+    for _ in range(3):
+        assert transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+    assert fake_api.request_count == 3
+    transport.close()
+
+
+def _half_open_transport(fake_api, transport_class=Transport):
+    """
+    transport whose breaker for the catalog endpoint is half open
+    """
+    breakers = CircuitBreakerRegistry(failure_threshold=1, recovery_timeout=0.05)
+    transport = transport_class(retry_policy=False, circuit_breakers=breakers, cache=False, rate_limiter=False,
+                                metrics=False)
+    fake_api.error_rate = 1.0
+    return transport, breakers
+
+
+def test_trial_call_failing_without_an_outcome_releases_the_breaker(fake_api, monkeypatch):
+    transport, breakers = _half_open_transport(fake_api)
+    assert transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code == 503
+    fake_api.error_rate = 0.0
+    time.sleep(0.06)
+
+    # the trial call fails before the server answers, with an error that is neither a connection error nor a timeout
+    send = transport.session.request
+
+    def invalid_header(*args, **kwargs):
+        raise requests.exceptions.InvalidHeader('Invalid header value')
+
+    monkeypatch.setattr(transport.session, 'request', invalid_header)
+    with pytest.raises(requests.exceptions.InvalidHeader):
+        transport.request('GET', catalog_url(fake_api), headers=HEADERS)
+
+    # the next call is let through as the trial and closes the breaker
+    monkeypatch.setattr(transport.session, 'request', send)
+    assert transport.request('GET', catalog_url(fake_api), headers=HEADERS).status_code == 200
+    assert set(breakers.states().values()) == {CircuitBreaker.CLOSED}
+    transport.close()
+
+
+def test_cancelled_async_trial_call_releases_the_breaker(fake_api):
+    pytest.importorskip('aiohttp')
+    from mam.sdk.apiclient import AsyncTransport
+
+    transport, breakers = _half_open_transport(fake_api, AsyncTransport)
+
+    async def scenario():
+        try:
+            assert (await transport.request('GET', catalog_url(fake_api), headers=HEADERS)).status_code == 503
+            fake_api.error_rate = 0.0
+            fake_api.latency = 0.5
+            await asyncio.sleep(0.06)
+            trial = asyncio.ensure_future(transport.request('GET', catalog_url(fake_api), headers=HEADERS))
+            await asyncio.sleep(0.1)
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            fake_api.latency = 0.0
+            return (await transport.request('GET', catalog_url(fake_api), headers=HEADERS)).status_code
+        finally:
+            await transport.close()
+
+    assert asyncio.run(scenario()) == 200
+    assert set(breakers.states().values()) == {CircuitBreaker.CLOSED}
@@ -0,0 +1,97 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from mam.sdk.apiclient import Transport
+from mam.sdk.singleflight import SingleFlight
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+
+def _run_while_in_flight(single_flight, function, followers=4, key='key'):
+    """
+    call single_flight.do(key, function) from a leader thread and from followers threads started while the
+    leader's call is in flight
+    :return: list of results or exceptions, the leader's first
+    """
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_function():
+        started.set()
+        release.wait(5)
+        return function()
+
+    def call(f):
+        try:
+            return single_flight.do(key, f)
+        except Exception as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=followers + 1) as executor:
+        leader = executor.submit(call, leader_function)
+        started.wait(5)
+        others = [executor.submit(call, lambda: pytest.fail('a follower ran the call')) for _ in range(followers)]
+        # wait until every follower is waiting for the leader
+        while single_flight.stats()['coalesced'] < followers:
+            time.sleep(0.001)
+        release.set()
+        return [leader.result()] + [future.result() for future in others]
+
+
+def test_callers_in_flight_share_one_call():
+    single_flight = SingleFlight()
+    results = _run_while_in_flight(single_flight, lambda: 'response')
+    assert results == ['response'] * 5
+    assert single_flight.stats() == {'executed': 1, 'coalesced': 4, 'in_flight': 0}
+
+
+def test_errors_are_raised_to_every_caller():
+    def fail():
+        raise RuntimeError('api down')
+
+    results = _run_while_in_flight(SingleFlight(), fail)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_calls_after_completion_run_again():
+    single_flight = SingleFlight()
+    assert single_flight.do('key', lambda: 1) == 1
+    assert single_flight.do('key', lambda: 2) == 2
+    assert single_flight.do('other', lambda: 3) == 3
+    assert single_flight.stats() == {'executed': 3, 'coalesced': 0, 'in_flight': 0}
+
+
+def test_transport_coalesces_identical_gets(fake_api):
+    fake_api.latency = 0.2
+    transport = Transport(pool_maxsize=8, cache=False, rate_limiter=False, metrics=False)
+    url = f'{fake_api.url}/api/catalog/v1/fake_tenant/function'
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: transport.request('GET', url, headers=HEADERS, tenant='t'),
+                                      range(8)))
+    stats = transport.coalescing_stats()
+    transport.close()
+    assert {response.status_code for response in responses} == {200}
+    assert fake_api.request_count == stats['executed']
+    assert stats['executed'] + stats['coalesced'] == 8
+    assert stats['executed'] < 8
+
+
+def test_transport_does_not_coalesce_writes(fake_api):
+    fake_api.latency = 0.1
+    transport = Transport(pool_maxsize=4, cache=False, rate_limiter=False, metrics=False)
+    url = f'{fake_api.url}/api/constants/v1/fake_tenant'
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: transport.request('POST', url, headers=HEADERS, data='[]'), range(4)))
+    transport.close()
+    assert fake_api.request_count == 4
@@ -0,0 +1,131 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import json
+from datetime import datetime
+
+import pytest
+
+from mam.sdk.apiclient import Transport
+from mam.sdk.streaming import (iter_json_array, iter_response_records)
+
+HEADERS = {'X-api-key': 'fake-api-key', 'X-api-token': 'fake-api-token'}
+
+DOCUMENT = '[12.75, -3e5, 0, 123, 1E+2, "débit ✓", "a\\"b", "", true, false, null, [], {}, ' \
+           '{"id": 1, "values": [1.5, "x", null], "ok": true}, 42]'
+
+
+def _split(data, *positions):
+    positions = [0] + list(positions) + [len(data)]
+    return [data[start:end] for start, end in zip(positions, positions[1:])]
+
+
+def test_every_split_position_gives_the_same_records():
+    data = DOCUMENT.encode('utf-8')
+    expected = json.loads(DOCUMENT)
+    for position in range(1, len(data)):
+        assert list(iter_json_array(_split(data, position))) == expected, position
+
+
+def test_one_byte_chunks():
+    data = DOCUMENT.encode('utf-8')
+    assert list(iter_json_array(data[i:i + 1] for i in range(len(data)))) == json.loads(DOCUMENT)
+
+
+@pytest.mark.parametrize('chunks, expected', [
+    ([b'[12.', b'75, 3]'], [12.75, 3]),
+    ([b'[12', b'3]'], [123]),
+    ([b'[1', b'e5]'], [1e5]),
+    ([b'[-', b'1]'], [-1]),
+    ([b'[4', b'2', b']'], [42]),
+    ([b'[1', b'2', b'3'], None),
+    ([b'["ab', b'c"]'], ['abc']),
+    ([b'["\xc3', b'\xa9"]'], ['é']),
+    ([b'[tr', b'ue, fa', b'lse, nu', b'll]'], [True, False, None]),
+    ([b'[true', b']'], [True]),
+    ([b'[{"a": [1, 2', b']}]'], [{'a': [1, 2]}]),
+])
+def test_values_split_across_chunks(chunks, expected):
+    if expected is None:
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunks))
+    else:
+        assert list(iter_json_array(chunks)) == expected
+
+
+@pytest.mark.parametrize('document', [b'[1 2]', b'[1,', b'[', b'[1, ]', b'[12.]'])
+def test_malformed_arrays(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(_split(document, 1)))
+
+
+def test_empty_and_non_array_documents():
+    assert list(iter_json_array([])) == []
+    assert list(iter_json_array([b' ', b'[', b' ]'])) == []
+    assert list(iter_json_array([b'{"a"', b': 1}'])) == [{'a': 1}]
+    assert list(iter_json_array([b'4', b'2'])) == [42]
+
+
+def test_streamed_response_records(fake_api):
+    fake_api.state('fake_tenant').add_alerts('pumps', 'high_pressure', 300, datetime(2020, 7, 28),
+                                             datetime(2020, 7, 29))
+    transport = Transport(cache=False, rate_limiter=False, metrics=False)
+    body = json.dumps({'entityTypesFilter': [{'name': 'pumps', 'dataItem': ['high_pressure']}]})
+    url = f'{fake_api.url}/api/asengine/v1/fake_tenant/queryalertdata'
+    expected = transport.request('POST', url, headers=HEADERS, data=body, read_only=True).json()
+    response = transport.request('POST', url, headers=HEADERS, data=body, read_only=True, stream=True)
+    records = list(iter_response_records(response, chunk_size=100))
+    transport.close()
+    assert records == expected
+    assert len(records) == 300
+
+
+class _Response(object):
+    def __init__(self, *chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+def test_response_records_close_the_response_when_exhausted_or_broken():
+    response = _Response(b'[1, ', b'2]')
+    assert list(iter_response_records(response)) == [1, 2]
+    assert response.closed
+
+    response = _Response(b'[1, }')
+    with pytest.raises(ValueError):
+        list(iter_response_records(response))
+    assert response.closed
+
+
+def test_response_records_that_are_not_read_are_closed_by_the_with_statement():
+    response = _Response(b'[1, 2]')
+    with iter_response_records(response) as records:
+        pass
+    assert response.closed
+    assert list(records) == []
+
+    response = _Response(b'[1, 2, 3]')
+    records = iter_response_records(response)
+    assert next(records) == 1
+    records.close()
+    assert response.closed
+
+
+def test_unread_alert_stream_gives_its_connection_back(fake_api, client_factory):
+    fake_api.state('fake_tenant').add_alerts('pumps', 'high_pressure', 300, datetime(2020, 7, 28),
+                                             datetime(2020, 7, 29))
+    payload = json.dumps({'entityTypesFilter': [{'name': 'pumps', 'dataItem': ['high_pressure']}]})
+    with client_factory().get_alerts_stream(payload) as records:
+        response = records.response
+    assert response.raw.closed
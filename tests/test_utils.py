@@ -0,0 +1,47 @@
+#  | * IBM Confidential
+#  | * OCO Source Materials
+#  | * 5737-M66
+#  | * © Copyright IBM Corp. 2020
+#  | * The source code for this program is not published or otherwise divested of its
+#  | * trade secrets, irrespective of what has been deposited with the U.S.
+#  | * Copyright Office.
+
+import numpy as np
+import pandas as pd
+
+from mam.sdk.utils import (change_df_dtype_to_db_dtype, db_dtype_conversions)
+
+ENTITY_TYPE_COLUMNS = [{'name': 'pressure', 'columnType': 'NUMBER'}, {'name': 'state', 'columnType': 'LITERAL'}]
+
+
+def frame(pressure_dtype):
+    return pd.DataFrame({'pressure': np.array([1.5, 2.5], dtype=pressure_dtype),
+                         'state': pd.Categorical(['on', 'off'])})
+
+
+def test_columns_of_the_database_type_are_not_converted():
+    assert db_dtype_conversions(frame('float64'), ENTITY_TYPE_COLUMNS) == {}
+    assert db_dtype_conversions(frame('float32'), ENTITY_TYPE_COLUMNS, float32=True) == {}
+
+
+def test_number_columns_are_converted_to_the_requested_float():
+    assert db_dtype_conversions(frame('float32'), ENTITY_TYPE_COLUMNS) == {'pressure': np.float64}
+    assert db_dtype_conversions(frame('float64'), ENTITY_TYPE_COLUMNS, float32=True) == {'pressure': np.float32}
+    assert db_dtype_conversions(frame('int64'), ENTITY_TYPE_COLUMNS, float32=True) == {'pressure': np.float32}
+    object_frame = frame('float64').astype({'pressure': object})
+    assert db_dtype_conversions(object_frame, ENTITY_TYPE_COLUMNS) == {'pressure': np.float64}
+
+
+def test_change_df_dtype_to_db_dtype_keeps_float32_when_requested():
+    df = frame('float32')
+    assert change_df_dtype_to_db_dtype(df, ENTITY_TYPE_COLUMNS, float32=True) is df
+    assert change_df_dtype_to_db_dtype(df, ENTITY_TYPE_COLUMNS)['pressure'].dtype == np.float64
+
+
+def test_change_df_dtype_to_db_dtype_stores_timezone_aware_timestamps_as_utc():
+    df = pd.DataFrame({'evt_timestamp': pd.date_range('2020-07-28 12:00', periods=2, freq='h', tz='Europe/Paris')})
+    columns = [{'name': 'evt_timestamp', 'columnType': 'TIMESTAMP'}]
+    assert db_dtype_conversions(df, columns) == {'evt_timestamp': 'datetime64[ns]'}
+    converted = change_df_dtype_to_db_dtype(df, columns)['evt_timestamp']
+    assert converted.dtype == 'datetime64[ns]'
+    assert converted.tolist() == [pd.Timestamp('2020-07-28 10:00'), pd.Timestamp('2020-07-28 11:00')]